@@ -0,0 +1,301 @@
+# backend/api_server.py
+"""
+Headless HTTP API for the scraper (aiohttp, one event loop).
+
+    POST /jobs                  {"subreddit", "time_filter", "limit", "mode": "direct"|"adk", "output_format"}
+                                -> 202 {"job_id", "status_url", "stream_url", "result_url"}
+    GET  /jobs                  all jobs
+    GET  /jobs/{id}             status, counts and the tail of the job's log
+    GET  /jobs/{id}/stream      posts as NDJSON (chunked) while they are scraped; ?format=sse
+                                (or Accept: text/event-stream) sends Server-Sent Events instead
+    GET  /jobs/{id}/result      the finished output file
+    GET  /health, GET /metrics  liveness and, with METRICS_ENABLED, Prometheus metrics
+
+Direct jobs go through run_reddit_scrape_direct and write uncompressed NDJSON by default,
+so /stream follows the file as it grows and clients get posts seconds into a long scrape.
+ADK jobs go through run_reddit_scrape_with_adk; their JSON output is streamed once the
+agent finishes. Each job writes into its own directory under the output directory; jobs
+are kept in memory for the life of the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import traceback
+import uuid
+
+# aiohttp is optional (installed with asyncpraw)
+try:
+    from aiohttp import web
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    web = None
+    AIOHTTP_AVAILABLE = False
+
+try:
+    from . import config, reddit_backend_processor, reddit_async_scraper, log_sink, metrics
+except ImportError:
+    import config, reddit_backend_processor, reddit_async_scraper, log_sink, metrics
+
+JOB_MODES = ("direct", "adk")
+TIME_FILTERS = ("hour", "day", "week", "month", "year", "all")
+OUTPUT_FORMATS = ("ndjson", "json", "parquet", "arrow")
+_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+_READ_CHUNK = 1 << 20
+
+class ApiJob:
+    """One scrape requested over HTTP: its parameters, state, output and a bounded log."""
+    def __init__(self, subreddit, time_filter, limit, mode, output_format, output_root):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.subreddit = subreddit
+        self.time_filter = time_filter
+        self.limit = limit
+        self.mode = mode
+        self.output_format = output_format if mode == "direct" else "json" # the agent's tool writes JSON
+        self.output_dir = os.path.join(output_root, self.job_id)
+        self.status = "queued"
+        self.output_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.log = log_sink.LogSink(capacity=config.API_JOB_LOG_LINES)
+        self.done = asyncio.Event()
+
+    def live_path(self):
+        """The output file being written, once it exists."""
+        if self.output_path:
+            return self.output_path
+        try:
+            names = os.listdir(self.output_dir)
+        except FileNotFoundError:
+            return None
+        extension = f".{self.output_format}"
+        matches = [name for name in names if name.endswith(extension) and not name.endswith((".metrics.json", ".delta.json"))]
+        return os.path.join(self.output_dir, matches[0]) if matches else None
+
+    def to_dict(self, log_lines=20):
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "job_id": self.job_id,
+            "subreddit": self.subreddit,
+            "time_filter": self.time_filter,
+            "limit": self.limit,
+            "mode": self.mode,
+            "output_format": self.output_format,
+            "status": self.status,
+            "output_path": self.output_path,
+            "error": self.error,
+            "created_at": self.created_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "log_tail": self.log.text().splitlines()[-log_lines:],
+        }
+
+def parse_job_request(body):
+    """Validates a POST /jobs body; returns (subreddit, time_filter, limit, mode, output_format) or raises ValueError."""
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object.")
+    subreddit = str(body.get("subreddit") or "").strip().removeprefix("r/")
+    if not subreddit:
+        raise ValueError("'subreddit' is required.")
+    time_filter = body.get("time_filter") or "week"
+    if time_filter not in TIME_FILTERS:
+        raise ValueError(f"'time_filter' must be one of: {', '.join(TIME_FILTERS)}.")
+    try:
+        limit = int(body["limit"]) if body.get("limit") is not None else 50
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be an integer.")
+    if not 1 <= limit <= 1000:
+        raise ValueError("'limit' must be between 1 and 1000.")
+    mode = body.get("mode") or "direct"
+    if mode not in JOB_MODES:
+        raise ValueError(f"'mode' must be one of: {', '.join(JOB_MODES)}.")
+    output_format = body.get("output_format") or "ndjson"
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"'output_format' must be one of: {', '.join(OUTPUT_FORMATS)}.")
+    return subreddit, time_filter, limit, mode, output_format
+
+class ApiServer:
+    """
+    Job registry and request handlers. Any number of jobs can be submitted; at most
+    max_concurrent_jobs scrape at once on the server's event loop, the rest wait their turn.
+    """
+    def __init__(self, output_dir=None, max_concurrent_jobs=None, poll_seconds=None):
+        self.output_dir = output_dir or config.API_OUTPUT_DIR
+        self.max_concurrent_jobs = max_concurrent_jobs or config.API_MAX_CONCURRENT_JOBS
+        self.poll_seconds = poll_seconds or config.API_STREAM_POLL_SECONDS
+        self.jobs = {}
+        self._slots = None
+        self._tasks = set()
+
+    def build_app(self):
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("The API server requires the 'aiohttp' package (pip install aiohttp).")
+        app = web.Application()
+        app.add_routes([
+            web.post("/jobs", self.create_job),
+            web.get("/jobs", self.list_jobs),
+            web.get("/jobs/{job_id}", self.get_job),
+            web.get("/jobs/{job_id}/stream", self.stream_job),
+            web.get("/jobs/{job_id}/result", self.job_result),
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        self._slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        reddit_backend_processor.prewarm(print) # Build the PRAW client before the first job arrives
+
+    async def _on_cleanup(self, app):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await reddit_async_scraper.close_async_reddit()
+
+    def _job_or_404(self, request):
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "Unknown job id."}), content_type="application/json")
+        return job
+
+    # --- Handlers ---
+
+    async def create_job(self, request):
+        try:
+            params = parse_job_request(await request.json())
+        except json.JSONDecodeError:
+            return web.json_response({"error": "The request body must be JSON."}, status=400)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        job = ApiJob(*params, output_root=self.output_dir)
+        self.jobs[job.job_id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        base = f"/jobs/{job.job_id}"
+        return web.json_response({"job_id": job.job_id, "status": job.status, "status_url": base,
+                                  "stream_url": f"{base}/stream", "result_url": f"{base}/result"}, status=202)
+
+    async def list_jobs(self, request):
+        return web.json_response({"jobs": [job.to_dict(log_lines=0) for job in self.jobs.values()]})
+
+    async def get_job(self, request):
+        return web.json_response(self._job_or_404(request).to_dict())
+
+    async def job_result(self, request):
+        job = self._job_or_404(request)
+        if job.status != "success":
+            return web.json_response(job.to_dict(), status=409 if job.status in ("queued", "running") else 500)
+        return web.FileResponse(job.output_path, headers={
+            "Content-Type": _CONTENT_TYPES.get(job.output_format, "application/octet-stream")})
+
+    async def health(self, request):
+        running = sum(job.status == "running" for job in self.jobs.values())
+        return web.json_response({"status": "ok", "jobs": len(self.jobs), "running": running})
+
+    async def metrics(self, request):
+        if not metrics.ENABLED:
+            return web.json_response({"error": "Metrics are disabled (set METRICS_ENABLED=true)."}, status=404)
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+    async def stream_job(self, request):
+        job = self._job_or_404(request)
+        if job.output_format not in ("ndjson", "json"):
+            return web.json_response({"error": f"{job.output_format} output cannot be streamed; use the result URL."}, status=409)
+        sse = request.query.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream" if sse else "application/x-ndjson",
+            "Cache-Control": "no-cache",
+        })
+        await response.prepare(request)
+        async for line in self._iter_posts(job):
+            await response.write(b"event: post\ndata: " + line + b"\n\n" if sse else line + b"\n")
+        if sse:
+            status = json.dumps({"status": job.status, "error": job.error}).encode("utf-8")
+            await response.write(b"event: end\ndata: " + status + b"\n\n")
+        await response.write_eof()
+        return response
+
+    # --- Job execution and streaming ---
+
+    async def _run(self, job):
+        async with self._slots:
+            job.status, job.started_at = "running", time.time()
+            os.makedirs(job.output_dir, exist_ok=True)
+            try:
+                if job.mode == "adk":
+                    path = await reddit_backend_processor.run_reddit_scrape_with_adk(
+                        job.subreddit, job.time_filter, job.limit, job.output_dir, job.log, store_snapshot=False, resume=False)
+                else:
+                    path = await reddit_backend_processor.run_reddit_scrape_direct(
+                        job.subreddit, job.time_filter, job.limit, job.output_dir, job.log, output_format=job.output_format,
+                        store_snapshot=False, resume=False) # results are served from the output file
+                if path:
+                    job.status, job.output_path = "success", path
+                else:
+                    job.status, job.error = "error", "Scrape failed; see log_tail."
+            except asyncio.CancelledError:
+                job.status, job.error = "error", "Server shut down before the job finished."
+                raise
+            except Exception as e:
+                job.status, job.error = "error", str(e)
+                traceback.print_exc()
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+
+    async def _iter_posts(self, job):
+        """Yields the job's posts as encoded JSON lines: followed live for NDJSON, after completion for JSON."""
+        if job.output_format == "json":
+            await job.done.wait()
+            if job.output_path:
+                for post in await asyncio.to_thread(_load_json, job.output_path):
+                    yield json.dumps(post, ensure_ascii=False).encode("utf-8")
+            return
+        offset, pending = 0, b""
+        while True:
+            finished = job.done.is_set() # read once more after the job finishes
+            path = job.live_path()
+            if path and os.path.exists(path):
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(_READ_CHUNK)
+                offset += len(chunk)
+                *lines, pending = (pending + chunk).split(b"\n") # Only complete lines; the writer may be mid-line
+                for line in lines:
+                    if line:
+                        yield line
+                if len(chunk) == _READ_CHUNK:
+                    continue
+            if finished:
+                return
+            try:
+                await asyncio.wait_for(job.done.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+def _load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the scraper as a headless HTTP API server.")
+    parser.add_argument("--host", default=None, help="Bind address (default API_HOST)")
+    parser.add_argument("--port", type=int, default=None, help="Port (default API_PORT)")
+    parser.add_argument("--output-dir", default=None, help="Where jobs write their output (default API_OUTPUT_DIR)")
+    parser.add_argument("--max-concurrent-jobs", type=int, default=None, help="Jobs scraping at once (default API_MAX_CONCURRENT_JOBS)")
+    args = parser.parse_args(argv)
+    if not AIOHTTP_AVAILABLE:
+        print("ERROR: The API server requires the 'aiohttp' package (pip install aiohttp).")
+        return 1
+    config.report()
+    server = ApiServer(args.output_dir, args.max_concurrent_jobs)
+    web.run_app(server.build_app(), host=args.host or config.API_HOST, port=args.port or config.API_PORT)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
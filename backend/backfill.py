@@ -0,0 +1,363 @@
+# backend/backfill.py
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    from . import config, reddit_scraper, output_writer, records
+except ImportError:
+    import config, reddit_scraper, output_writer, records
+
+def to_epoch(value):
+    """Epoch seconds from an epoch number, 'YYYY-MM-DD' or an ISO-8601 string (naive = UTC)."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if str(value).isdigit():
+        return int(value)
+    parsed = datetime.datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp())
+
+def _day(epoch):
+    return datetime.datetime.fromtimestamp(epoch, tz=datetime.timezone.utc).strftime("%Y%m%d")
+
+# --- Window sources: which post ids were created in [start, end) ---
+
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class PushshiftSource:
+    """
+    Post ids from a pushshift-compatible search API (GET <base_url>/reddit/search/submission),
+    paged oldest first with after/before epoch bounds.
+    """
+    name = "pushshift"
+
+    def __init__(self, base_url=None, page_size=100, timeout=30, retries=3):
+        import requests # installed with praw
+        self.base_url = (base_url or config.BACKFILL_PUSHSHIFT_URL).rstrip("/")
+        self.page_size = page_size
+        self.timeout = timeout
+        self.retries = retries
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = config.REDDIT_USER_AGENT or "reddit_data_scraper backfill"
+
+    def _get(self, params):
+        url = f"{self.base_url}/reddit/search/submission"
+        error = None
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session.get(url, params=params, timeout=self.timeout)
+            except OSError as e: # requests' connection errors are OSErrors
+                error = e
+            else:
+                if response.status_code == 200:
+                    return response.json().get("data", [])
+                if response.status_code not in _RETRY_STATUSES:
+                    raise RuntimeError(f"Search request failed with HTTP {response.status_code}: {response.url}")
+                error = f"HTTP {response.status_code}"
+            if attempt < self.retries:
+                time.sleep(2 ** attempt)
+        raise RuntimeError(f"Search request failed after {self.retries + 1} attempts: {error}")
+
+    def window_ids(self, subreddit_name, start, end, cap):
+        ids, seen = [], set()
+        after = start - 1 # 'after' is exclusive
+        while len(ids) < cap:
+            page = self._get({"subreddit": subreddit_name, "after": after, "before": end,
+                              "size": self.page_size, "sort": "asc", "sort_type": "created_utc"})
+            new = [item for item in page if item["id"] not in seen]
+            if not new:
+                break
+            for item in new:
+                seen.add(item["id"])
+                ids.append(item["id"])
+            # Step back one second so posts sharing the last timestamp are not skipped
+            after = max(after + 1, int(page[-1]["created_utc"]) - 1)
+            if len(page) < self.page_size:
+                break
+        return ids[:cap]
+
+class CloudsearchSource:
+    """Post ids from Reddit's own search with a cloudsearch 'timestamp:start..end' query (capped by Reddit)."""
+    name = "cloudsearch"
+
+    def __init__(self, reddit):
+        self.reddit = reddit
+
+    def window_ids(self, subreddit_name, start, end, cap):
+        query = f"timestamp:{start}..{end - 1}"
+        with reddit_scraper.clients_for(self.reddit).checkout() as reddit: # windows run on several threads
+            results = reddit.subreddit(subreddit_name).search(query, syntax="cloudsearch", sort="new", limit=cap)
+            return [submission.id for submission in results]
+
+def make_source(name, reddit=None, pushshift_url=None):
+    name = name or config.BACKFILL_SOURCE
+    if name == "pushshift":
+        return PushshiftSource(pushshift_url)
+    if name == "cloudsearch":
+        return CloudsearchSource(reddit)
+    raise ValueError(f"Unsupported backfill source '{name}'. Use 'pushshift' or 'cloudsearch'.")
+
+# --- Resumable per-window state ---
+
+class BackfillState:
+    """
+    Progress of a backfill, one entry per time window ('pending', 'done' or 'split' into two
+    halves), saved to a JSON file after every change so a restarted run skips finished windows.
+    """
+    def __init__(self, path, subreddit_name, start, end, window_seconds):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+            if (self.data["subreddit"], self.data["start"], self.data["end"]) != (subreddit_name, start, end):
+                raise ValueError(f"State file {path} belongs to a different backfill; remove it or pick another output.")
+        else:
+            self.data = {"subreddit": subreddit_name, "start": start, "end": end, "windows": {}}
+            for window_start in range(start, end, window_seconds):
+                self._add(window_start, min(window_start + window_seconds, end))
+            self.save()
+
+    @staticmethod
+    def _key(start, end):
+        return f"{start}-{end}"
+
+    def _add(self, start, end):
+        self.data["windows"][self._key(start, end)] = {"start": start, "end": end, "status": "pending", "posts": 0}
+
+    def pending(self):
+        with self._lock:
+            return [(w["start"], w["end"]) for w in self.data["windows"].values() if w["status"] == "pending"]
+
+    def mark_done(self, start, end, posts):
+        with self._lock:
+            window = self.data["windows"][self._key(start, end)]
+            window["status"], window["posts"] = "done", posts
+            self._save_locked()
+
+    def split(self, start, end):
+        """Replaces a window that hit the cap by its two halves; returns them."""
+        middle = start + (end - start) // 2
+        with self._lock:
+            self.data["windows"][self._key(start, end)]["status"] = "split"
+            self._add(start, middle)
+            self._add(middle, end)
+            self._save_locked()
+        return [(start, middle), (middle, end)]
+
+    def counts(self):
+        with self._lock:
+            statuses = [w["status"] for w in self.data["windows"].values()]
+        return {status: statuses.count(status) for status in ("pending", "done", "split")}
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+# --- Backfill runner ---
+
+def _written_ids(path, log_callback):
+    """Ids already in the output file (for dedupe on resume); a torn last line is ignored."""
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with output_writer.open_ndjson(path) as f:
+        for line in f:
+            try:
+                ids.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                log_callback("  Warning: Skipping an unreadable line in the existing backfill output.")
+    if not path.endswith((".gz", ".zst")) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n") # Terminate a torn line so the next record starts cleanly
+    return ids
+
+def default_output_path(output_dir, subreddit_name, start, end, compression=None):
+    return os.path.join(output_dir, output_writer.ndjson_filename(f"{subreddit_name}_backfill_{_day(start)}_{_day(end)}", compression))
+
+class Backfill:
+    """
+    Scrapes every post of a subreddit created in [start, end) by splitting the range into time
+    windows, getting each window's post ids from a window source, hydrating them through the
+    Reddit API (100 per request) and fetching their comments. Windows run on a thread pool;
+    a window whose source result hits the cap is split in half until it fits (or reaches
+    min_window_seconds). Posts are deduped by id and appended to one NDJSON file (in window
+    completion order), and a '<output>.state.json' file records finished windows, so running
+    the same backfill again resumes where it stopped. With a credential_pool.CredentialPool the
+    comment fetches are spread over its credentials.
+    """
+    def __init__(self, reddit, subreddit_name, start, end, output_path=None, output_dir="reddit_data",
+                 source=None, window_seconds=None, workers=None, cap=None, min_window_seconds=None,
+                 compression=None, comment_options=None, rate_budget=None, state_path=None, pool=None,
+                 log_callback=print):
+        self.reddit = reddit
+        self.subreddit_name = subreddit_name
+        self.start, self.end = to_epoch(start), to_epoch(end)
+        if self.end <= self.start:
+            raise ValueError("The backfill end must be after its start.")
+        self.output_path = output_path or default_output_path(output_dir, subreddit_name, self.start, self.end, compression)
+        self.compression = compression or ("gzip" if self.output_path.endswith(".gz") else "zstd" if self.output_path.endswith(".zst") else None)
+        self.source = source if source is not None and not isinstance(source, str) else make_source(source, reddit)
+        self.window_seconds = window_seconds or config.BACKFILL_WINDOW_HOURS * 3600
+        self.workers = workers or config.BACKFILL_WORKERS
+        self.cap = cap or config.BACKFILL_WINDOW_CAP
+        self.min_window_seconds = min_window_seconds or config.BACKFILL_MIN_WINDOW_SECONDS
+        self.comment_options = comment_options or reddit_scraper.CommentOptions()
+        self.rate_budget = rate_budget or reddit_scraper.RateBudget(config.REDDIT_REQUESTS_PER_MINUTE)
+        self.state = BackfillState(state_path or f"{self.output_path}.state.json", subreddit_name, self.start, self.end, self.window_seconds)
+        self.pool = pool
+        self.log_callback = log_callback
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._writer = None
+        self.posts_written = 0
+        self.comments_written = 0
+        self.duplicates = 0
+        self.failed_windows = 0
+
+    def _window_label(self, start, end):
+        fmt = lambda t: datetime.datetime.fromtimestamp(t, tz=datetime.timezone.utc).strftime("%Y-%m-%d %H:%M")
+        return f"{fmt(start)} .. {fmt(end)}"
+
+    def _claim(self, ids):
+        """Reserves the ids no other window has written yet."""
+        with self._lock:
+            new = [post_id for post_id in ids if post_id not in self._seen]
+            self._seen.update(new)
+            self.duplicates += len(ids) - len(new)
+        return new
+
+    def _process_window(self, start, end):
+        """Scrapes one window. Returns its halves if it hit the cap, else None."""
+        ids = self.source.window_ids(self.subreddit_name, start, end, self.cap)
+        if len(ids) >= self.cap and end - start > self.min_window_seconds:
+            self.log_callback(f"  Window {self._window_label(start, end)} hit the {self.cap}-post cap; splitting it.")
+            return self.state.split(start, end)
+        if len(ids) >= self.cap:
+            self.log_callback(f"  Warning: Window {self._window_label(start, end)} is at the minimum size but still hit the cap; some posts may be missing.")
+
+        new_ids = self._claim(ids)
+        written = set()
+        try:
+            # This window's own praw.Reddit instance: PRAW is not thread-safe
+            with reddit_scraper.clients_for(self.reddit).checkout() as reddit:
+                for chunk_start in range(0, len(new_ids), 100):
+                    if self.rate_budget:
+                        self.rate_budget.acquire()
+                    chunk = [f"t3_{post_id}" for post_id in new_ids[chunk_start:chunk_start + 100]]
+                    for submission in reddit.info(fullnames=chunk):
+                        post_data = records.Post.from_praw(submission)
+                        post_data.comments = reddit_scraper._fetch_comments(
+                            submission, self.log_callback, self.rate_budget, self.comment_options, self.pool) or []
+                        with self._lock:
+                            self._writer.write(post_data)
+                            written.add(post_data.id)
+                            self.posts_written += 1
+                            self.comments_written += len(post_data.comments)
+        except Exception:
+            # Let a later run retry the posts this window did not write
+            with self._lock:
+                self._seen.difference_update(set(new_ids) - written)
+            raise
+        self.state.mark_done(start, end, len(written))
+        self.log_callback(f"  Window {self._window_label(start, end)}: {len(written)} posts ({len(ids) - len(new_ids)} duplicates).")
+        return None
+
+    def run(self):
+        """Runs (or resumes) the backfill and returns a summary dict."""
+        started = time.perf_counter()
+        pending = self.state.pending()
+        self._seen = _written_ids(self.output_path, self.log_callback)
+        self.log_callback(f"Backfilling r/{self.subreddit_name} {self._window_label(self.start, self.end)}: "
+                          f"{len(pending)} windows to go, {len(self._seen)} posts already saved, {self.workers} workers.")
+        with output_writer.NDJSONWriter(self.output_path, self.compression, append=True) as writer, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            self._writer = writer
+            futures = {executor.submit(self._process_window, *window): window for window in pending}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = futures.pop(future)
+                    try:
+                        halves = future.result()
+                    except Exception as e:
+                        self.failed_windows += 1
+                        self.log_callback(f"  ERROR: Window {self._window_label(*window)} failed (will retry on the next run): {e}")
+                        traceback.print_exc()
+                        continue
+                    for half in halves or ():
+                        futures[executor.submit(self._process_window, *half)] = half
+            self._writer = None
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "subreddit": self.subreddit_name,
+            "output_path": self.output_path,
+            "state_path": self.state.path,
+            "posts_written": self.posts_written,
+            "comments_written": self.comments_written,
+            "duplicates_skipped": self.duplicates,
+            "failed_windows": self.failed_windows,
+            "windows": self.state.counts(),
+            "elapsed_seconds": round(elapsed, 2),
+            "complete": not self.state.pending(),
+        }
+        self.log_callback(f"Backfill finished: {summary}")
+        return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill every post of a subreddit in a date range, past the 1000-item listing cap.")
+    parser.add_argument("subreddit")
+    parser.add_argument("--start", required=True, help="Start date (YYYY-MM-DD, ISO-8601 or epoch, UTC)")
+    parser.add_argument("--end", required=True, help="End date, exclusive")
+    parser.add_argument("--source", choices=["pushshift", "cloudsearch"], default=None, help="Window source (default BACKFILL_SOURCE)")
+    parser.add_argument("--pushshift-url", default=None, help="Pushshift-compatible API base URL (default BACKFILL_PUSHSHIFT_URL)")
+    parser.add_argument("--window-hours", type=float, default=None, help="Initial window size (default BACKFILL_WINDOW_HOURS)")
+    parser.add_argument("--workers", type=int, default=None, help="Windows fetched in parallel (default BACKFILL_WORKERS)")
+    parser.add_argument("--cap", type=int, default=None, help="Results per window before it is split (default BACKFILL_WINDOW_CAP)")
+    parser.add_argument("--output", default=None, help="NDJSON output path (default reddit_data/<sub>_backfill_<start>_<end>.ndjson)")
+    parser.add_argument("--output-dir", default="reddit_data")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    args = parser.parse_args(argv)
+    config.report()
+
+    reddit = reddit_scraper.initialize_reddit()
+    if not reddit:
+        return 1
+    pool = None
+    if config.REDDIT_CREDENTIALS:
+        try:
+            from . import credential_pool # imports prawcore
+        except ImportError:
+            import credential_pool
+        pool = credential_pool.get_pool()
+    backfill = Backfill(
+        reddit, args.subreddit, args.start, args.end, output_path=args.output, output_dir=args.output_dir,
+        source=make_source(args.source, reddit, args.pushshift_url), window_seconds=int(args.window_hours * 3600) if args.window_hours else None,
+        workers=args.workers, cap=args.cap, compression=args.compression, pool=pool,
+    )
+    summary = backfill.run()
+    print(json.dumps(summary, indent=4))
+    return 0 if summary["complete"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
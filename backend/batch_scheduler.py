@@ -0,0 +1,216 @@
+# backend/batch_scheduler.py
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import time
+import traceback
+
+try:
+    from . import config, reddit_scraper, reddit_async_scraper, reddit_adk_tool
+except ImportError:
+    import config, reddit_scraper, reddit_async_scraper, reddit_adk_tool
+
+JOB_STATUSES = ("queued", "running", "success", "error")
+
+class ScrapeJob:
+    """One (subreddit, time_filter, limit) scrape with a priority (higher runs first) and its outcome."""
+    def __init__(self, subreddit, time_filter="week", limit=50, priority=0, job_id=None):
+        self.job_id = job_id or f"{subreddit}_{time_filter}_{limit}"
+        self.subreddit = subreddit
+        self.time_filter = time_filter or "week"
+        self.limit = int(limit or 50)
+        self.priority = int(priority or 0)
+        self.status = "queued"
+        self.output_path = None
+        self.posts = 0
+        self.comments = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "subreddit": self.subreddit,
+            "time_filter": self.time_filter,
+            "limit": self.limit,
+            "priority": self.priority,
+            "status": self.status,
+            "output_path": self.output_path,
+            "posts": self.posts,
+            "comments": self.comments,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "error": self.error,
+        }
+
+def parse_jobs(entries):
+    """Builds ScrapeJobs from dicts with subreddit/time_filter/limit/priority keys."""
+    return [ScrapeJob(e["subreddit"], e.get("time_filter"), e.get("limit"), e.get("priority"), e.get("job_id")) for e in entries]
+
+def load_jobs(path):
+    """
+    Loads jobs from a file:
+      .json - a list of job objects, or {"jobs": [...]}
+      .csv  - header row with subreddit,time_filter,limit,priority
+      other - one job per line: 'subreddit [time_filter] [limit] [priority]' ('#' starts a comment)
+    """
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return parse_jobs(data["jobs"] if isinstance(data, dict) else data)
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            return parse_jobs(csv.DictReader(f))
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if fields:
+                jobs.append(ScrapeJob(*fields[:4]))
+    return jobs
+
+class BatchScheduler:
+    """
+    Runs many scrape jobs headlessly through reddit_subreddit_scraper_logic.
+    At most `concurrency` jobs run at once, highest priority first (FIFO within a priority).
+    All jobs draw comment requests from one shared RateBudget that hands out slots in
+    arrival order, so concurrently running jobs get an equal share of the budget.
+    """
+    def __init__(self, concurrency=None, output_dir="reddit_data", output_format="json", compression=None,
+                 backend=None, requests_per_minute=None, log_callback=print):
+        self.concurrency = concurrency or config.BATCH_CONCURRENCY
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.compression = compression
+        self.backend = backend or config.SCRAPER_BACKEND
+        requests_per_minute = config.REDDIT_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        self.rate_budget = reddit_scraper.RateBudget(requests_per_minute)
+        self.log_callback = log_callback
+        self.jobs = []
+        self.started_at = None
+        self.finished_at = None
+        self._reddit = None
+
+    async def run(self, jobs):
+        """Runs all jobs and returns the summary dict."""
+        self.jobs = list(jobs)
+        if self.backend == "thread":
+            self._reddit = reddit_scraper.initialize_reddit()
+            if not self._reddit:
+                self.log_callback("ERROR: Failed to initialize Reddit connection; no jobs were run.")
+                for job in self.jobs:
+                    job.status, job.error = "error", "Reddit connection unavailable."
+                return self.summary()
+
+        queue = asyncio.PriorityQueue()
+        order = itertools.count()
+        for job in self.jobs:
+            queue.put_nowait((-job.priority, next(order), job))
+
+        self.log_callback(f"--- Batch: {len(self.jobs)} jobs, concurrency {self.concurrency}, backend '{self.backend}' ---")
+        self.started_at = time.time()
+        workers = [asyncio.create_task(self._worker(queue, n)) for n in range(min(self.concurrency, len(self.jobs)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            if self.backend == "async":
+                await reddit_async_scraper.close_async_reddit()
+        self.finished_at = time.time()
+
+        summary = self.summary()
+        self.log_callback(
+            f"--- Batch finished: {summary['succeeded']}/{summary['jobs']} jobs succeeded in {summary['elapsed_seconds']}s "
+            f"({summary['posts_per_sec']} posts/sec, {summary['comments_per_sec']} comments/sec) ---"
+        )
+        return summary
+
+    async def _worker(self, queue, worker_id):
+        while True:
+            try:
+                _, _, job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await self._run_job(job, worker_id)
+
+    async def _run_job(self, job, worker_id):
+        job.status, job.started_at = "running", time.time()
+        self.log_callback(f"[worker {worker_id}] Starting {job.job_id} (priority {job.priority})")
+        try:
+            result = await reddit_adk_tool.reddit_subreddit_scraper_logic(
+                subreddit_name=job.subreddit, time_filter=job.time_filter, limit=job.limit,
+                log_callback=lambda msg: self.log_callback(f"  [{job.job_id}] {msg}"),
+                reddit_instance_internal=self._reddit, output_dir=self.output_dir,
+                output_format=self.output_format, compression=self.compression,
+                backend=self.backend, rate_budget=self.rate_budget,
+                resume=False, # jobs with the same parameters would share a checkpoint
+            )
+            if result.get("status") == "success":
+                handle = result.get("handle", {})
+                job.status, job.output_path = "success", handle.get("path")
+                job.posts, job.comments = handle.get("posts", 0), handle.get("comments", 0)
+            else:
+                job.status, job.error = "error", result.get("message")
+        except Exception as e:
+            job.status, job.error = "error", str(e)
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+        self.log_callback(f"[worker {worker_id}] {job.job_id}: {job.status} ({job.posts} posts, {job.comments} comments, {job.elapsed:.1f}s)")
+
+    def status(self):
+        """Per-job status dicts."""
+        return [job.to_dict() for job in self.jobs]
+
+    def summary(self):
+        """Totals and throughput for the batch, plus the per-job status."""
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        posts = sum(job.posts for job in self.jobs)
+        comments = sum(job.comments for job in self.jobs)
+        return {
+            "jobs": len(self.jobs),
+            "succeeded": sum(job.status == "success" for job in self.jobs),
+            "failed": sum(job.status == "error" for job in self.jobs),
+            "posts": posts,
+            "comments": comments,
+            "elapsed_seconds": round(elapsed, 3),
+            "posts_per_sec": round(posts / elapsed, 2) if elapsed else 0.0,
+            "comments_per_sec": round(comments / elapsed, 2) if elapsed else 0.0,
+            "job_status": self.status(),
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a batch of subreddit scrapes headlessly.")
+    parser.add_argument("jobs_file", help="Jobs file (.json, .csv or one 'subreddit [time_filter] [limit] [priority]' per line)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max jobs running at once (default BATCH_CONCURRENCY)")
+    parser.add_argument("--output-dir", default="reddit_data")
+    parser.add_argument("--format", dest="output_format", choices=["json", "ndjson", "parquet", "arrow"], default="json")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    parser.add_argument("--backend", choices=["thread", "async"], default=None)
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="Rate budget shared by all jobs")
+    parser.add_argument("--report", default=None, help="Write the summary JSON to this path")
+    args = parser.parse_args(argv)
+    config.report()
+
+    scheduler = BatchScheduler(
+        concurrency=args.concurrency, output_dir=args.output_dir, output_format=args.output_format,
+        compression=args.compression, backend=args.backend, requests_per_minute=args.requests_per_minute,
+    )
+    summary = asyncio.run(scheduler.run(load_jobs(args.jobs_file)))
+    if args.report:
+        os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=4)
+        print(f"Batch report saved to: {args.report}")
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
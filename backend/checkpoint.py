@@ -0,0 +1,187 @@
+# backend/checkpoint.py
+import json
+import os
+import threading
+import time
+
+# POSIX file locks keep two processes off the same checkpoint; elsewhere only this process is guarded
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from . import config, records, post_store
+except ImportError:
+    import config, records, post_store
+
+_active_keys = set() # checkpoints held by scrapes running in this process
+_active_lock = threading.Lock()
+
+def job_key(subreddit_name, time_filter, limit, comment_options=None):
+    """
+    Stable key of a scrape job: the same subreddit, time filter, limit and comment bounds
+    always map to the same checkpoint, whatever the output path or backend.
+    """
+    return f"{subreddit_name.lower()}_{time_filter}_{limit}_{post_store.options_digest(comment_options)}"
+
+class Checkpoint:
+    """
+    Resumable progress of one listing scrape, kept in config.CHECKPOINT_DIR as
+    '<key>.json' (the listing's 'after' cursor, posts done and the size of the partial file)
+    and '<key>.partial.ndjson' (the finished posts, in listing order).
+    The state is saved every `every` posts and whenever the scrape stops, successful or not.
+    acquire() claims the checkpoint so two concurrent scrapes of the same job do not share it,
+    load() picks up saved progress (discarding it when older than max_age seconds), replay()
+    yields the saved posts, finish() removes the files once the scrape has completed, and
+    release() gives up the claim and removes the lock file.
+    """
+    def __init__(self, key, directory=None, every=None, max_age=None):
+        self.key = key
+        self.directory = directory or config.CHECKPOINT_DIR
+        self.every = every or config.CHECKPOINT_EVERY
+        self.max_age = config.CHECKPOINT_MAX_AGE if max_age is None else max_age # 0 = no limit
+        self.state_path = os.path.join(self.directory, f"{key}.json")
+        self.partial_path = os.path.join(self.directory, f"{key}.partial.ndjson")
+        self.lock_path = os.path.join(self.directory, f"{key}.lock")
+        self.discarded_age = None # age in seconds of a stale checkpoint load() threw away
+        self.after = None   # fullname of the last finished post
+        self.count = 0      # posts in the partial file
+        self.offset = 0     # bytes of the partial file covered by the saved state
+        self.done_ids = set()
+        self._file = None
+        self._unsaved = 0
+        self._lock_file = None
+
+    @classmethod
+    def for_job(cls, subreddit_name, time_filter, limit, comment_options=None, directory=None):
+        return cls(job_key(subreddit_name, time_filter, limit, comment_options), directory)
+
+    def acquire(self):
+        """Claims the checkpoint for this scrape; False if another running scrape holds it."""
+        with _active_lock:
+            if self.key in _active_keys:
+                return False
+            if fcntl:
+                os.makedirs(self.directory, exist_ok=True)
+                while True:
+                    lock_file = open(self.lock_path, "a")
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        lock_file.close()
+                        return False
+                    if self._holds_lock_path(lock_file):
+                        break
+                    lock_file.close() # Removed by its previous holder after we opened it; lock the new file
+                self._lock_file = lock_file
+            _active_keys.add(self.key)
+        return True
+
+    def _holds_lock_path(self, lock_file):
+        try:
+            return os.stat(self.lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _remove_lock_file(self):
+        # Only while holding the lock, and only our own file (not one a later scrape has created)
+        if self._lock_file is not None and self._holds_lock_path(self._lock_file):
+            os.remove(self.lock_path)
+
+    def release(self):
+        with _active_lock:
+            _active_keys.discard(self.key)
+            if self._lock_file is not None:
+                self._remove_lock_file()
+                self._lock_file.close() # also drops the flock
+                self._lock_file = None
+
+    def load(self):
+        """
+        Loads saved progress and returns the number of posts already done (0 = fresh start).
+        Progress saved more than max_age seconds ago is discarded (see discarded_age): its
+        scores are out of date and its listing cursor has usually dropped out of the listing.
+        """
+        if not os.path.exists(self.state_path) or not os.path.exists(self.partial_path):
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path) # Crashed before its first save; nothing in it is covered
+            return 0
+        with open(self.state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        age = time.time() - state.get("saved_at", 0)
+        if self.max_age and age > self.max_age:
+            self.discarded_age = age
+            self._remove_files()
+            return 0
+        self.after, self.count, self.offset = state["after"], state["count"], state["offset"]
+        # Posts appended after the last save are dropped; they are scraped again
+        with open(self.partial_path, "rb+") as f:
+            f.truncate(self.offset)
+        return self.count
+
+    def replay(self):
+        """Yields the saved posts as records.Post objects, in listing order."""
+        if not self.count:
+            return
+        with open(self.partial_path, encoding="utf-8") as f:
+            for line in f:
+                post_data = records.Post.from_dict(json.loads(line))
+                self.done_ids.add(post_data.id)
+                yield post_data
+
+    def listing_args(self, limit):
+        """Keyword arguments for subreddit.top() that continue the listing after the last saved post."""
+        if not self.after:
+            return {"limit": limit}
+        return {"limit": max(limit - self.count, 0), "params": {"after": self.after}}
+
+    def add(self, post_data):
+        """Appends a finished post; the state is saved every `every` posts."""
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.partial_path, "ab")
+        self._file.write(json.dumps(records.as_dict(post_data), ensure_ascii=False).encode("utf-8") + b"\n")
+        self.count += 1
+        self.after = f"t3_{post_data.id}"
+        self.done_ids.add(post_data.id)
+        self._unsaved += 1
+        if self._unsaved >= self.every:
+            self.save()
+
+    def save(self):
+        """Flushes the partial file to disk, then atomically replaces the state file."""
+        if self._file is None or not self._unsaved:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.offset = self._file.tell()
+        state = {"key": self.key, "after": self.after, "count": self.count, "offset": self.offset, "saved_at": time.time()}
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+        self._unsaved = 0
+
+    def close(self):
+        """Saves any unsaved progress and closes the partial file."""
+        if self._file is not None:
+            self.save()
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """Removes the checkpoint files (and the lock file, keeping the lock held) after a completed scrape."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._remove_files()
+        self._remove_lock_file()
+
+    def _remove_files(self):
+        for path in (self.state_path, self.partial_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def describe(self):
+        return f"{self.count} posts saved in checkpoint '{self.key}'"
@@ -0,0 +1,181 @@
+# backend/columnar_export.py
+import argparse
+import json
+import os
+
+try:
+    from . import lazy_import
+except ImportError:
+    import lazy_import
+
+# pyarrow is optional: only needed for Parquet/Arrow output, and imported on first use
+PYARROW_AVAILABLE = lazy_import.is_available("pyarrow")
+pa = lazy_import.lazy_module("pyarrow")
+pa_ipc = lazy_import.lazy_module("pyarrow.ipc")
+pq = lazy_import.lazy_module("pyarrow.parquet")
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+_INPUT_SUFFIXES = (".ndjson.gz", ".ndjson.zst", ".ndjson", ".json")
+
+def _schemas():
+    timestamp = pa.timestamp("s", tz="UTC") # epoch seconds, not ISO strings
+    posts = pa.schema([
+        ("id", pa.string()),
+        ("subreddit", pa.string()),
+        ("title", pa.string()),
+        ("url", pa.string()),
+        ("body", pa.string()),
+        ("score", pa.int64()),
+        ("upvote_ratio", pa.float32()),
+        ("num_comments", pa.int64()),
+        ("is_over18", pa.bool_()),
+        ("created_utc", timestamp),
+    ])
+    comments = pa.schema([
+        ("post_id", pa.string()),
+        ("id", pa.string()),
+        ("author", pa.string()),
+        ("body", pa.string()),
+        ("score", pa.int64()),
+        ("created_utc", timestamp),
+        ("parent_id", pa.string()),
+        ("depth", pa.int32()),
+    ])
+    return posts, comments
+
+def table_paths(base_path, output_format):
+    """Returns the (posts, comments) table paths for an output stem."""
+    extension = _EXTENSIONS[output_format]
+    return f"{base_path}.posts{extension}", f"{base_path}.comments{extension}"
+
+def comments_path_for(posts_path):
+    """Returns the comments table path that belongs to a posts table path."""
+    return posts_path.replace(".posts.", ".comments.")
+
+class ColumnarWriter:
+    """
+    Writes posts into a 'posts' table and their comments into a 'comments' table (keyed by
+    post_id) as Parquet or Arrow IPC files, buffering batch_size posts per record batch.
+    Takes the same records.Post objects as output_writer.NDJSONWriter.
+    """
+    def __init__(self, posts_path, output_format="parquet", subreddit=None, batch_size=500):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet/Arrow output requires the 'pyarrow' package (pip install pyarrow).")
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unsupported columnar format '{output_format}'. Use 'parquet' or 'arrow'.")
+        self.posts_path = posts_path
+        self.comments_path = comments_path_for(posts_path)
+        self.output_format = output_format
+        self.subreddit = subreddit
+        self.batch_size = batch_size
+        self.count = 0
+        self.comment_count = 0
+        self._posts_schema, self._comments_schema = _schemas()
+        self._posts = {name: [] for name in self._posts_schema.names}
+        self._comments = {name: [] for name in self._comments_schema.names}
+        self._posts_writer = None
+        self._comments_writer = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open_table(self, path, schema):
+        if self.output_format == "parquet":
+            return pq.ParquetWriter(path, schema, compression="zstd")
+        return pa_ipc.new_file(path, schema)
+
+    def open(self):
+        directory = os.path.dirname(self.posts_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._posts_writer = self._open_table(self.posts_path, self._posts_schema)
+        self._comments_writer = self._open_table(self.comments_path, self._comments_schema)
+
+    def write(self, post):
+        """Appends a records.Post; its raw epoch timestamps are stored as-is."""
+        posts = self._posts
+        posts["id"].append(post.id)
+        posts["subreddit"].append(self.subreddit)
+        posts["title"].append(post.title)
+        posts["url"].append(post.url)
+        posts["body"].append(post.body)
+        posts["score"].append(post.score)
+        posts["upvote_ratio"].append(post.upvote_ratio)
+        posts["num_comments"].append(post.num_comments)
+        posts["is_over18"].append(post.is_over18)
+        posts["created_utc"].append(int(post.created_utc))
+        comments = self._comments
+        for comment in post.comments:
+            comments["post_id"].append(post.id)
+            comments["id"].append(comment.id)
+            comments["author"].append(comment.author)
+            comments["body"].append(comment.body)
+            comments["score"].append(comment.score)
+            comments["created_utc"].append(int(comment.created_utc))
+            comments["parent_id"].append(comment.parent_id)
+            comments["depth"].append(comment.depth)
+            self.comment_count += 1
+        self.count += 1
+        if self.count % self.batch_size == 0:
+            self._flush()
+
+    def _flush(self):
+        for columns, schema, writer in (
+            (self._posts, self._posts_schema, self._posts_writer),
+            (self._comments, self._comments_schema, self._comments_writer),
+        ):
+            if columns[schema.names[0]]:
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                for values in columns.values():
+                    values.clear()
+
+    def close(self):
+        if self._posts_writer:
+            self._flush()
+            self._posts_writer.close()
+            self._comments_writer.close()
+            self._posts_writer = self._comments_writer = None
+
+def convert_json_file(json_path, output_format="parquet", subreddit=None):
+    """
+    Converts an existing JSON/NDJSON output file into posts/comments tables. Returns the posts table path.
+    The subreddit column is taken from the file name unless subreddit is given (None if the name does not match).
+    """
+    try:
+        from . import output_writer, records
+    except ImportError:
+        import output_writer, records
+    base_path = json_path
+    for suffix in _INPUT_SUFFIXES:
+        if json_path.endswith(suffix):
+            base_path = json_path[:-len(suffix)]
+            break
+    posts_path, _ = table_paths(base_path, output_format)
+    if not subreddit:
+        subreddit, _, _ = output_writer.parse_output_name(os.path.basename(base_path))
+    if json_path.endswith(".json"):
+        with open(json_path, encoding="utf-8") as f:
+            posts = json.load(f)
+    else:
+        posts = output_writer.iter_ndjson(json_path)
+    with ColumnarWriter(posts_path, output_format, subreddit=subreddit) as writer:
+        for post_data in posts:
+            writer.write(records.as_record(post_data))
+    return posts_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert scraped JSON/NDJSON files into Parquet/Arrow posts and comments tables.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--format", dest="output_format", choices=COLUMNAR_FORMATS, default="parquet")
+    args = parser.parse_args(argv)
+    for path in args.files:
+        print(f"{path} -> {convert_json_file(path, args.output_format)}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,31 +2,46 @@
 import os
 from dotenv import load_dotenv
 
+# Loading stays quiet at import time; messages are kept for report()
+STARTUP_MESSAGES = []
+
 # Load environment variables from .env file in the project root
 # Assumes .env is in the parent directory of 'backend'
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-print(f"Attempting to load .env file from: {dotenv_path}")
+STARTUP_MESSAGES.append(f"Attempting to load .env file from: {dotenv_path}")
 if os.path.exists(dotenv_path):
     if load_dotenv(dotenv_path=dotenv_path):
-        print(".env file loaded successfully.")
+        STARTUP_MESSAGES.append(".env file loaded successfully.")
     else:
-        print("Warning: .env file found but may be empty or failed to load.")
+        STARTUP_MESSAGES.append("Warning: .env file found but may be empty or failed to load.")
 else:
-    print("Warning: .env file not found at expected location. Relying on system environment variables.")
+    STARTUP_MESSAGES.append("Warning: .env file not found at expected location. Relying on system environment variables.")
 
 
 # --- Google API Key ---
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GOOGLE_API_KEY:
-    print("WARNING: GOOGLE_API_KEY not found in environment variables or .env file.")
+    STARTUP_MESSAGES.append("WARNING: GOOGLE_API_KEY not found in environment variables or .env file.")
 
 # --- Reddit API Credentials ---
 REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT")
 
+# API endpoints (override only to point at a local stand-in server)
+REDDIT_OAUTH_URL = os.getenv("REDDIT_OAUTH_URL", "https://oauth.reddit.com")
+REDDIT_URL = os.getenv("REDDIT_URL", "https://www.reddit.com")
+
+# Optional credential pool for comment fetches: 'id:secret,id:secret' or the path of a JSON file
+# with [{"client_id": ..., "client_secret": ..., "user_agent": ...}] (backend/credential_pool.py)
+REDDIT_CREDENTIALS = os.getenv("REDDIT_CREDENTIALS", "")
+CREDENTIAL_REQUESTS_PER_MINUTE = int(os.getenv("CREDENTIAL_REQUESTS_PER_MINUTE", "100")) # Per credential, until rate-limit headers arrive
+CREDENTIAL_BURST = int(os.getenv("CREDENTIAL_BURST", "5"))               # Requests a credential may issue back to back
+CREDENTIAL_MAX_RETRIES = int(os.getenv("CREDENTIAL_MAX_RETRIES", "3"))   # Retries of a throttled (429) request on other credentials
+CREDENTIAL_BACKOFF_SECONDS = float(os.getenv("CREDENTIAL_BACKOFF_SECONDS", "1.0")) # Base of the jittered exponential backoff
+
 if not all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT]):
-     print("WARNING: One or more Reddit API credentials (ID, SECRET, USER_AGENT) not found.")
+     STARTUP_MESSAGES.append("WARNING: One or more Reddit API credentials (ID, SECRET, USER_AGENT) not found.")
 
 # --- ADK / App Configuration ---
 # You can set defaults here if they are not in the .env file
@@ -34,12 +49,119 @@ ADK_MODEL_STRING = os.getenv("ADK_MODEL_STRING", "gemini-2.0-flash") # Default i
 APP_NAME = os.getenv("APP_NAME", "RedditScraperApp")
 USER_ID = os.getenv("USER_ID", "default_user")
 
+# --- Scraper Configuration ---
+# Number of worker threads used to fetch comment forests (1 = serial)
+SCRAPER_MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "1"))
+# Global request budget shared by all workers (0 = no extra throttling beyond PRAW's own)
+REDDIT_REQUESTS_PER_MINUTE = int(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "0"))
+# Scraper backend used by the tool logic: 'thread' (PRAW in a worker thread) or 'async' (asyncpraw)
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "thread")
+# Async backend: max concurrent comment requests per scrape and pooled connections per event loop
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "8"))
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "32"))
+ASYNC_KEEPALIVE_SECONDS = int(os.getenv("ASYNC_KEEPALIVE_SECONDS", "30"))
+
+# Batch scheduler: max scrape jobs running at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# --- Job Queue Workers (backend/job_queue.py) ---
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join("reddit_data", "jobs.sqlite")) # Shared by every worker
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", "2"))   # Worker processes started per machine
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))       # A job whose lease is not renewed for this long is run again
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))         # Idle workers check the queue this often
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))           # Attempts per job before it is marked as an error
+
+# --- Comment Traversal ---
+# Comments kept per post, collected breadth-first; traversal stops as soon as this many are found
+COMMENT_LIMIT = int(os.getenv("COMMENT_LIMIT", "20"))
+COMMENT_MAX_DEPTH = int(os.getenv("COMMENT_MAX_DEPTH", "-1"))     # 0 = top-level only, -1 = unlimited
+COMMENT_MAX_BREADTH = int(os.getenv("COMMENT_MAX_BREADTH", "0"))  # Comments followed per parent at each level (0 = all)
+COMMENT_MIN_SCORE = int(os.getenv("COMMENT_MIN_SCORE")) if os.getenv("COMMENT_MIN_SCORE") else None # Lower-scored subtrees are skipped
+COMMENT_REPLACE_MORE_LIMIT = int(os.getenv("COMMENT_REPLACE_MORE_LIMIT", "0")) # "load more" expansions per post (extra requests)
+COMMENT_FETCH_LIMIT = int(os.getenv("COMMENT_FETCH_LIMIT", "0"))  # Comments requested per post from the API (0 = PRAW default)
+
+# --- Headless API Server (backend/api_server.py) ---
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+API_OUTPUT_DIR = os.getenv("API_OUTPUT_DIR", os.path.join("reddit_data", "api"))     # Each job writes to <dir>/<job id>/
+API_MAX_CONCURRENT_JOBS = int(os.getenv("API_MAX_CONCURRENT_JOBS", "8"))             # Further jobs wait their turn
+API_STREAM_POLL_SECONDS = float(os.getenv("API_STREAM_POLL_SECONDS", "0.25"))        # How often streams check for new posts
+API_JOB_LOG_LINES = int(os.getenv("API_JOB_LOG_LINES", "200"))                       # Log lines kept per job
+
+# --- Historical Backfill (backend/backfill.py) ---
+BACKFILL_SOURCE = os.getenv("BACKFILL_SOURCE", "pushshift") # Window source: pushshift | cloudsearch
+BACKFILL_PUSHSHIFT_URL = os.getenv("BACKFILL_PUSHSHIFT_URL", "https://api.pullpush.io") # Any pushshift-compatible API
+BACKFILL_WINDOW_HOURS = int(os.getenv("BACKFILL_WINDOW_HOURS", "24"))      # Initial time window size
+BACKFILL_WINDOW_CAP = int(os.getenv("BACKFILL_WINDOW_CAP", "1000"))        # Results per window before it is split in half
+BACKFILL_MIN_WINDOW_SECONDS = int(os.getenv("BACKFILL_MIN_WINDOW_SECONDS", "600")) # Windows are never split below this
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))                 # Windows fetched in parallel
+
+# --- Output Configuration ---
+# Streamed NDJSON output is flushed to disk every N posts
+OUTPUT_FLUSH_EVERY = int(os.getenv("OUTPUT_FLUSH_EVERY", "10"))
+# SQLite post/comment store for incremental scrapes (empty = disabled)
+REDDIT_STORE_PATH = os.getenv("REDDIT_STORE_PATH", "")
+
+# --- Checkpoints (backend/checkpoint.py) ---
+# Save listing progress so a failed scrape resumes where it stopped when run again
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "false").lower() in ("1", "true", "yes")
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join("reddit_data", ".checkpoints"))
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "25")) # Posts between checkpoint saves
+CHECKPOINT_MAX_AGE = int(os.getenv("CHECKPOINT_MAX_AGE", "3600")) # Seconds; older checkpoints are discarded, not resumed (0 = no limit)
+
+# --- Text Preprocessing (backend/text_pipeline.py) ---
+# Transform spec applied to every scrape's output, e.g. "drop_deleted,drop_bots,strip_markdown" (empty = raw text)
+PREPROCESS_TRANSFORMS = os.getenv("PREPROCESS_TRANSFORMS", "")
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "0"))        # Worker processes (0 = one per CPU, 1 = no pool)
+PREPROCESS_BATCH_SIZE = int(os.getenv("PREPROCESS_BATCH_SIZE", "64")) # Posts sent to a worker at a time
+
+# --- Dataset Catalog (backend/dataset_catalog.py) ---
+CATALOG_ROOT = os.getenv("CATALOG_ROOT", "reddit_data") # Output directory that is indexed
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join("reddit_data", ".catalog.sqlite"))
+CATALOG_MMAP_FILES = int(os.getenv("CATALOG_MMAP_FILES", "64")) # Output files kept memory-mapped between lookups
+
+# --- Snapshot Store (backend/snapshot_store.py) ---
+# Store each JSON/NDJSON output as a deduplicated snapshot (content blobs shared between scrapes)
+SNAPSHOT_STORE_ENABLED = os.getenv("SNAPSHOT_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+SNAPSHOT_STORE_PATH = os.getenv("SNAPSHOT_STORE_PATH", os.path.join("reddit_data", ".snapshots.sqlite"))
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "") # zlib or zstd (empty = zstd when installed)
+SNAPSHOT_REMOVE_OUTPUT = os.getenv("SNAPSHOT_REMOVE_OUTPUT", "false").lower() in ("1", "true", "yes") # Delete the standalone file once stored
+
+# --- Startup ---
+# Build the PRAW instance (and the ADK runner when the agent is selected) in the background at app start
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# --- Logging (backend/log_sink.py) ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO") # DEBUG adds per-event ADK logs and tool payloads
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", "500")) # Lines kept in the UI log ring buffer
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "200")) # UI log redraw interval
+
+# --- HTTP Response Cache (under the PRAW requestor) ---
+# Mode: off | on (read-through with TTLs) | record | replay (offline, deterministic)
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "off")
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join("reddit_data", ".http_cache"))
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+HTTP_CACHE_TTL_LISTING = int(os.getenv("HTTP_CACHE_TTL_LISTING", "300"))   # seconds, /r/<sub>/top etc.
+HTTP_CACHE_TTL_COMMENTS = int(os.getenv("HTTP_CACHE_TTL_COMMENTS", "900")) # seconds, /comments/<id>
+HTTP_CACHE_TTL_DEFAULT = int(os.getenv("HTTP_CACHE_TTL_DEFAULT", "300"))
+
+# --- Metrics (backend/metrics.py) ---
+# Per-phase timers, HTTP/retry/rate-limit counters and comment-fetch latency histograms
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+# Port for the Prometheus text endpoint at /metrics (0 = no endpoint)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
 # Optional: Set environment variable for GenAI SDK if needed
 # os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "False"
 
-print("Configuration loading complete.")
+STARTUP_MESSAGES.append("Configuration loading complete.")
 # Add checks here if keys are critical
 if not GOOGLE_API_KEY:
-    print("!!! CRITICAL WARNING: GOOGLE_API_KEY is missing. ADK Agent will likely fail. !!!")
+    STARTUP_MESSAGES.append("!!! CRITICAL WARNING: GOOGLE_API_KEY is missing. ADK Agent will likely fail. !!!")
 if not REDDIT_CLIENT_ID:
-    print("!!! CRITICAL WARNING: REDDIT_CLIENT_ID is missing. Reddit connection will fail. !!!")
\ No newline at end of file
+    STARTUP_MESSAGES.append("!!! CRITICAL WARNING: REDDIT_CLIENT_ID is missing. Reddit connection will fail. !!!")
+
+def report(log_callback=print):
+    """Emits the configuration messages collected while loading (.env status, missing keys)."""
+    for message in STARTUP_MESSAGES:
+        log_callback(message)
\ No newline at end of file
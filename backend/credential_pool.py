@@ -0,0 +1,221 @@
+# backend/credential_pool.py
+"""
+Pool of Reddit API credentials. Each credential has its own praw.Reddit instances (one per
+thread using it at a time, as PRAW is not thread-safe) and an
+AdaptiveTokenBucket fed by the x-ratelimit-* headers of its responses. Work is sent to
+whichever credential can issue a request soonest, and a request that is throttled (HTTP 429)
+is retried on another credential after a jittered backoff, so sustained throughput grows with
+the number of credentials instead of being capped by one app's quota.
+Importing this module imports prawcore; import it only when a pool is configured.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+
+import prawcore
+
+try:
+    from . import config, metrics, lazy_import, http_cache, reddit_scraper
+except ImportError:
+    import config, metrics, lazy_import, http_cache, reddit_scraper
+
+praw = lazy_import.lazy_module("praw")
+
+def parse_credentials(value, user_agent=None):
+    """
+    Credentials from REDDIT_CREDENTIALS: either 'id:secret[,id:secret...]' or the path of a
+    JSON file holding a list of {"client_id", "client_secret", "user_agent"} objects.
+    Entries without a user agent use user_agent (default config.REDDIT_USER_AGENT).
+    """
+    user_agent = user_agent or config.REDDIT_USER_AGENT
+    value = (value or "").strip()
+    if not value:
+        return []
+    if os.path.isfile(value):
+        with open(value, encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        entries = []
+        for item in value.split(","):
+            client_id, sep, client_secret = item.strip().partition(":")
+            if not sep or not client_id or not client_secret:
+                raise ValueError("REDDIT_CREDENTIALS entries must look like 'client_id:client_secret'.")
+            entries.append({"client_id": client_id, "client_secret": client_secret})
+    return [Credential(entry["client_id"], entry["client_secret"], entry.get("user_agent") or user_agent) for entry in entries]
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate follows the server's reported budget: after each response
+    the remaining requests are spread over the seconds left in the rate-limit window.
+    Starts at requests_per_minute until the first x-ratelimit-* headers arrive. Not locked;
+    CredentialPool serializes access.
+    """
+    def __init__(self, requests_per_minute=None, burst=None):
+        self.rate = (requests_per_minute or config.CREDENTIAL_REQUESTS_PER_MINUTE) / 60.0
+        self.capacity = float(burst or config.CREDENTIAL_BURST)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self._updated: # _updated is in the future while blocked
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def wait_time(self, now=None):
+        """Seconds until a token is available (0 = now)."""
+        now = time.monotonic() if now is None else now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else math.inf
+
+    def take(self):
+        self.tokens -= 1
+
+    def observe(self, remaining, reset_seconds, now=None):
+        """Adapts to x-ratelimit-remaining / x-ratelimit-reset."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        reset_seconds = max(reset_seconds, 1.0)
+        if remaining < 1:
+            self.block(reset_seconds, now)
+            return
+        self.rate = remaining / reset_seconds
+        self.tokens = min(self.tokens, remaining)
+
+    def block(self, seconds, now=None):
+        """Stops handing out tokens for the given number of seconds (after a 429 or an exhausted window)."""
+        now = time.monotonic() if now is None else now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self._updated = max(self._updated, self.blocked_until)
+
+class Credential:
+    """One Reddit app: its keys, its token bucket and (built on first use) its praw.Reddit instances."""
+    def __init__(self, client_id, client_secret, user_agent, requests_per_minute=None, burst=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.user_agent = user_agent
+        self.bucket = AdaptiveTokenBucket(requests_per_minute, burst)
+        self.clients = None # reddit_scraper.RedditClients
+        self.name = f"{client_id[:4]}…" if len(client_id) > 4 else client_id # for logs and metric labels
+
+class _MeteredRequestor(prawcore.Requestor):
+    """prawcore Requestor that reports the rate-limit headers of every network response to a bucket."""
+    def __init__(self, *args, bucket_observer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket_observer = bucket_observer
+
+    def request(self, *args, **kwargs):
+        response = super().request(*args, **kwargs)
+        if self.bucket_observer:
+            self.bucket_observer(response)
+        return response
+
+class _MeteredCachingRequestor(http_cache.CachingRequestor, _MeteredRequestor):
+    """The HTTP cache over a metered requestor: cache hits never reach the metered layer, so they cost no tokens."""
+
+def _requestor_options(observer, http_cache_mode=None):
+    """praw.Reddit keyword arguments for a metered requestor, under the HTTP cache when it is on."""
+    options = http_cache.requestor_options(http_cache_mode)
+    if not options:
+        return {"requestor_class": _MeteredRequestor, "requestor_kwargs": {"bucket_observer": observer}}
+    return {"requestor_class": _MeteredCachingRequestor,
+            "requestor_kwargs": dict(options["requestor_kwargs"], bucket_observer=observer)}
+
+class CredentialPool:
+    """
+    Spreads Reddit API work over several credentials.
+    call(fn) runs fn(reddit) on the credential whose bucket frees up first. When Reddit answers
+    429, that credential is blocked for the advertised reset time and fn is retried, up to
+    max_retries times, on the next available credential after a full-jitter exponential backoff.
+    """
+    def __init__(self, credentials, http_cache_mode=None, max_retries=None, backoff_seconds=None):
+        if not credentials:
+            raise ValueError("A credential pool needs at least one credential.")
+        self.credentials = list(credentials)
+        self.http_cache_mode = http_cache_mode
+        self.max_retries = config.CREDENTIAL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = config.CREDENTIAL_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def _observer(self, credential):
+        def observe(response):
+            headers = response.headers
+            if response.status_code == 429:
+                reset = headers.get("retry-after") or headers.get("x-ratelimit-reset") or self.backoff_seconds
+                with self._lock:
+                    credential.bucket.block(float(reset))
+            elif "x-ratelimit-remaining" in headers and "x-ratelimit-reset" in headers:
+                with self._lock:
+                    credential.bucket.observe(float(headers["x-ratelimit-remaining"]), float(headers["x-ratelimit-reset"]))
+        return observe
+
+    def clients_for(self, credential):
+        """The credential's reddit_scraper.RedditClients, created on first use."""
+        with self._lock:
+            if credential.clients is None:
+                credential.clients = reddit_scraper.RedditClients(lambda: praw.Reddit(
+                    client_id=credential.client_id,
+                    client_secret=credential.client_secret,
+                    user_agent=credential.user_agent,
+                    oauth_url=config.REDDIT_OAUTH_URL,
+                    reddit_url=config.REDDIT_URL,
+                    **_requestor_options(self._observer(credential), self.http_cache_mode),
+                ))
+            return credential.clients
+
+    def acquire(self, exclude=None):
+        """Blocks until some credential has a token, takes it and returns that credential."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                candidates = [c for c in self.credentials if c is not exclude] or self.credentials
+                credential = min(candidates, key=lambda c: c.bucket.wait_time(now))
+                delay = credential.bucket.wait_time(now)
+                if delay <= 0:
+                    credential.bucket.take()
+                    return credential
+            metrics.inc("sleeps_total", kind="credential_pool")
+            metrics.inc("sleep_seconds_total", min(delay, 1.0), kind="credential_pool")
+            time.sleep(min(delay, 1.0)) # Re-check: another credential may free up first
+
+    def call(self, fn, log_callback=print):
+        """Runs fn(reddit) on an available credential, retrying throttled calls on another one."""
+        previous = None
+        for attempt in range(self.max_retries + 1):
+            credential = self.acquire(exclude=previous)
+            metrics.inc("credential_requests_total", credential=credential.name)
+            try:
+                with self.clients_for(credential).checkout() as reddit:
+                    return fn(reddit)
+            except prawcore.exceptions.TooManyRequests:
+                metrics.inc("credential_throttled_total", credential=credential.name)
+                if attempt == self.max_retries:
+                    raise
+                backoff = random.uniform(0, self.backoff_seconds * 2 ** attempt)
+                log_callback(f"  Warning: Credential {credential.name} was throttled; retrying on another credential in {backoff:.1f}s.")
+                previous = credential
+                time.sleep(backoff)
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_pool():
+    """The process-wide pool built from config.REDDIT_CREDENTIALS, or None when no pool is configured."""
+    global _shared_pool
+    if not config.REDDIT_CREDENTIALS:
+        return None
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = CredentialPool(parse_credentials(config.REDDIT_CREDENTIALS))
+        return _shared_pool
@@ -0,0 +1,581 @@
+# backend/dataset_catalog.py
+"""
+Catalog and query layer over the scrape output directory (reddit_data/ by default).
+
+refresh() maintains a SQLite index of every JSON and NDJSON output file: the byte offset and
+length of each post, plus its subreddit (from the file name), created_utc, score and
+num_comments. Only new or changed files are read; NDJSON files that grew are indexed from
+where the last refresh stopped. After a refresh that changed anything, the latest snapshot of
+every post is also written as NumPy column files sorted by (subreddit, created_utc), so a
+subreddit/time-range partition is a contiguous slice found by binary search.
+Queries then never parse whole files: get_post() reads one post through a memory map of its
+file, columns()/aggregate() work on memory-mapped column slices, and top_comments() decodes
+only the posts of the requested partition.
+
+A post scraped in several snapshots is indexed once per file; queries use its most recent
+snapshot unless latest=False. Compressed NDJSON and Parquet/Arrow files cannot be memory
+mapped and are not indexed.
+"""
+import argparse
+import collections
+import datetime
+import heapq
+import json
+import mmap
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import threading
+import time
+
+try:
+    from . import config, lazy_import, records, backfill, output_writer
+except ImportError:
+    import config, lazy_import, records, backfill, output_writer
+
+NUMPY_AVAILABLE = lazy_import.is_available("numpy")
+np = lazy_import.lazy_module("numpy")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    indexed_bytes INTEGER NOT NULL,
+    subreddit TEXT,
+    time_filter TEXT,
+    snapshot_at REAL NOT NULL,
+    posts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    subreddit TEXT,
+    snapshot_at REAL NOT NULL,
+    created_utc REAL,
+    score INTEGER,
+    num_comments INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_posts_id ON posts (post_id, snapshot_at);
+CREATE INDEX IF NOT EXISTS idx_posts_partition ON posts (subreddit, created_utc);
+CREATE INDEX IF NOT EXISTS idx_posts_file ON posts (file_id);
+"""
+
+_SIDECAR_SUFFIXES = (".metrics.json", ".delta.json", ".state.json")
+_SEPARATOR = re.compile(r"[\s,]*")
+
+_COLUMNS = ("post_id", "score", "num_comments", "created_utc")
+_BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+def _parse_name(filename):
+    """(subreddit, time_filter, snapshot epoch or None) from an output file name."""
+    subreddit, time_filter, snapshot_at = output_writer.parse_output_name(filename)
+    return (subreddit.lower() if subreddit else None), time_filter, snapshot_at
+
+def _format_of(filename):
+    """'json' or 'ndjson' for output files the catalog can index, else None."""
+    if filename.endswith(".ndjson"):
+        return "ndjson"
+    if filename.endswith(".json") and not filename.endswith(_SIDECAR_SUFFIXES):
+        return "json"
+    return None
+
+def _fields(record):
+    """(post_id, created_utc, score, num_comments) of a post dict, or None if it is not a post."""
+    if not isinstance(record, dict) or "id" not in record:
+        return None
+    created = record.get("created_utc")
+    try:
+        created = records._epoch(created) if created is not None else None
+    except ValueError:
+        created = None
+    return str(record["id"]), created, record.get("score"), record.get("num_comments")
+
+def _scan_ndjson(data, start):
+    """Yields (record, offset, length) for every complete line of data from byte start on."""
+    position = start
+    end = len(data)
+    while position < end:
+        newline = data.find(b"\n", position)
+        if newline < 0:
+            return # Partial last line: a writer is still appending it
+        line = data[position:newline]
+        if line.strip():
+            yield json.loads(line), position, len(line)
+        position = newline + 1
+
+def _scan_json(data):
+    """
+    Yields (record, offset, length) for every element of a JSON array. Elements are decoded
+    in place from the text and their byte offsets tracked alongside, so non-ASCII content
+    (the output is written with ensure_ascii=False) keeps the offsets exact.
+    """
+    text = data.decode("utf-8")
+    opening = text.find("[")
+    if opening < 0 or text[:opening].strip():
+        return # Not a JSON array (some other .json file)
+    decoder = json.JSONDecoder()
+    position = opening + 1
+    byte = len(text[:position].encode("utf-8"))
+    while True:
+        start = _SEPARATOR.match(text, position).end()
+        if start >= len(text) or text[start] == "]":
+            return
+        record, end = decoder.raw_decode(text, start)
+        offset = byte + len(text[position:start].encode("utf-8"))
+        length = len(text[start:end].encode("utf-8"))
+        yield record, offset, length
+        byte, position = offset + length, end
+
+class _MappedFiles:
+    """
+    Small LRU cache of read-only memory maps. A map is rebuilt when the file has grown past it
+    or shrunk under it (touching a mapped page past the end of a truncated file is a SIGBUS).
+    """
+    def __init__(self, capacity):
+        self.capacity = max(capacity, 1)
+        self._maps = collections.OrderedDict() # path -> (file, mmap)
+        self._lock = threading.Lock()
+
+    def read(self, path, offset, length):
+        with self._lock:
+            entry = self._maps.pop(path, None)
+            if entry is not None and (offset + length > len(entry[1]) or os.fstat(entry[0].fileno()).st_size != len(entry[1])):
+                self._close(entry)
+                entry = None
+            if entry is None:
+                f = open(path, "rb")
+                try:
+                    entry = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                except ValueError: # empty file
+                    f.close()
+                    raise
+            self._maps[path] = entry
+            while len(self._maps) > self.capacity:
+                self._close(self._maps.popitem(last=False)[1])
+            return entry[1][offset:offset + length]
+
+    @staticmethod
+    def _close(entry):
+        entry[1].close()
+        entry[0].close()
+
+    def close(self):
+        with self._lock:
+            for entry in self._maps.values():
+                self._close(entry)
+            self._maps.clear()
+
+class StaleIndexError(LookupError):
+    """An indexed offset no longer points at the expected post; run refresh()."""
+
+class DatasetCatalog:
+    """
+    Index of the scrape outputs under root, stored in the SQLite file at index_path
+    (default config.CATALOG_PATH). Paths are stored relative to root, so the directory can be
+    moved together with its index. Safe to share between threads (one connection behind a lock).
+    """
+    def __init__(self, root=None, index_path=None, mmap_files=None):
+        self.root = os.path.abspath(root or config.CATALOG_ROOT)
+        self.index_path = index_path or config.CATALOG_PATH
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._maps = _MappedFiles(mmap_files or config.CATALOG_MMAP_FILES)
+        self.columns_dir = f"{self.index_path}.columns"
+        self._columns = None # (current.json mtime, partitions, memory-mapped arrays)
+
+    def close(self):
+        self._maps.close()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Indexing ---
+
+    def _candidates(self):
+        """Yields (relative path, format) of every indexable file; hidden directories (.staging, .checkpoints, caches) are skipped."""
+        for directory, subdirs, filenames in os.walk(self.root):
+            subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+            for filename in sorted(filenames):
+                file_format = _format_of(filename)
+                if file_format:
+                    yield os.path.relpath(os.path.join(directory, filename), self.root), file_format
+
+    def refresh(self, log_callback=None):
+        """
+        Brings the index up to date with the files under root and returns counts of the files
+        added, updated (re-indexed), appended to (NDJSON grown in place), removed and unchanged.
+        """
+        summary = dict.fromkeys(("added", "updated", "appended", "removed", "unchanged"), 0)
+        with self._lock:
+            known = {row["path"]: row for row in self._conn.execute("SELECT * FROM files")}
+            seen = set()
+            for path, file_format in self._candidates():
+                seen.add(path)
+                try:
+                    stat = os.stat(os.path.join(self.root, path))
+                except FileNotFoundError:
+                    continue # Moved away (e.g. a staging rename) during the walk
+                row = known.get(path)
+                if row is not None and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+                    summary["unchanged"] += 1
+                    continue
+                appending = (row is not None and file_format == "ndjson" and row["format"] == "ndjson"
+                             and stat.st_size >= row["indexed_bytes"])
+                try:
+                    self._index_file(path, file_format, stat, row if appending else None, row)
+                except (ValueError, UnicodeDecodeError) as e: # json.JSONDecodeError is a ValueError
+                    if log_callback:
+                        log_callback(f"  Warning: Could not index {path}: {e}")
+                    continue
+                summary["appended" if appending else "updated" if row is not None else "added"] += 1
+            with self._conn:
+                for path in set(known) - seen:
+                    self._conn.execute("DELETE FROM posts WHERE file_id = ?", (known[path]["id"],))
+                    self._conn.execute("DELETE FROM files WHERE id = ?", (known[path]["id"],))
+                    summary["removed"] += 1
+            changed = any(summary[key] for key in ("added", "updated", "appended", "removed"))
+            if NUMPY_AVAILABLE and (changed or not os.path.exists(os.path.join(self.columns_dir, "current.json"))):
+                self._write_columns()
+        if log_callback:
+            log_callback(f"Catalog refreshed: {summary['added']} added, {summary['updated']} updated, "
+                         f"{summary['appended']} appended, {summary['removed']} removed, {summary['unchanged']} unchanged.")
+        return summary
+
+    def _index_file(self, path, file_format, stat, append_from, previous):
+        """(Re-)indexes one file; with append_from set, only the NDJSON lines after its indexed_bytes are read."""
+        subreddit, time_filter, snapshot_at = _parse_name(os.path.basename(path))
+        snapshot_at = snapshot_at or stat.st_mtime
+        start = append_from["indexed_bytes"] if append_from is not None else 0
+        with open(os.path.join(self.root, path), "rb") as f:
+            f.seek(start)
+            data = f.read(stat.st_size - start)
+        scanned = _scan_ndjson(data, 0) if file_format == "ndjson" else _scan_json(data)
+        rows = []
+        indexed_bytes = start
+        for record, offset, length in scanned:
+            indexed_bytes = start + offset + length + (1 if file_format == "ndjson" else 0)
+            fields = _fields(record)
+            if fields:
+                post_id, created, score, num_comments = fields
+                rows.append((post_id, start + offset, length, subreddit, snapshot_at, created, score, num_comments))
+        if file_format == "json":
+            indexed_bytes = stat.st_size
+        with self._conn:
+            if previous is not None and append_from is None:
+                self._conn.execute("DELETE FROM posts WHERE file_id = ?", (previous["id"],))
+            if previous is None:
+                file_id = self._conn.execute(
+                    "INSERT INTO files (path, format, size, mtime, indexed_bytes, subreddit, time_filter, snapshot_at, posts) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, file_format, stat.st_size, stat.st_mtime, indexed_bytes, subreddit, time_filter, snapshot_at, len(rows)),
+                ).lastrowid
+            else:
+                file_id = previous["id"]
+                total = len(rows) + (previous["posts"] if append_from is not None else 0)
+                self._conn.execute(
+                    "UPDATE files SET format = ?, size = ?, mtime = ?, indexed_bytes = ?, subreddit = ?, time_filter = ?, "
+                    "snapshot_at = ?, posts = ? WHERE id = ?",
+                    (file_format, stat.st_size, stat.st_mtime, indexed_bytes, subreddit, time_filter, snapshot_at, total, file_id),
+                )
+            self._conn.executemany(
+                "INSERT INTO posts (file_id, post_id, offset, length, subreddit, snapshot_at, created_utc, score, num_comments) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(file_id,) + row for row in rows],
+            )
+
+    def _write_columns(self):
+        """
+        Writes the latest snapshot of every post as one .npy file per column, sorted by
+        (subreddit, created_utc), in a new generation directory, then points current.json at it.
+        Readers that still map the previous generation keep working; older ones are removed.
+        Called with the lock held.
+        """
+        rows = self._conn.execute(
+            "SELECT COALESCE(subreddit, ''), COALESCE(created_utc, 0), COALESCE(score, 0), COALESCE(num_comments, 0), "
+            "post_id, MAX(snapshot_at) FROM posts GROUP BY post_id ORDER BY 1, 2"
+        ).fetchall()
+        subreddits, created, scores, num_comments, post_ids = (list(column) for column in list(zip(*rows))[:5]) if rows else ([],) * 5
+        generation = str(time.time_ns())
+        directory = os.path.join(self.columns_dir, generation)
+        os.makedirs(directory)
+        arrays = {
+            "post_id": np.asarray(post_ids, dtype=str),
+            "score": np.asarray(scores, dtype=np.int64),
+            "num_comments": np.asarray(num_comments, dtype=np.int64),
+            "created_utc": np.asarray(created, dtype=np.float64),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        partitions = {}
+        for index, subreddit in enumerate(subreddits):
+            partitions.setdefault(subreddit, [index, index])[1] = index + 1
+        meta_path = os.path.join(self.columns_dir, "current.json")
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "posts": len(rows), "partitions": partitions}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        previous = sorted(name for name in os.listdir(self.columns_dir) if name.isdigit() and name != generation)
+        for name in previous[:-1]:
+            shutil.rmtree(os.path.join(self.columns_dir, name), ignore_errors=True)
+
+    def _column_store(self):
+        """(partitions, memory-mapped column arrays) of the current generation, built on first use."""
+        meta_path = os.path.join(self.columns_dir, "current.json")
+        with self._lock:
+            if not os.path.exists(meta_path):
+                self._write_columns()
+            mtime = os.stat(meta_path).st_mtime_ns
+            if self._columns is None or self._columns[0] != mtime:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                directory = os.path.join(self.columns_dir, meta["generation"])
+                arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in _COLUMNS}
+                self._columns = (mtime, meta["partitions"], arrays)
+            return self._columns[1], self._columns[2]
+
+    # --- Lookups ---
+
+    def locate(self, post_id):
+        """Every indexed copy of a post, newest snapshot first, as dicts with the file path, offset and length."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.post_id, f.path, p.offset, p.length, p.subreddit, p.snapshot_at, p.created_utc, p.score, p.num_comments "
+                "FROM posts p JOIN files f ON f.id = p.file_id WHERE p.post_id = ? ORDER BY p.snapshot_at DESC",
+                (post_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _read(self, path, offset, length, post_id=None):
+        """Decodes one post from the memory map of its file."""
+        try:
+            record = json.loads(self._maps.read(os.path.join(self.root, path), offset, length))
+        except (OSError, ValueError) as e:
+            raise StaleIndexError(f"Could not read post {post_id or ''} at {path}:{offset} ({e}); refresh the catalog.") from e
+        if post_id is not None and (not isinstance(record, dict) or str(record.get("id")) != post_id):
+            raise StaleIndexError(f"{path} changed since it was indexed; refresh the catalog.")
+        return record
+
+    def get_post(self, post_id, all_snapshots=False):
+        """
+        The post dict from its most recent snapshot (None if it is not indexed), or with
+        all_snapshots=True the list of every copy, newest first.
+        """
+        locations = self.locate(post_id)
+        if not all_snapshots:
+            return self._read(locations[0]["path"], locations[0]["offset"], locations[0]["length"], post_id) if locations else None
+        return [self._read(loc["path"], loc["offset"], loc["length"], post_id) for loc in locations]
+
+    # --- Partitions and aggregations ---
+
+    def _select(self, columns, subreddit=None, start=None, end=None, latest=True):
+        """Rows of the subreddit/time-range partition; with latest=True, only each post's newest snapshot."""
+        where, params = [], []
+        if subreddit:
+            where.append("p.subreddit = ?")
+            params.append(subreddit.lower())
+        if start is not None:
+            where.append("p.created_utc >= ?")
+            params.append(backfill.to_epoch(start))
+        if end is not None:
+            where.append("p.created_utc < ?")
+            params.append(backfill.to_epoch(end))
+        if latest:
+            where.append("p.snapshot_at = (SELECT MAX(q.snapshot_at) FROM posts q WHERE q.post_id = p.post_id)")
+        sql = f"SELECT {columns} FROM posts p JOIN files f ON f.id = p.file_id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if latest:
+            sql += " GROUP BY p.post_id" # two files written in the same second
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def columns(self, subreddit=None, start=None, end=None, latest=True):
+        """
+        post_id, score, num_comments and created_utc of every post in the partition as NumPy
+        arrays (plain lists when NumPy is not installed), in the same order. With latest=True
+        these are read-only slices of the memory-mapped column files.
+        """
+        if latest and NUMPY_AVAILABLE:
+            partitions, arrays = self._column_store()
+            if subreddit:
+                first, stop = partitions.get(subreddit.lower(), (0, 0))
+                created = arrays["created_utc"][first:stop] # sorted within a subreddit
+                low = np.searchsorted(created, backfill.to_epoch(start)) if start is not None else 0
+                high = np.searchsorted(created, backfill.to_epoch(end)) if end is not None else len(created)
+                selection = slice(first + low, first + high)
+            elif start is not None or end is not None:
+                created = arrays["created_utc"]
+                mask = np.ones(len(created), dtype=bool)
+                if start is not None:
+                    mask &= created >= backfill.to_epoch(start)
+                if end is not None:
+                    mask &= created < backfill.to_epoch(end)
+                selection = np.flatnonzero(mask)
+            else:
+                selection = slice(None)
+            return {name: arrays[name][selection] for name in _COLUMNS}
+        rows = self._select("p.post_id, COALESCE(p.score, 0), COALESCE(p.num_comments, 0), COALESCE(p.created_utc, 0)",
+                            subreddit, start, end, latest)
+        post_ids, scores, num_comments, created = (list(column) for column in zip(*rows)) if rows else ([],) * 4
+        if not NUMPY_AVAILABLE:
+            return {"post_id": post_ids, "score": scores, "num_comments": num_comments, "created_utc": created}
+        return {
+            "post_id": np.asarray(post_ids, dtype=str),
+            "score": np.asarray(scores, dtype=np.int64),
+            "num_comments": np.asarray(num_comments, dtype=np.int64),
+            "created_utc": np.asarray(created, dtype=np.float64),
+        }
+
+    def aggregate(self, subreddit=None, start=None, end=None, latest=True, by=None):
+        """
+        Summary statistics of score and num_comments over the partition. With by='hour', 'day'
+        or 'week', returns one summary per created_utc bucket (UTC), oldest first.
+        """
+        if by is not None and by not in _BUCKET_SECONDS:
+            raise ValueError(f"Unsupported bucket '{by}'. Use one of: {', '.join(_BUCKET_SECONDS)}.")
+        data = self.columns(subreddit, start, end, latest)
+        if by is None:
+            return _summary(data["score"], data["num_comments"], data["created_utc"])
+        if not NUMPY_AVAILABLE:
+            return _python_buckets(data, _BUCKET_SECONDS[by])
+        buckets, inverse = np.unique((data["created_utc"] // _BUCKET_SECONDS[by]).astype(np.int64), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(buckets))
+        score_sums = np.bincount(inverse, weights=data["score"], minlength=len(buckets))
+        comment_sums = np.bincount(inverse, weights=data["num_comments"], minlength=len(buckets))
+        score_max = np.full(len(buckets), np.iinfo(np.int64).min)
+        np.maximum.at(score_max, inverse, data["score"])
+        return [
+            {"bucket_start": records._iso(int(bucket) * _BUCKET_SECONDS[by]), "count": int(count),
+             "score_sum": int(score_sum), "score_mean": float(score_sum / count), "score_max": int(top),
+             "num_comments_sum": int(comment_sum), "num_comments_mean": float(comment_sum / count)}
+            for bucket, count, score_sum, top, comment_sum in zip(buckets, counts, score_sums, score_max, comment_sums)
+        ]
+
+    def partitions(self):
+        """Post counts and created_utc ranges per subreddit and month (latest snapshot of each post)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT subreddit, strftime('%Y-%m', created_utc, 'unixepoch') AS month, COUNT(*) AS posts, "
+                "MIN(created_utc) AS first_created, MAX(created_utc) AS last_created "
+                "FROM (SELECT subreddit, created_utc FROM posts GROUP BY post_id) "
+                "GROUP BY subreddit, month ORDER BY subreddit, month"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def top_comments(self, subreddit=None, start=None, end=None, n=10):
+        """
+        The n highest-scored comments of the posts in the partition (latest snapshots), each
+        with its post_id. Only the posts of the partition are decoded.
+        """
+        rows = self._select("p.post_id, f.path, p.offset, p.length", subreddit, start, end, latest=True)
+        def comments():
+            for row in rows:
+                post = self._read(row["path"], row["offset"], row["length"], row["post_id"])
+                for comment in post.get("comments") or ():
+                    yield dict(comment, post_id=row["post_id"])
+        return heapq.nlargest(n, comments(), key=lambda comment: comment.get("score") or 0)
+
+    def stats(self):
+        """Number of indexed files and post copies."""
+        with self._lock:
+            files, posts = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(posts), 0) FROM files").fetchone()
+            unique = self._conn.execute("SELECT COUNT(DISTINCT post_id) FROM posts").fetchone()[0]
+        return {"root": self.root, "index": self.index_path, "files": files, "post_copies": posts, "unique_posts": unique}
+
+def _summary(scores, num_comments, created):
+    """Summary of one group of posts; NumPy arrays or, without NumPy, lists."""
+    if not len(scores):
+        return {"count": 0}
+    if NUMPY_AVAILABLE:
+        score_p50, score_p90 = np.percentile(scores, [50, 90])
+        return {
+            "count": int(len(scores)),
+            "score": {"sum": int(scores.sum()), "mean": float(scores.mean()), "median": float(score_p50),
+                      "p90": float(score_p90), "max": int(scores.max())},
+            "num_comments": {"sum": int(num_comments.sum()), "mean": float(num_comments.mean()), "max": int(num_comments.max())},
+            "created_utc": {"first": records._iso(float(created.min())), "last": records._iso(float(created.max()))},
+        }
+    return {
+        "count": len(scores),
+        "score": {"sum": sum(scores), "mean": statistics.fmean(scores), "median": float(statistics.median(scores)),
+                  "p90": statistics.quantiles(scores, n=10, method="inclusive")[-1] if len(scores) > 1 else float(scores[0]),
+                  "max": max(scores)},
+        "num_comments": {"sum": sum(num_comments), "mean": statistics.fmean(num_comments), "max": max(num_comments)},
+        "created_utc": {"first": records._iso(min(created)), "last": records._iso(max(created))},
+    }
+
+def _python_buckets(data, seconds):
+    groups = collections.defaultdict(list)
+    for score, comments, created in zip(data["score"], data["num_comments"], data["created_utc"]):
+        groups[int(created // seconds)].append((score, comments))
+    result = []
+    for bucket in sorted(groups):
+        scores, comments = zip(*groups[bucket])
+        result.append({"bucket_start": records._iso(bucket * seconds), "count": len(scores),
+                       "score_sum": sum(scores), "score_mean": sum(scores) / len(scores), "score_max": max(scores),
+                       "num_comments_sum": sum(comments), "num_comments_mean": sum(comments) / len(comments)})
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index and query the scrape outputs without re-parsing every file.")
+    parser.add_argument("--root", default=None, help="Output directory to index (default CATALOG_ROOT)")
+    parser.add_argument("--index", default=None, help="Index database (default CATALOG_PATH)")
+    parser.add_argument("--no-refresh", action="store_true", help="Query the index as it is, without checking for new files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("refresh", help="Index new and changed output files")
+    get = commands.add_parser("get", help="Print a post by id")
+    get.add_argument("post_id")
+    get.add_argument("--all", action="store_true", help="Every snapshot of the post, newest first")
+
+    def partition_args(command):
+        command.add_argument("--subreddit", default=None)
+        command.add_argument("--start", default=None, help="created_utc lower bound (epoch, YYYY-MM-DD or ISO-8601; naive = UTC)")
+        command.add_argument("--end", default=None, help="created_utc upper bound, exclusive")
+        return command
+
+    stats = partition_args(commands.add_parser("stats", help="Score and comment-count statistics of a partition"))
+    stats.add_argument("--by", choices=sorted(_BUCKET_SECONDS), default=None, help="One summary per time bucket")
+    stats.add_argument("--all-snapshots", action="store_true", help="Count every snapshot of a post, not only the latest")
+    top = partition_args(commands.add_parser("top-comments", help="Highest-scored comments of a partition"))
+    top.add_argument("-n", type=int, default=10)
+    commands.add_parser("partitions", help="Post counts per subreddit and month")
+    args = parser.parse_args(argv)
+
+    with DatasetCatalog(args.root, args.index) as catalog:
+        if args.command == "refresh" or not args.no_refresh:
+            catalog.refresh(log_callback=print if args.command == "refresh" else None)
+        if args.command == "refresh":
+            result = catalog.stats()
+        elif args.command == "get":
+            result = catalog.get_post(args.post_id, all_snapshots=args.all)
+            if not result:
+                print(f"Post {args.post_id} is not in the catalog.")
+                return 1
+        elif args.command == "stats":
+            result = catalog.aggregate(args.subreddit, args.start, args.end, latest=not args.all_snapshots, by=args.by)
+        elif args.command == "top-comments":
+            result = catalog.top_comments(args.subreddit, args.start, args.end, n=args.n)
+        else:
+            result = catalog.partitions()
+    print(json.dumps(result, indent=4, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
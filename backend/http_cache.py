@@ -0,0 +1,243 @@
+# backend/http_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import prawcore
+from prawcore.exceptions import RequestException
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from . import config
+except ImportError:
+    import config
+
+CACHE_MODES = ("off", "on", "record", "replay")
+
+# Rate-limit headers describe the live quota, so they are never replayed from the cache
+_STRIPPED_HEADERS = ("x-ratelimit-remaining", "x-ratelimit-used", "x-ratelimit-reset")
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a request has no recorded response."""
+
+def endpoint_kind(url):
+    """Classifies a Reddit API URL into the endpoint groups that get their own TTL."""
+    path = urlsplit(url).path
+    if path.endswith("/access_token"):
+        return "token"
+    if "/comments/" in path:
+        return "comments"
+    if path.startswith("/r/") or path.startswith("/user/"):
+        return "listing"
+    return "default"
+
+def cache_key(method, url, params=None):
+    """Content address of a request: sha256 over method, URL and sorted query params."""
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return hashlib.sha256(f"{method.upper()} {url}?{query}".encode("utf-8")).hexdigest()
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class DiskCache:
+    """
+    Content-addressed on-disk response store with per-endpoint TTLs and a size cap.
+    Entries are '<dir>/<key[:2]>/<key>'; the file mtime is the last access time, and the
+    least recently used entries are evicted once the cache grows past max_bytes.
+    Each file holds one JSON metadata line followed by the raw response body.
+    """
+    def __init__(self, cache_dir, max_bytes=None, ttls=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes if max_bytes is not None else config.HTTP_CACHE_MAX_MB * 1024 * 1024
+        self.ttls = ttls or {
+            "listing": config.HTTP_CACHE_TTL_LISTING,
+            "comments": config.HTTP_CACHE_TTL_COMMENTS,
+            "default": config.HTTP_CACHE_TTL_DEFAULT,
+        }
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = {} # key -> [size, last_access]
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"): # left behind by an interrupted put
+                    _remove(entry.path)
+                    continue
+                stat = entry.stat()
+                self._entries[entry.name] = [stat.st_size, stat.st_mtime]
+                self._total_bytes += stat.st_size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key, kind="default", ignore_ttl=False):
+        """Returns (meta, body) for a fresh entry, or None. Counts a hit or a miss."""
+        # Only the index is locked; entries are replaced atomically, so reads need no lock
+        path = self._path(key)
+        with self._lock:
+            known = key in self._entries
+            if not known:
+                self.misses += 1
+        if not known:
+            return None
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                stale = self._drop(key)
+                self.misses += 1
+            _remove(stale)
+            return None
+        ttl = self.ttls.get(kind, self.ttls["default"])
+        if not ignore_ttl and time.time() - meta["stored_at"] > ttl:
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][1] = now
+            self.hits += 1
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass # Evicted meanwhile
+        return meta, body
+
+    def put(self, key, meta, body):
+        path = self._path(key)
+        line = json.dumps(dict(meta, stored_at=time.time())).encode("utf-8") + b"\n"
+        size = len(line) + len(body)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(line)
+            f.write(body)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][0]
+            self._entries[key] = [size, time.time()]
+            self._total_bytes += size
+            self.stores += 1
+            evicted = self._evict()
+        for evicted_path in evicted:
+            _remove(evicted_path)
+
+    def _drop(self, key):
+        """Removes key from the index and returns its path, for the caller to delete outside the lock."""
+        size, _ = self._entries.pop(key, (0, 0))
+        self._total_bytes -= size
+        return self._path(key)
+
+    def _evict(self):
+        """Drops least recently used entries from the index; returns the paths to delete."""
+        if not self.max_bytes or self._total_bytes <= self.max_bytes:
+            return []
+        # Evict least recently used entries down to 90% of the cap
+        target = self.max_bytes * 0.9
+        paths = []
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= target:
+                break
+            paths.append(self._drop(key))
+            self.evictions += 1
+        return paths
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+class CachingRequestor(prawcore.Requestor):
+    """
+    prawcore Requestor that serves responses from a DiskCache.
+    Modes: 'on' caches successful GETs with per-endpoint TTLs; 'record' always goes to
+    the network and stores every successful response (including the OAuth token);
+    'replay' serves only recorded responses, ignoring TTLs, and never touches the network.
+    """
+    def __init__(self, *args, cache=None, mode="on", **kwargs):
+        super().__init__(*args, **kwargs)
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported HTTP cache mode '{mode}'. Use one of: {', '.join(CACHE_MODES)}.")
+        self.cache = cache
+        self.mode = mode
+
+    def _cacheable(self, method, kind):
+        if self.mode in ("record", "replay"):
+            return method.upper() == "GET" or kind == "token"
+        return method.upper() == "GET" and kind != "token"
+
+    def request(self, method, url, *args, timeout=None, **kwargs):
+        kind = endpoint_kind(url)
+        if not self.cache or self.mode == "off" or not self._cacheable(method, kind):
+            return super().request(method, url, *args, timeout=timeout, **kwargs)
+
+        key = cache_key(method, url, kwargs.get("params"))
+        if self.mode != "record":
+            cached = self.cache.get(key, kind, ignore_ttl=self.mode == "replay")
+            if cached:
+                return _build_response(url, *cached)
+            if self.mode == "replay":
+                raise RequestException(CacheMissError(f"No recorded response for {method.upper()} {url}"), (method, url), kwargs)
+
+        response = super().request(method, url, *args, timeout=timeout, **kwargs)
+        if response.status_code == 200:
+            self.cache.put(key, {"status": response.status_code, "url": url, "headers": dict(response.headers)}, response.content)
+        return response
+
+def _build_response(url, meta, body):
+    response = Response()
+    response.status_code = meta["status"]
+    response.url = meta.get("url", url)
+    response.headers = CaseInsensitiveDict({k: v for k, v in meta["headers"].items() if k.lower() not in _STRIPPED_HEADERS})
+    # The stored body is already decoded
+    response.headers.pop("content-encoding", None)
+    response.headers["content-length"] = str(len(body))
+    response._content = body
+    response.encoding = "utf-8"
+    return response
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache():
+    """Returns the process-wide DiskCache at config.HTTP_CACHE_DIR, creating it on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = DiskCache(config.HTTP_CACHE_DIR)
+        return _shared_cache
+
+def requestor_options(mode=None):
+    """Returns the praw.Reddit keyword arguments that install the cache, or {} when it is off."""
+    mode = mode or config.HTTP_CACHE_MODE
+    if mode == "off":
+        return {}
+    return {"requestor_class": CachingRequestor, "requestor_kwargs": {"cache": get_shared_cache(), "mode": mode}}
@@ -0,0 +1,381 @@
+# backend/job_queue.py
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import time
+import traceback
+import uuid
+
+try:
+    from . import config, reddit_scraper, reddit_async_scraper, reddit_adk_tool, batch_scheduler, checkpoint
+except ImportError:
+    import config, reddit_scraper, reddit_async_scraper, reddit_adk_tool, batch_scheduler, checkpoint
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subreddit TEXT NOT NULL,
+    time_filter TEXT NOT NULL,
+    post_limit INTEGER NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    output_format TEXT NOT NULL DEFAULT 'json',
+    compression TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    created_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    output_path TEXT,
+    posts INTEGER,
+    comments INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority DESC, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    """
+    Durable scrape-job queue in a SQLite file, shared by worker processes on one machine or on
+    several machines that mount the same filesystem (no broker needed).
+    Jobs move through the batch_scheduler.JOB_STATUSES: claim() leases the highest-priority
+    queued job to a worker until lease_expires, heartbeat() extends the lease while the job
+    runs, and a job whose lease ran out (its worker crashed) is claimed again by the next worker,
+    up to max_attempts times. Leases use wall-clock time, so hosts sharing a queue need
+    roughly synchronized clocks.
+    """
+    def __init__(self, path=None):
+        self.path = path or config.JOB_QUEUE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; write transactions are opened explicitly with BEGIN IMMEDIATE.
+        # The default rollback journal (not WAL) also works on network filesystems.
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        # Random id of this queue database: job ids restart at 1 in a new database, job keys must not
+        self._write("INSERT OR IGNORE INTO meta (key, value) VALUES ('queue_id', ?)", (uuid.uuid4().hex[:8],))
+        self.queue_id = self._conn.execute("SELECT value FROM meta WHERE key = 'queue_id'").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, sql, params=()):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self._conn.execute(sql, params)
+            self._conn.execute("COMMIT")
+            return cursor
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, subreddit, time_filter="week", limit=50, priority=0, output_format="json",
+                compression=None, max_attempts=None):
+        """Adds a job and returns its id."""
+        cursor = self._write(
+            "INSERT INTO jobs (subreddit, time_filter, post_limit, priority, output_format, compression, max_attempts, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (subreddit, time_filter or "week", int(limit or 50), int(priority or 0), output_format, compression,
+             max_attempts or config.JOB_MAX_ATTEMPTS, time.time()),
+        )
+        return cursor.lastrowid
+
+    def claim(self, worker, lease_seconds=None):
+        """Leases the next runnable job to worker and returns it as a dict, or None if there is none."""
+        lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died on their last attempt are given up
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', finished_at = ?, error = 'Lease expired on the last attempt (worker lost).' "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row["id"]),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job.update(status="running", worker=worker, attempts=row["attempts"] + 1)
+        return job
+
+    def heartbeat(self, job_id, worker, lease_seconds=None):
+        """Extends the lease. Returns False if the worker no longer holds the job."""
+        lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        cursor = self._write(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + lease_seconds, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, output_path, posts, comments):
+        """Marks a job done. Returns False (and changes nothing) if the worker lost its lease."""
+        cursor = self._write(
+            "UPDATE jobs SET status = 'success', finished_at = ?, output_path = ?, posts = ?, comments = ?, error = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), output_path, posts, comments, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error):
+        """Records a failed attempt: the job is queued again until it runs out of attempts."""
+        cursor = self._write(
+            "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'error' END, "
+            "finished_at = ?, error = ?, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), error, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def jobs(self, status=None):
+        if status:
+            rows = self._conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,))
+        else:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id")
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        counts = dict.fromkeys(batch_scheduler.JOB_STATUSES, 0)
+        for row in self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+def _publish(staging_dir, output_dir, main_path):
+    """
+    Moves a finished job's files from its staging directory into output_dir with os.replace
+    (atomic on one filesystem). The main output file goes last, so once it is visible its
+    sidecars (comments table, metrics, delta) are too. Returns the main file's final path.
+    Staging names are only unique per worker, so the files are published under the first free
+    stem ('<stem>', '<stem>_2', ...) in output_dir. A stem is claimed with an exclusively created
+    '.<stem>.publishing' marker, so workers publishing the same stem at once cannot collide.
+    """
+    main_name = os.path.basename(main_path)
+    stem, _, main_suffix = main_name.partition(".") # base names contain no dots
+    attempt = 1
+    while True:
+        final_stem = stem if attempt == 1 else f"{stem}_{attempt}"
+        marker = os.path.join(output_dir, f".{final_stem}.publishing")
+        try:
+            with open(marker, "x"):
+                pass
+        except FileExistsError:
+            attempt += 1
+            continue
+        if not os.path.exists(os.path.join(output_dir, f"{final_stem}.{main_suffix}")):
+            break
+        os.remove(marker)
+        attempt += 1
+    try:
+        names = sorted(os.listdir(staging_dir), key=lambda name: name == main_name)
+        for name in names:
+            final_name = final_stem + name[len(stem):] if name.startswith(f"{stem}.") else name
+            os.replace(os.path.join(staging_dir, name), os.path.join(output_dir, final_name))
+        os.rmdir(staging_dir)
+    finally:
+        os.remove(marker)
+    return os.path.join(output_dir, f"{final_stem}.{main_suffix}")
+
+class Worker:
+    """
+    Pulls jobs from a JobQueue and runs them through reddit_subreddit_scraper_logic, one at a time.
+    Each job is written to a staging directory under output_dir and published atomically
+    when it succeeds; its lease is renewed every lease_seconds / 4 while it runs.
+    """
+    def __init__(self, queue_path=None, output_dir="reddit_data", worker_id=None, backend=None,
+                 lease_seconds=None, poll_seconds=None, exit_when_idle=False, log_callback=print):
+        self.queue_path = queue_path or config.JOB_QUEUE_PATH
+        self.output_dir = output_dir
+        self.worker_id = worker_id or default_worker_id()
+        self.backend = backend or config.SCRAPER_BACKEND
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.poll_seconds = poll_seconds or config.JOB_POLL_SECONDS
+        self.exit_when_idle = exit_when_idle
+        self.log_callback = log_callback
+        self.completed = 0
+        self.failed = 0
+
+    def _log(self, msg):
+        self.log_callback(f"[{self.worker_id}] {msg}")
+
+    async def _heartbeat(self, queue, job):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 4)
+            if not queue.heartbeat(job["id"], self.worker_id, self.lease_seconds):
+                self._log(f"Warning: Lost the lease on job {job['id']}; its output will be discarded.")
+                return
+
+    def _checkpoint_key(self, queue, job):
+        """
+        Checkpoint key of a job: its parameters (as checkpoint.job_key) plus the queue's id and the job id,
+        so a checkpoint is never picked up by another job, even one from a recreated queue database.
+        """
+        key = checkpoint.job_key(job["subreddit"], job["time_filter"], job["post_limit"], reddit_scraper.CommentOptions())
+        return f"{key}_queue{queue.queue_id}_job{job['id']}"
+
+    def _discard_checkpoint(self, key):
+        """Removes the checkpoint of a job that has failed its last attempt."""
+        job_checkpoint = checkpoint.Checkpoint(key)
+        if job_checkpoint.acquire():
+            job_checkpoint.finish()
+            job_checkpoint.release()
+
+    async def _run_job(self, queue, job, reddit):
+        staging_dir = os.path.join(self.output_dir, ".staging", f"job{job['id']}-{self.worker_id.replace(':', '-')}")
+        shutil.rmtree(staging_dir, ignore_errors=True) # Leftovers of an earlier attempt by this worker id
+        os.makedirs(staging_dir)
+        self._log(f"Starting job {job['id']}: r/{job['subreddit']} {job['time_filter']} {job['post_limit']} (attempt {job['attempts']}/{job['max_attempts']})")
+        heartbeat = asyncio.create_task(self._heartbeat(queue, job))
+        job_key = self._checkpoint_key(queue, job)
+        try:
+            result = await reddit_adk_tool.reddit_subreddit_scraper_logic(
+                subreddit_name=job["subreddit"], time_filter=job["time_filter"], limit=job["post_limit"],
+                log_callback=lambda msg: self.log_callback(f"  [job {job['id']}] {msg}"),
+                reddit_instance_internal=reddit, output_dir=staging_dir,
+                output_format=job["output_format"], compression=job["compression"],
+                backend=self.backend, job_key=job_key,
+            )
+        except Exception as e:
+            traceback.print_exc()
+            result = {"status": "error", "message": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        if result.get("status") != "success":
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            queue.fail(job["id"], self.worker_id, result.get("message"))
+            self.failed += 1
+            self._log(f"Job {job['id']} failed: {result.get('message')}")
+            if job["attempts"] >= job["max_attempts"]:
+                self._discard_checkpoint(job_key) # No attempt is left to resume from it
+            return
+        handle = result["handle"]
+        if not queue.heartbeat(job["id"], self.worker_id, self.lease_seconds):
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self._log(f"Job {job['id']} finished after its lease was lost; output discarded.")
+            return
+        output_path = _publish(staging_dir, self.output_dir, handle["path"])
+        queue.complete(job["id"], self.worker_id, output_path, handle.get("posts", 0), handle.get("comments", 0))
+        self.completed += 1
+        self._log(f"Job {job['id']} done: {handle.get('posts', 0)} posts -> {output_path}")
+
+    async def run(self):
+        """Processes jobs until stopped (or, with exit_when_idle, until the queue has nothing runnable)."""
+        reddit = None
+        if self.backend == "thread":
+            reddit = reddit_scraper.initialize_reddit()
+            if not reddit:
+                self._log("ERROR: Failed to initialize Reddit connection; worker exiting.")
+                return
+        self._log(f"Worker started on {self.queue_path} (backend '{self.backend}').")
+        with JobQueue(self.queue_path) as queue:
+            try:
+                while True:
+                    job = queue.claim(self.worker_id, self.lease_seconds)
+                    if job is None:
+                        if self.exit_when_idle and not queue.counts()["running"]:
+                            break
+                        await asyncio.sleep(self.poll_seconds)
+                        continue
+                    await self._run_job(queue, job, reddit)
+            finally:
+                if self.backend == "async":
+                    await reddit_async_scraper.close_async_reddit()
+        self._log(f"Worker stopped: {self.completed} jobs done, {self.failed} failed attempts.")
+
+def _worker_process(kwargs):
+    """Entry point of a spawned worker process."""
+    asyncio.run(Worker(**kwargs).run())
+
+def run_workers(processes, **worker_kwargs):
+    """Runs `processes` Worker processes (each with its own interpreter, so no shared GIL) and waits for them."""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_worker_process, args=(worker_kwargs,), name=f"scrape-worker-{n}") for n in range(processes)]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        raise
+    return [process.exitcode for process in workers]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Durable SQLite scrape-job queue and worker processes.")
+    parser.add_argument("--queue", default=None, help="Queue database (default JOB_QUEUE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Add the jobs of a batch jobs file to the queue")
+    enqueue.add_argument("jobs_file", help="Jobs file (.json, .csv or one 'subreddit [time_filter] [limit] [priority]' per line)")
+    enqueue.add_argument("--format", dest="output_format", choices=["json", "ndjson", "parquet", "arrow"], default="json")
+    enqueue.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    enqueue.add_argument("--max-attempts", type=int, default=None, help="Attempts per job (default JOB_MAX_ATTEMPTS)")
+
+    work = commands.add_parser("work", help="Run worker processes")
+    work.add_argument("--processes", type=int, default=None, help="Worker processes on this machine (default JOB_WORKER_PROCESSES)")
+    work.add_argument("--output-dir", default="reddit_data")
+    work.add_argument("--backend", choices=["thread", "async"], default=None)
+    work.add_argument("--exit-when-idle", action="store_true", help="Stop once no job is queued or running")
+
+    commands.add_parser("status", help="Print job counts and per-job status")
+    args = parser.parse_args(argv)
+
+    if args.command == "enqueue":
+        with JobQueue(args.queue) as queue:
+            ids = [queue.enqueue(job.subreddit, job.time_filter, job.limit, job.priority, args.output_format,
+                                 args.compression, args.max_attempts)
+                   for job in batch_scheduler.load_jobs(args.jobs_file)]
+            print(f"Queued {len(ids)} jobs in {queue.path}.")
+        return 0
+    if args.command == "status":
+        with JobQueue(args.queue) as queue:
+            print(json.dumps({"counts": queue.counts(), "jobs": queue.jobs()}, indent=4))
+        return 0
+
+    config.report()
+    processes = args.processes or config.JOB_WORKER_PROCESSES
+    exit_codes = run_workers(processes, queue_path=args.queue, output_dir=args.output_dir, backend=args.backend,
+                             exit_when_idle=args.exit_when_idle)
+    return 0 if all(code == 0 for code in exit_codes) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+# backend/lazy_import.py
+"""
+Deferred imports and startup timing.
+
+lazy_module("praw") returns a stand-in that imports the real module on first attribute
+access, so heavy dependencies (praw, asyncpraw, pyarrow, google.adk) cost nothing until a
+scrape actually needs them. Every deferred import and warm-up step is timed; report()
+lists them so import-time regressions show up in the startup log.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+import types
+
+_PROCESS_START = time.perf_counter()
+_timings = {} # step name -> seconds
+_marks = {}   # milestone name -> seconds since the backend was first imported
+_lock = threading.RLock() # re-entrant: loading one lazy module may load another
+
+def record(name, seconds):
+    with _lock:
+        _timings[name] = _timings.get(name, 0.0) + seconds
+
+def mark(name):
+    """Records a startup milestone (seconds since the backend was first imported)."""
+    with _lock:
+        _marks.setdefault(name, time.perf_counter() - _PROCESS_START)
+
+class timed:
+    """Context manager that records the duration of a warm-up step under name."""
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.started)
+
+def is_available(name):
+    """True if the module can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports name on first attribute access."""
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_target"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_target"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_lazy_target"]
+                if module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    record(f"import {self.__name__}", time.perf_counter() - started)
+                    self.__dict__["_lazy_target"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_target"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_module(name):
+    """Returns the module if it is already imported, otherwise a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
+
+def is_loaded(module):
+    return not isinstance(module, LazyModule) or module.__dict__["_lazy_target"] is not None
+
+def report():
+    """Startup timing report: milestones in order, then deferred imports and warm-up steps, slowest first."""
+    with _lock:
+        marks = sorted(_marks.items(), key=lambda item: item[1])
+        steps = sorted(_timings.items(), key=lambda item: item[1], reverse=True)
+    lines = ["Startup timing:"]
+    lines += [f"  {seconds * 1000:8.1f} ms  {name}" for name, seconds in marks]
+    if steps:
+        lines.append("  Deferred imports / warm-up:")
+        lines += [f"  {seconds * 1000:8.1f} ms  {name}" for name, seconds in steps]
+    return "\n".join(lines)
@@ -0,0 +1,132 @@
+# backend/log_sink.py
+import collections
+import threading
+
+try:
+    from . import config
+except ImportError:
+    import config
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+_ERROR_PREFIXES = ("ERROR", "FATAL", "CRITICAL", "!!!", "[Logic Error]")
+_WARNING_PREFIXES = ("Warning", "WARNING", "[Logic Warning]")
+
+def parse_level(level):
+    """Accepts a level number or name ('debug', 'INFO', ...)."""
+    if isinstance(level, int):
+        return level
+    return LEVEL_NAMES.get(str(level).upper(), INFO)
+
+def _classify(message):
+    """Level of a plain log_callback message, from its conventional 'ERROR:'/'Warning:' prefix."""
+    text = message.lstrip()
+    if text.startswith(_ERROR_PREFIXES):
+        return ERROR
+    if text.startswith(_WARNING_PREFIXES):
+        return WARNING
+    return INFO
+
+class LogSink:
+    """
+    Thread-safe log sink with a fixed-size ring buffer, usable anywhere a log_callback is expected.
+    Logging a message is O(1): it is level-checked, formatted only if it passes, and appended to
+    a bounded deque. A UI polls has_pending()/text() on a timer and redraws once per batch,
+    so the cost per message stays flat however long the run is.
+    """
+    def __init__(self, capacity=None, level=None):
+        self.capacity = capacity or config.LOG_BUFFER_LINES
+        self.level = parse_level(level or config.LOG_LEVEL)
+        self._lines = collections.deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+        self._pending = 0 # lines appended since the last text() call
+        self.total = 0    # lines accepted over the sink's lifetime
+
+    def is_enabled_for(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """Appends message % args at level; nothing is formatted when the level is filtered out."""
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+        line = str(message).rstrip()
+        if not line:
+            return
+        with self._lock:
+            self._lines.append(line)
+            self._pending += 1
+            self.total += 1
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def __call__(self, message):
+        """log_callback interface: the level is taken from the message's 'ERROR:'/'Warning:' prefix."""
+        message = str(message)
+        self.log(_classify(message), message)
+
+    def has_pending(self):
+        return self._pending > 0
+
+    def text(self):
+        """The buffered lines as one string (at most capacity lines); marks them as flushed."""
+        with self._lock:
+            self._pending = 0
+            return "\n".join(self._lines)
+
+    def clear(self, message=None):
+        with self._lock:
+            self._lines.clear()
+            self._pending = 1
+            if message:
+                self._lines.append(message)
+
+def debug(log_callback, message, *args):
+    """
+    Logs a DEBUG message through any log_callback. message % args is only built when
+    the callback is a LogSink with DEBUG enabled, or a plain callable with config.LOG_LEVEL=DEBUG.
+    """
+    if isinstance(log_callback, LogSink):
+        log_callback.debug(message, *args)
+    elif parse_level(config.LOG_LEVEL) <= DEBUG:
+        log_callback(message % args if args else message)
+
+class TimedFlusher:
+    """
+    Calls flush(text) with the sink's contents at most once per interval, and only when
+    new lines arrived. schedule(call_later) drives it from an event loop's call_later.
+    """
+    def __init__(self, sink, flush, interval=None):
+        self.sink = sink
+        self.flush = flush
+        self.interval = interval if interval is not None else config.LOG_FLUSH_INTERVAL_MS / 1000.0
+        self.stopped = False
+
+    def tick(self):
+        if self.sink.has_pending():
+            self.flush(self.sink.text())
+
+    def schedule(self, call_later):
+        def run():
+            if self.stopped:
+                return
+            try:
+                self.tick()
+            finally:
+                call_later(self.interval, run)
+        call_later(self.interval, run)
+
+    def stop(self):
+        self.stopped = True
@@ -0,0 +1,332 @@
+# backend/metrics.py
+"""
+In-process metrics for the scrape pipeline: counters, histograms and per-phase timers.
+
+Disabled by default (config.METRICS_ENABLED); while disabled every call returns at once and
+timer() hands back a shared no-op context manager, so instrumented code pays almost nothing.
+When enabled, the prawcore/asyncprawcore loggers are tapped for HTTP requests, responses,
+retries and rate-limit sleeps, and the registry can be exported as Prometheus text
+(render_prometheus / serve) or as a JSON summary (summary / save_summary).
+"""
+import bisect
+import contextlib
+import json
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from . import config
+except ImportError:
+    import config
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_NULL_TIMER = contextlib.nullcontext()
+_SLEEP_PATTERN = re.compile(r"Sleeping: ([0-9.]+) seconds prior to (call|retry)")
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def copy(self):
+        clone = _Histogram(self.buckets)
+        clone.counts = list(self.counts)
+        clone.sum, clone.count, clone.max = self.sum, self.count, self.max
+        return clone
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+class Registry:
+    """Thread-safe store of named counters and histograms with optional labels."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}   # (name, labels) -> float
+        self.histograms = {} # (name, labels) -> _Histogram
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=DEFAULT_BUCKETS):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        """A point-in-time copy, for summaries of a single scrape (see summary(since=...))."""
+        with self._lock:
+            return dict(self.counters), {key: h.copy() for key, h in self.histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+REGISTRY = Registry()
+ENABLED = False
+
+def _labels(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def inc(name, value=1, **labels):
+    """Increments a counter."""
+    if ENABLED:
+        REGISTRY.inc(name, value, _labels(labels))
+
+def observe(name, value, **labels):
+    """Records one value (seconds for latencies) in a histogram."""
+    if ENABLED:
+        REGISTRY.observe(name, value, _labels(labels))
+
+class _Timer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(self.name, time.perf_counter() - self.started, self.labels)
+
+def timer(phase, **labels):
+    """Context manager that records its duration in the 'phase_seconds' histogram under phase."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer("phase_seconds", _labels(dict(labels, phase=phase)))
+
+def timed_iter(phase, iterable, **labels):
+    """Yields from iterable, timing each step (e.g. listing pagination) under phase."""
+    if not ENABLED:
+        yield from iterable
+        return
+    key = _labels(dict(labels, phase=phase))
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            REGISTRY.observe("phase_seconds", time.perf_counter() - started, key)
+            return
+        REGISTRY.observe("phase_seconds", time.perf_counter() - started, key)
+        yield item
+
+async def atimed_iter(phase, aiterable, **labels):
+    """Async version of timed_iter."""
+    if not ENABLED:
+        async for item in aiterable:
+            yield item
+        return
+    key = _labels(dict(labels, phase=phase))
+    iterator = aiterable.__aiter__()
+    while True:
+        started = time.perf_counter()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            REGISTRY.observe("phase_seconds", time.perf_counter() - started, key)
+            return
+        REGISTRY.observe("phase_seconds", time.perf_counter() - started, key)
+        yield item
+
+# --- HTTP instrumentation from the prawcore/asyncprawcore loggers ---
+
+class _PrawcoreTap(logging.Filter):
+    """
+    Logger filter that turns prawcore's request/response/retry/sleep log records into
+    metrics, then passes on only the records the logger would have emitted anyway
+    (the logger level is lowered to DEBUG so these records are created at all).
+    """
+    def __init__(self, client, passthrough_level):
+        super().__init__()
+        self.client = client
+        self.passthrough_level = passthrough_level
+
+    def filter(self, record):
+        message = record.msg if isinstance(record.msg, str) else ""
+        if message.startswith("Fetching:"):
+            REGISTRY.inc("http_requests_total", labels=(("client", self.client), ("method", str(record.args[0]))))
+        elif message.startswith("Response:"):
+            REGISTRY.inc("http_responses_total", labels=(("client", self.client), ("status", str(record.args[0]))))
+        elif message.startswith("Retrying due to"):
+            REGISTRY.inc("http_retries_total", labels=(("client", self.client), ("reason", str(record.args[0]))))
+        elif message.startswith("Sleeping:"):
+            match = _SLEEP_PATTERN.match(message)
+            if match:
+                kind = "rate_limit" if match.group(2) == "call" else "retry_backoff"
+                labels = (("client", self.client), ("kind", kind))
+                REGISTRY.inc("sleeps_total", labels=labels)
+                REGISTRY.inc("sleep_seconds_total", float(match.group(1)), labels=labels)
+        return record.levelno >= self.passthrough_level
+
+_taps = []
+
+def _install_taps():
+    for client in ("prawcore", "asyncprawcore"):
+        logger = logging.getLogger(client)
+        tap = _PrawcoreTap(client, logger.getEffectiveLevel())
+        _taps.append((logger, tap, logger.level))
+        logger.addFilter(tap)
+        logger.setLevel(logging.DEBUG)
+
+def _remove_taps():
+    while _taps:
+        logger, tap, level = _taps.pop()
+        logger.removeFilter(tap)
+        logger.setLevel(level)
+
+def enable():
+    """Turns metrics collection on (idempotent)."""
+    global ENABLED
+    if not ENABLED:
+        _install_taps()
+        ENABLED = True
+
+def disable():
+    global ENABLED
+    if ENABLED:
+        _remove_taps()
+        ENABLED = False
+
+# --- Export ---
+
+def _format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+def render_prometheus(registry=None):
+    """Renders the registry in the Prometheus text exposition format."""
+    counters, histograms = (registry or REGISTRY).snapshot()
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        metric = f"reddit_scraper_{name}"
+        lines.append(f"# TYPE {metric} counter")
+        for (key_name, labels), value in sorted(counters.items()):
+            if key_name == name:
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        metric = f"reddit_scraper_{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        for (key_name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+            if key_name != name:
+                continue
+            cumulative = 0
+            for bound, n in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+def _label_text(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{key}={value}" for key, value in labels) + "}"
+
+def summary(since=None):
+    """
+    JSON-friendly summary of the registry: counter totals and count/sum/mean/p50/p95/max
+    per histogram. With since (an earlier snapshot()) only what happened after it is
+    included; concurrent scrapes in the same process still overlap.
+    """
+    counters, histograms = REGISTRY.snapshot()
+    base_counters, base_histograms = since or ({}, {})
+    result = {"counters": {}, "histograms": {}}
+    for key, value in sorted(counters.items()):
+        value -= base_counters.get(key, 0)
+        if value:
+            result["counters"][_label_text(*key)] = round(value, 6)
+    for key, histogram in sorted(histograms.items(), key=lambda item: item[0]):
+        base = base_histograms.get(key)
+        if base:
+            histogram.counts = [a - b for a, b in zip(histogram.counts, base.counts)]
+            histogram.sum -= base.sum
+            histogram.count -= base.count
+        if not histogram.count:
+            continue
+        result["histograms"][_label_text(*key)] = {
+            "count": histogram.count,
+            "sum_seconds": round(histogram.sum, 6),
+            "mean_seconds": round(histogram.sum / histogram.count, 6),
+            "p50_seconds": round(histogram.quantile(0.5), 6),
+            "p95_seconds": round(histogram.quantile(0.95), 6),
+            "max_seconds": round(histogram.max, 6), # process-wide maximum
+        }
+    return result
+
+def save_summary(path, since=None):
+    """Writes summary(since) as JSON (e.g. next to a scrape's output file). Returns the path."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary(since), f, indent=4)
+    return path
+
+_server = None
+
+def serve(port=None, host="127.0.0.1"):
+    """Starts a background HTTP server exposing /metrics in the Prometheus text format. Returns it."""
+    global _server
+    if _server:
+        return _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    _server = ThreadingHTTPServer((host, port or config.METRICS_PORT), Handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    print(f"Metrics endpoint listening on http://{host}:{_server.server_address[1]}/metrics")
+    return _server
+
+if config.METRICS_ENABLED:
+    enable()
+    if config.METRICS_PORT:
+        serve()
@@ -0,0 +1,230 @@
+# backend/output_writer.py
+import datetime
+import gzip
+import json
+import os
+import re
+import threading
+
+# zstd compression is optional
+ZSTD_AVAILABLE = False
+zstandard = None
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    pass
+
+try:
+    from . import config, columnar_export, records, metrics
+except ImportError:
+    import config, columnar_export, records, metrics
+
+COMPRESSION_EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+# Formats written post by post while scraping (JSON is written in one piece at the end)
+STREAMING_FORMATS = ("ndjson",) + columnar_export.COLUMNAR_FORMATS
+
+def ndjson_filename(base_name, compression=None):
+    """Returns '<base_name>.ndjson' with the extension for the given compression."""
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unsupported compression '{compression}'. Use one of: gzip, zstd.")
+    return f"{base_name}.ndjson{COMPRESSION_EXTENSIONS[compression]}"
+
+def open_ndjson(path, mode="rt"):
+    """Opens an NDJSON file for text I/O, picking the codec from the file extension."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    if path.endswith(".zst"):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstd compression requires the 'zstandard' package (pip install zstandard).")
+        return zstandard.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+class NDJSONWriter:
+    """
+    Writes one JSON record per line to an (optionally gzip/zstd-compressed) file.
+    Flushes every `flush_every` records so partial output reaches disk during long scrapes.
+    The file is created exclusively (FileExistsError if it already exists), so two scrapes
+    can never interleave their lines in one file; append=True continues an existing file
+    instead (used when a backfill resumes).
+    """
+    def __init__(self, path, compression=None, flush_every=None, append=False):
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            raise RuntimeError("zstd compression requires the 'zstandard' package (pip install zstandard).")
+        self.path = path
+        self.compression = compression
+        self.append = append
+        self.flush_every = flush_every or config.OUTPUT_FLUSH_EVERY
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        mode = "a" if self.append else "x"
+        if self.compression == "gzip":
+            self._file = gzip.open(self.path, mode + "t", encoding="utf-8")
+        elif self.compression == "zstd":
+            self._file = zstandard.open(self.path, mode + "t", encoding="utf-8")
+        else:
+            self._file = open(self.path, mode, encoding="utf-8")
+
+    def write(self, record):
+        """Appends a records.Post (or a post dict); ISO timestamps are formatted only here."""
+        self._file.write(json.dumps(records.as_dict(record), ensure_ascii=False))
+        self._file.write("\n")
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+def iter_ndjson(path):
+    """Yields the records of an NDJSON file one at a time."""
+    with open_ndjson(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def build_base_name(subreddit_name, time_filter, limit):
+    """Returns the timestamped output file stem used for every scrape."""
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{subreddit_name}_{time_filter}_{limit}posts_{timestamp}"
+
+# {subreddit}_{time_filter}_{limit}posts_{timestamp} (build_base_name) and
+# {subreddit}_backfill_{start}_{end} (backfill.default_output_path); subreddit names may contain underscores
+_SNAPSHOT_NAME = re.compile(r"^(?P<subreddit>\w+?)_(?P<time_filter>hour|day|week|month|year|all)_\d+posts_(?P<stamp>\d{8}_\d{6})")
+_BACKFILL_NAME = re.compile(r"^(?P<subreddit>\w+?)_backfill_\d{8}_\d{8}")
+
+def parse_output_name(filename):
+    """
+    (subreddit, time_filter, timestamp epoch or None) from an output file name or stem, or
+    (None, None, None) if it is not one. Backfill outputs have time_filter 'backfill' and no timestamp.
+    """
+    match = _SNAPSHOT_NAME.match(filename)
+    if match:
+        stamp = datetime.datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S") # local time, as written
+        return match.group("subreddit"), match.group("time_filter"), stamp.timestamp()
+    match = _BACKFILL_NAME.match(filename)
+    if match:
+        return match.group("subreddit"), "backfill", None
+    return None, None, None
+
+def save_json(data, filepath):
+    """
+    Writes the scraped posts (records.Post objects or dicts) as a pretty-printed JSON array
+    (the original output format). Posts are encoded one at a time, so the output is
+    identical to json.dump(..., indent=4) without building every dict at once.
+    """
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write("[")
+        count = 0
+        for record in data:
+            with metrics.timer("serialize", format="json"):
+                encoded = json.dumps(records.as_dict(record), ensure_ascii=False, indent=4).replace("\n", "\n    ")
+            with metrics.timer("write", format="json"):
+                f.write(",\n    " if count else "\n    ")
+                f.write(encoded)
+            count += 1
+        f.write("\n]" if count else "]")
+    return filepath
+
+_reserved_paths = set() # output paths handed out in this process, including files not written yet
+_reserve_lock = threading.Lock()
+
+def build_output_path(output_dir, subreddit_name, time_filter, limit, output_format="json", compression=None):
+    """
+    Returns the full output path for a scrape in the given format (the posts table for Parquet/Arrow).
+    Names are stamped to the second, so a second scrape of the same job within that second
+    (batch duplicates, concurrent jobs sharing a directory) gets a '_2', '_3', ... suffix.
+    """
+    base_name = build_base_name(subreddit_name, time_filter, limit)
+    with _reserve_lock:
+        attempt = 1
+        while True:
+            path = _output_path(output_dir, base_name if attempt == 1 else f"{base_name}_{attempt}", output_format, compression)
+            if path not in _reserved_paths and not os.path.exists(path):
+                _reserved_paths.add(path)
+                return path
+            attempt += 1
+
+def _output_path(output_dir, base_name, output_format, compression):
+    if output_format == "ndjson":
+        return os.path.join(output_dir, ndjson_filename(base_name, compression))
+    if output_format == "json":
+        return os.path.join(output_dir, f"{base_name}.json")
+    if output_format in columnar_export.COLUMNAR_FORMATS:
+        return columnar_export.table_paths(os.path.join(output_dir, base_name), output_format)[0]
+    raise ValueError(f"Unsupported output format '{output_format}'. Use 'json', 'ndjson', 'parquet' or 'arrow'.")
+
+def format_from_path(path):
+    """Infers the output format ('json', 'ndjson', 'parquet' or 'arrow') from a file name."""
+    if path.endswith(".json"):
+        return "json"
+    if path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith(".arrow"):
+        return "arrow"
+    return "ndjson"
+
+def open_writer(path, output_format=None, compression=None, subreddit=None):
+    """Returns the streaming writer (NDJSONWriter or columnar_export.ColumnarWriter) for a format."""
+    output_format = output_format or format_from_path(path)
+    if output_format in columnar_export.COLUMNAR_FORMATS:
+        return columnar_export.ColumnarWriter(path, output_format, subreddit=subreddit)
+    return NDJSONWriter(path, compression=compression)
+
+class DatasetSummary:
+    """
+    Running counts and a small preview of the posts written to an output file.
+    Used to build the compact dataset handle returned instead of the full payload.
+    """
+    def __init__(self, preview_size=3):
+        self.preview_size = preview_size
+        self.posts = 0
+        self.comments = 0
+        self.preview = []
+
+    def add(self, post):
+        """Counts a records.Post (or a post dict)."""
+        post = records.as_record(post)
+        self.posts += 1
+        self.comments += len(post.comments)
+        if len(self.preview) < self.preview_size:
+            self.preview.append({
+                "id": post.id,
+                "title": (post.title or "")[:100],
+                "score": post.score,
+                "num_comments": post.num_comments,
+            })
+
+    def to_handle(self, path, output_format=None):
+        """Returns the handle dict: path, format, row counts, byte size and preview."""
+        output_format = output_format or format_from_path(path)
+        handle = {
+            "path": path,
+            "format": output_format,
+            "posts": self.posts,
+            "comments": self.comments,
+            "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+            "preview": self.preview,
+        }
+        if output_format in columnar_export.COLUMNAR_FORMATS:
+            handle["comments_path"] = columnar_export.comments_path_for(path)
+            if os.path.exists(handle["comments_path"]):
+                handle["bytes"] += os.path.getsize(handle["comments_path"])
+        return handle
@@ -0,0 +1,203 @@
+# backend/post_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from . import records
+except ImportError:
+    import records
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    body TEXT,
+    is_over18 INTEGER,
+    created_utc TEXT,
+    score INTEGER,
+    upvote_ratio REAL,
+    num_comments INTEGER,
+    comment_options TEXT,
+    first_seen REAL,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_subreddit ON posts (subreddit);
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    post_id TEXT NOT NULL,
+    position INTEGER,
+    author TEXT,
+    body TEXT,
+    score INTEGER,
+    created_utc TEXT,
+    parent_id TEXT,
+    depth INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_comments_post ON comments (post_id, position);
+"""
+
+# Fields that change between runs and are updated in place
+_VOLATILE_FIELDS = ("score", "upvote_ratio", "num_comments")
+
+def options_digest(comment_options):
+    """Short hash of a reddit_scraper.CommentOptions (None = no options), identifying the comment bounds."""
+    options = json.dumps(vars(comment_options) if comment_options is not None else {}, sort_keys=True)
+    return hashlib.sha1(options.encode("utf-8")).hexdigest()[:8]
+
+class ScrapeDelta:
+    """What changed during one incremental scrape compared with the store."""
+    def __init__(self):
+        self.new_posts = []
+        self.changed_posts = {} # post id -> {field: [old, new]}
+        self.refetched_comments = [] # post ids whose comments were fetched again
+        self.skipped_comment_fetches = 0
+
+    def summary(self):
+        return {
+            "new_posts": len(self.new_posts),
+            "changed_posts": len(self.changed_posts),
+            "refetched_comments": len(self.refetched_comments),
+            "skipped_comment_fetches": self.skipped_comment_fetches,
+        }
+
+    def to_dict(self):
+        return {
+            "summary": self.summary(),
+            "new_posts": self.new_posts,
+            "changed_posts": self.changed_posts,
+            "refetched_comments": self.refetched_comments,
+        }
+
+class PostStore:
+    """
+    Local SQLite store of posts and comments keyed by id, used for incremental scrapes.
+    Safe to share between the scraper thread and the caller (one connection behind a lock).
+    """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30) # concurrent batch jobs share the file
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self.delta = ScrapeDelta()
+
+    def _migrate(self):
+        """Adds columns introduced after a store was created."""
+        with self._conn:
+            for table, column, kind in (("comments", "parent_id", "TEXT"), ("comments", "depth", "INTEGER"),
+                                        ("posts", "comment_options", "TEXT")):
+                columns = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def begin_run(self):
+        """Starts a fresh delta for the next scrape."""
+        self.delta = ScrapeDelta()
+        return self.delta
+
+    def get_post(self, post_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_comments(self, post_id):
+        """Returns the stored comments of a post as records.Comment objects, in their original order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, author, body, score, created_utc, parent_id, depth FROM comments WHERE post_id = ? ORDER BY position",
+                (post_id,)
+            ).fetchall()
+        return [records.Comment.from_dict(dict(row)) for row in rows]
+
+    def unchanged_comments(self, post_data, comment_options=None):
+        """
+        Returns the stored comments of a post if its num_comments has not changed
+        since the last run and they were collected with the same comment_options
+        (so the comment fetch can be skipped), otherwise None.
+        """
+        stored = self.get_post(post_data.id)
+        if not stored or stored["num_comments"] != post_data.num_comments:
+            return None
+        if stored["comment_options"] != options_digest(comment_options):
+            return None # Stored under other bounds (limit, depth, min_score, ...)
+        return self.get_comments(post_data.id)
+
+    def record(self, subreddit_name, post_data, comments, fetched, comment_options=None):
+        """
+        Stores a scraped post and updates the delta. Only changed score/upvote_ratio/
+        num_comments values are written for known posts; comments are replaced only
+        when they were fetched again, and are tagged with the comment_options they were
+        collected under. Returns the comments to emit for the post.
+        """
+        now = time.time()
+        post_id = post_data.id
+        stored = self.get_post(post_id)
+        with self._lock, self._conn:
+            if stored is None:
+                self._conn.execute(
+                    "INSERT INTO posts (id, subreddit, title, url, body, is_over18, created_utc, score,"
+                    " upvote_ratio, num_comments, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (post_id, subreddit_name, post_data.title, post_data.url, post_data.body,
+                     int(post_data.is_over18), post_data.created_iso, post_data.score,
+                     post_data.upvote_ratio, post_data.num_comments, now, now)
+                )
+                self.delta.new_posts.append(post_id)
+            else:
+                changes = {field: [stored[field], getattr(post_data, field)] for field in _VOLATILE_FIELDS
+                           if stored[field] != getattr(post_data, field)}
+                if fetched and comments is None:
+                    # Comment fetch failed: keep the stored num_comments so the next run retries
+                    changes.pop("num_comments", None)
+                if changes:
+                    assignments = ", ".join(f"{field} = ?" for field in changes)
+                    self._conn.execute(
+                        f"UPDATE posts SET {assignments}, last_seen = ? WHERE id = ?",
+                        [new for _, new in changes.values()] + [now, post_id]
+                    )
+                    self.delta.changed_posts[post_id] = changes
+                else:
+                    self._conn.execute("UPDATE posts SET last_seen = ? WHERE id = ?", (now, post_id))
+
+            if not fetched:
+                self.delta.skipped_comment_fetches += 1
+            elif comments is not None:
+                self._conn.execute("DELETE FROM comments WHERE post_id = ?", (post_id,))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO comments (id, post_id, position, author, body, score, created_utc, parent_id, depth)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(c.id, post_id, position, c.author, c.body, c.score, c.created_iso, c.parent_id, c.depth)
+                     for position, c in enumerate(comments)]
+                )
+                self._conn.execute("UPDATE posts SET comment_options = ? WHERE id = ?", (options_digest(comment_options), post_id))
+                if stored is not None:
+                    self.delta.refetched_comments.append(post_id)
+            elif stored is None:
+                # New post whose comment fetch failed: force a refetch next run
+                self._conn.execute("UPDATE posts SET num_comments = -1 WHERE id = ?", (post_id,))
+        return comments
+
+    def save_delta(self, path):
+        """Writes the current delta next to the scrape output."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.delta.to_dict(), f, ensure_ascii=False, indent=4)
+        return path
@@ -0,0 +1,106 @@
+# backend/records.py
+import datetime
+
+def _iso(epoch):
+    """ISO-8601 UTC string for an epoch timestamp (the format used in the JSON output)."""
+    return datetime.datetime.fromtimestamp(epoch, tz=datetime.timezone.utc).isoformat()
+
+def _epoch(value):
+    """Epoch seconds from an epoch number or an ISO-8601 string."""
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value).timestamp()
+    return value
+
+class Comment:
+    """
+    Compact comment record. created_utc stays a raw epoch; ISO formatting happens in to_dict.
+    parent_id is the Reddit fullname of the parent ('t3_...' for top-level comments, 't1_...'
+    for replies) and depth the reply level (0 = top-level).
+    """
+    __slots__ = ("id", "author", "body", "score", "created_utc", "parent_id", "depth")
+
+    def __init__(self, id, author, body, score, created_utc, parent_id=None, depth=0):
+        self.id = id
+        self.author = author
+        self.body = body
+        self.score = score
+        self.created_utc = created_utc
+        self.parent_id = parent_id
+        self.depth = depth
+
+    @property
+    def created_iso(self):
+        return _iso(self.created_utc)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "author": self.author,
+            "body": self.body,
+            "score": self.score,
+            "created_utc": self.created_iso,
+            "parent_id": self.parent_id,
+            "depth": self.depth,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Files written before parent_id/depth were recorded have neither
+        return cls(data["id"], data["author"], data["body"], data["score"], _epoch(data["created_utc"]),
+                   data.get("parent_id"), data.get("depth") or 0)
+
+class Post:
+    """Compact post record with its comments. created_utc stays a raw epoch; ISO formatting happens in to_dict."""
+    __slots__ = ("id", "title", "score", "url", "num_comments", "created_utc", "body", "is_over18",
+                 "upvote_ratio", "comments")
+
+    def __init__(self, id, title, score, url, num_comments, created_utc, body, is_over18, upvote_ratio, comments=None):
+        self.id = id
+        self.title = title
+        self.score = score
+        self.url = url
+        self.num_comments = num_comments
+        self.created_utc = created_utc
+        self.body = body
+        self.is_over18 = is_over18
+        self.upvote_ratio = upvote_ratio
+        self.comments = comments if comments is not None else []
+
+    @property
+    def created_iso(self):
+        return _iso(self.created_utc)
+
+    @classmethod
+    def from_praw(cls, post):
+        """Builds a record from a PRAW/asyncpraw Submission (without comments)."""
+        return cls(post.id, post.title, post.score, post.url, post.num_comments, post.created_utc,
+                   post.selftext, post.over_18, post.upvote_ratio)
+
+    def to_dict(self):
+        """The backward-compatible output dict (same keys, order and ISO timestamps as before)."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "score": self.score,
+            "url": self.url,
+            "num_comments": self.num_comments,
+            "created_utc": self.created_iso,
+            "body": self.body,
+            "is_over18": self.is_over18,
+            "upvote_ratio": self.upvote_ratio,
+            "comments": [comment.to_dict() for comment in self.comments],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["id"], data["title"], data["score"], data["url"], data["num_comments"],
+                   _epoch(data["created_utc"]), data["body"], data["is_over18"], data["upvote_ratio"],
+                   [Comment.from_dict(comment) for comment in data.get("comments", [])])
+
+def as_dict(record):
+    """Returns the output dict of a Post record (dicts pass through unchanged)."""
+    return record if isinstance(record, dict) else record.to_dict()
+
+def as_record(data):
+    """Returns a Post record for a post dict (records pass through unchanged)."""
+    return data if isinstance(data, Post) else Post.from_dict(data)
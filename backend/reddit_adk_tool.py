@@ -1,13 +1,13 @@
 # backend/reddit_adk_tool.py
 import traceback
-import praw
+import time
 import asyncio # Import asyncio
 
 # Import the scraper utility
 try:
-    from . import reddit_scraper
+    from . import config, reddit_scraper, reddit_async_scraper, output_writer, post_store, metrics, checkpoint, text_pipeline
 except ImportError:
-    import reddit_scraper
+    import config, reddit_scraper, reddit_async_scraper, output_writer, post_store, metrics, checkpoint, text_pipeline
 
 # NOTE: reddit_instance parameter is REMOVED from the signature
 async def reddit_subreddit_scraper_logic( # Make this async
@@ -15,15 +15,54 @@ async def reddit_subreddit_scraper_logic( # Make this async
     time_filter: str = 'week',
     limit: int = 50,
     log_callback=print,
-    reddit_instance_internal: praw.Reddit = None
+    reddit_instance_internal: "praw.Reddit" = None,
+    output_path: str = None,
+    compression: str = None,
+    output_dir: str = None,
+    output_format: str = None,
+    store_path: str = None,
+    backend: str = None,
+    rate_budget: reddit_scraper.RateBudget = None,
+    comment_options: reddit_scraper.CommentOptions = None,
+    resume: bool = None,
+    job_key: str = None,
+    preprocess: str = None
 ) -> dict:
     """
     Internal logic to scrape subreddit. Requires reddit_instance_internal.
     Uses asyncio.to_thread to run synchronous PRAW calls.
+    If output_dir or output_path is given, the data is persisted here and only a
+    compact dataset handle is returned (path, row counts, byte size, small preview)
+    instead of the full 'data' payload. NDJSON and Parquet/Arrow output (output_format)
+    is streamed as posts are scraped.
+    With store_path (default config.REDDIT_STORE_PATH) the scrape runs incrementally against
+    a local post_store.PostStore and the result carries a 'delta' summary.
+    backend (default config.SCRAPER_BACKEND) selects 'thread' (sync PRAW via asyncio.to_thread)
+    or 'async' (reddit_async_scraper on this event loop, no thread per scrape).
+    rate_budget lets several concurrent scrapes share one global request budget.
+    comment_options bounds the comment traversal (default from config.COMMENT_*).
+    With resume (default config.CHECKPOINT_ENABLED) progress is checkpointed under job_key
+    (default: derived from the subreddit, time filter, limit and comment options), and a
+    failed scrape run again with the same key continues from its last checkpoint.
+    With config.REDDIT_CREDENTIALS set, the thread backend spreads comment fetches over that
+    credential pool (credential_pool.get_pool()).
+    preprocess (default config.PREPROCESS_TRANSFORMS) is a text_pipeline transform spec; when
+    set, posts are cleaned and filtered on a process pool before they are saved or returned,
+    and the result carries the per-transform 'preprocess' stats.
+    With metrics enabled (config.METRICS_ENABLED) a JSON summary of this scrape's timings and
+    request counters is saved next to the output file as '<output>.metrics.json'.
     """
     tool_name = "reddit_subreddit_scraper_logic"
     log_callback(f"--- Internal Logic: {tool_name} executing for r/{subreddit_name} ---")
 
+    backend = backend or config.SCRAPER_BACKEND
+    if backend == "async":
+        reddit_instance_internal = await reddit_async_scraper.get_async_reddit(log_callback)
+    elif backend != "thread":
+        msg = f"Unsupported scraper backend '{backend}'. Use 'thread' or 'async'."
+        log_callback(f"  [Logic Error] {msg}")
+        return {"status": "error", "message": msg}
+
     if not reddit_instance_internal:
         msg = "Internal error: PRAW Reddit instance was not provided internally."
         log_callback(f"  [Logic Error] {msg}")
@@ -33,31 +72,176 @@ async def reddit_subreddit_scraper_logic( # Make this async
         log_callback(f"  [Logic Error] {msg}")
         return {"status": "error", "message": msg}
 
+    started = time.perf_counter()
+    comment_options = comment_options or reddit_scraper.CommentOptions()
+    resume = config.CHECKPOINT_ENABLED if resume is None else resume
+    job_checkpoint = None
+    if resume:
+        job_checkpoint = checkpoint.Checkpoint(job_key) if job_key else checkpoint.Checkpoint.for_job(
+            subreddit_name, time_filter, limit, comment_options)
+        if not job_checkpoint.acquire():
+            log_callback(f"  [Logic Info] Checkpoint '{job_checkpoint.key}' is in use by another running scrape; this one runs without it.")
+            job_checkpoint = None
+        elif job_checkpoint.load():
+            log_callback(f"  Found checkpoint '{job_checkpoint.key}' with {job_checkpoint.count} posts; resuming.")
+        elif job_checkpoint.discarded_age is not None:
+            log_callback(f"  Discarded checkpoint '{job_checkpoint.key}' saved {job_checkpoint.discarded_age / 3600:.1f} hours ago "
+                         f"(older than CHECKPOINT_MAX_AGE); starting over.")
+    pool = None
+    if config.REDDIT_CREDENTIALS and backend == "thread":
+        try:
+            from . import credential_pool # imports prawcore
+        except ImportError:
+            import credential_pool
+        pool = credential_pool.get_pool()
+    metrics_since = metrics.REGISTRY.snapshot() if metrics.ENABLED else None
+    preprocess = config.PREPROCESS_TRANSFORMS if preprocess is None else preprocess
+    pipeline = None
+    store_path = config.REDDIT_STORE_PATH if store_path is None else store_path
+    store = post_store.PostStore(store_path) if store_path else None
+    if store:
+        store.begin_run()
+        log_callback(f"  Incremental mode: using post store {store_path}")
+
     try:
-        # --- Run synchronous PRAW code in a separate thread ---
-        scraped_data = await asyncio.to_thread(
-            reddit_scraper.scrape_subreddit, # Function to run
-            reddit_instance_internal,        # Args for the function
-            subreddit_name,
-            time_filter,
-            limit,
-            log_callback
-        )
-        # --- End of threaded execution ---
+        if preprocess:
+            pipeline = text_pipeline.Pipeline(preprocess)
+            log_callback(f"  Preprocessing posts with: {', '.join(map(repr, pipeline.transforms))}")
+        if output_dir and not output_path:
+            output_path = output_writer.build_output_path(
+                output_dir, subreddit_name, time_filter, limit, output_format or "json", compression
+            )
+        output_format = output_format or (output_writer.format_from_path(output_path) if output_path else None)
+
+        if output_path and output_format in output_writer.STREAMING_FORMATS:
+            # --- Streaming mode: posts go straight to disk ---
+            if backend == "async":
+                summary = await reddit_async_scraper.scrape_subreddit_to_file_async(
+                    reddit_instance_internal, subreddit_name, output_path, time_filter, limit,
+                    log_callback, compression, store=store, rate_budget=rate_budget, output_format=output_format,
+                    comment_options=comment_options, checkpoint=job_checkpoint, pipeline=pipeline
+                )
+            else:
+                summary = await asyncio.to_thread(
+                    reddit_scraper.scrape_subreddit_to_file,
+                    reddit_instance_internal,
+                    subreddit_name,
+                    output_path,
+                    time_filter,
+                    limit,
+                    log_callback,
+                    compression,
+                    store=store,
+                    rate_budget=rate_budget,
+                    output_format=output_format,
+                    comment_options=comment_options,
+                    checkpoint=job_checkpoint,
+                    pool=pool,
+                    pipeline=pipeline
+                )
+            if summary is None:
+                return _failed(subreddit_name, job_checkpoint)
+            msg = f"Successfully streamed {summary.posts} posts from r/{subreddit_name} to {output_path}."
+            log_callback(f"  [Logic Success] {msg}")
+            result = _with_delta({"status": "success", "message": msg, "handle": summary.to_handle(output_path, output_format)}, store, output_path, log_callback)
+            return _with_metrics(_with_preprocess(result, pipeline, log_callback), metrics_since, output_path, log_callback)
+
+        if backend == "async":
+            # --- Native async scrape on this event loop ---
+            scraped_data = await reddit_async_scraper.scrape_subreddit_async(
+                reddit_instance_internal, subreddit_name, time_filter, limit, log_callback, store=store, rate_budget=rate_budget,
+                as_records=bool(output_path), comment_options=comment_options, checkpoint=job_checkpoint, pipeline=pipeline
+            )
+        else:
+            # --- Run synchronous PRAW code in a separate thread ---
+            scraped_data = await asyncio.to_thread(
+                reddit_scraper.scrape_subreddit, # Function to run
+                reddit_instance_internal,        # Args for the function
+                subreddit_name,
+                time_filter,
+                limit,
+                log_callback,
+                store=store,
+                rate_budget=rate_budget,
+                as_records=bool(output_path), # records are formatted only when saved
+                comment_options=comment_options,
+                checkpoint=job_checkpoint,
+                pool=pool,
+                pipeline=pipeline
+            )
+            # --- End of threaded execution ---
 
         if scraped_data is None:
-            return {"status": "error", "message": f"Scraping r/{subreddit_name} failed. See logs."}
-        elif not scraped_data:
+            return _failed(subreddit_name, job_checkpoint)
+
+        if output_path:
+            # --- Persist here and hand back only a handle ---
+            log_callback(f"Saving {len(scraped_data)} posts to: {output_path}")
+            await asyncio.to_thread(output_writer.save_json, scraped_data, output_path)
+            summary = output_writer.DatasetSummary()
+            for post_data in scraped_data:
+                summary.add(post_data)
+            msg = f"Successfully scraped {summary.posts} posts from r/{subreddit_name} and saved them to {output_path}."
+            log_callback(f"  [Logic Success] {msg}")
+            result = _with_delta({"status": "success", "message": msg, "handle": summary.to_handle(output_path, output_format)}, store, output_path, log_callback)
+            return _with_metrics(_with_preprocess(result, pipeline, log_callback), metrics_since, output_path, log_callback)
+
+        if not scraped_data:
             msg = f"No posts found or scraped from r/{subreddit_name}."
             log_callback(f"  [Logic Info] {msg}")
-            return {"status": "success", "message": msg, "data": []}
+            return _with_preprocess(_with_delta({"status": "success", "message": msg, "data": []}, store, None, log_callback), pipeline, log_callback)
         else:
             msg = f"Successfully scraped {len(scraped_data)} posts from r/{subreddit_name} (async wrapper)."
             log_callback(f"  [Logic Success] {msg}")
-            return {"status": "success", "message": msg, "data": scraped_data}
+            return _with_preprocess(_with_delta({"status": "success", "message": msg, "data": scraped_data}, store, None, log_callback), pipeline, log_callback)
 
     except Exception as e:
         error_msg = f"Unexpected error in {tool_name} for r/{subreddit_name}: {e}"
         log_callback(f"  [Logic Error] {error_msg}")
         traceback.print_exc()
-        return {"status": "error", "message": error_msg}
\ No newline at end of file
+        return {"status": "error", "message": error_msg}
+    finally:
+        if store:
+            store.close()
+        if job_checkpoint:
+            job_checkpoint.release()
+        if pipeline:
+            pipeline.close()
+        metrics.observe("phase_seconds", time.perf_counter() - started, phase="scrape", backend=backend)
+
+def _failed(subreddit_name, job_checkpoint):
+    """Error result of a failed scrape; names the checkpoint a rerun will resume from."""
+    result = {"status": "error", "message": f"Scraping r/{subreddit_name} failed. See logs."}
+    if job_checkpoint and job_checkpoint.count:
+        result["message"] += f" {job_checkpoint.count} posts are checkpointed; run it again to resume."
+        result["checkpoint"] = {"job_key": job_checkpoint.key, "posts": job_checkpoint.count}
+    return result
+
+def _with_delta(result, store, output_path, log_callback):
+    """Attaches the incremental-scrape delta summary to a result and saves the full delta next to the output."""
+    if not store:
+        return result
+    result["delta"] = store.delta.summary()
+    log_callback(f"  [Logic Info] Delta: {result['delta']}")
+    if output_path:
+        delta_path = store.save_delta(f"{output_path}.delta.json")
+        if "handle" in result:
+            result["handle"]["delta_path"] = delta_path
+    return result
+
+def _with_preprocess(result, pipeline, log_callback):
+    """Attaches the preprocessing stats (posts kept, per-transform throughput) to a result."""
+    if not pipeline:
+        return result
+    pipeline.stats.report(log_callback)
+    result["preprocess"] = pipeline.stats.summary()
+    return result
+
+def _with_metrics(result, since, output_path, log_callback):
+    """Saves the metrics summary of this scrape next to the output and links it from the handle."""
+    if since is None or not output_path:
+        return result
+    metrics_path = metrics.save_summary(f"{output_path}.metrics.json", since)
+    result["handle"]["metrics_path"] = metrics_path
+    log_callback(f"  [Logic Info] Metrics summary saved to: {metrics_path}")
+    return result
@@ -7,7 +7,8 @@ AGENT_DESCRIPTION = "An agent that uses a tool to scrape data from a specified s
 AGENT_INSTRUCTION = """Your task is to scrape data from Reddit.
 You will be given the subreddit name, time filter, and limit.
 Use the 'reddit_subreddit_scraper_tool' with the provided parameters to fetch the data.
-Report back the result status and message from the tool. If the tool returns data, indicate how many posts were scraped.
+The tool saves the data to disk itself and returns a compact dataset handle (path, post and comment counts, byte size and a short preview) instead of the full data.
+Report back the result status and message from the tool. If the tool returns a handle, indicate how many posts were scraped and where they were saved.
 """
 
 EXPECTED_TOOLS = ['reddit_subreddit_scraper_tool']
\ No newline at end of file
@@ -0,0 +1,224 @@
+# backend/reddit_async_scraper.py
+import asyncio
+import time
+import traceback
+from collections import deque
+
+try:
+    from . import config, reddit_scraper, output_writer, records, metrics, lazy_import
+except ImportError:
+    import config, reddit_scraper, output_writer, records, metrics, lazy_import
+
+# asyncpraw/aiohttp are optional: only needed for the native async backend, and imported on first use
+ASYNC_AVAILABLE = lazy_import.is_available("asyncpraw") and lazy_import.is_available("aiohttp")
+aiohttp = lazy_import.lazy_module("aiohttp")
+asyncpraw = lazy_import.lazy_module("asyncpraw")
+
+# One pooled asyncpraw client per event loop, shared by every scrape on that loop
+_async_clients = {} # loop -> (asyncpraw.Reddit, aiohttp.ClientSession)
+
+async def get_async_reddit(log_callback=print):
+    """
+    Returns the shared asyncpraw.Reddit for the running event loop, creating it on first use.
+    All scrapes on the loop share one aiohttp session (keep-alive connection pool).
+    """
+    if not ASYNC_AVAILABLE:
+        log_callback("ERROR: The async backend requires 'asyncpraw' and 'aiohttp' (pip install asyncpraw).")
+        return None
+    if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET or not config.REDDIT_USER_AGENT:
+        log_callback("ERROR: Reddit API credentials not configured correctly in config/environment.")
+        return None
+
+    loop = asyncio.get_running_loop()
+    # Forget clients of loops that have since been closed (e.g. one loop per UI click)
+    for stale_loop in [l for l in _async_clients if l.is_closed()]:
+        del _async_clients[stale_loop]
+    if loop in _async_clients:
+        return _async_clients[loop][0]
+
+    connector = aiohttp.TCPConnector(limit=config.ASYNC_MAX_CONNECTIONS, keepalive_timeout=config.ASYNC_KEEPALIVE_SECONDS)
+    session = aiohttp.ClientSession(connector=connector)
+    reddit = asyncpraw.Reddit(
+        client_id=config.REDDIT_CLIENT_ID,
+        client_secret=config.REDDIT_CLIENT_SECRET,
+        user_agent=config.REDDIT_USER_AGENT,
+        oauth_url=config.REDDIT_OAUTH_URL,
+        reddit_url=config.REDDIT_URL,
+        requestor_kwargs={"session": session},
+    )
+    _async_clients[loop] = (reddit, session)
+    log_callback(f"asyncpraw Reddit client created (pool of {config.ASYNC_MAX_CONNECTIONS} connections).")
+    return reddit
+
+async def close_async_reddit():
+    """Closes the shared client and connection pool of the running event loop."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client:
+        reddit, session = client
+        await reddit.close()
+        await session.close()
+
+async def _fetch_comments_async(post, semaphore, log_callback=print, rate_budget=None, comment_options=None):
+    """Async twin of reddit_scraper._fetch_comments. Returns Comment records, or None if the fetch failed."""
+    comment_options = comment_options or reddit_scraper.CommentOptions()
+    try:
+        async with semaphore:
+            if rate_budget:
+                await rate_budget.acquire_async()
+            started = time.perf_counter()
+            comment_options.prepare(post)
+            await post.load()
+            await post.comments.replace_more(limit=comment_options.replace_more_limit) # Expand (or just drop) "load more" stubs
+            metrics.observe("comment_fetch_seconds", time.perf_counter() - started, backend="async")
+        return reddit_scraper._select_comments(post.comments, comment_options)
+    except Exception as comment_e:
+        metrics.inc("comment_fetch_failures_total", backend="async")
+        log_callback(f"  Warning: Could not fetch comments for post {post.id}: {comment_e}")
+        return None
+
+async def _top_listing(subreddit, time_filter, limit, checkpoint, log_callback):
+    """Async twin of reddit_scraper._top_listing."""
+    if not (checkpoint and checkpoint.after):
+        async for post in subreddit.top(time_filter=time_filter, limit=limit):
+            yield post
+        return
+    listed = 0
+    async for post in subreddit.top(time_filter=time_filter, **checkpoint.listing_args(limit)):
+        listed += 1
+        yield post
+    if not listed and checkpoint.count < limit:
+        log_callback("  Warning: The checkpoint's listing cursor returned no posts; listing again from the start.")
+        async for post in subreddit.top(time_filter=time_filter, limit=limit):
+            yield post
+
+async def aiter_subreddit_posts(reddit, subreddit_name, time_filter='week', limit=50, log_callback=print,
+                                max_concurrency=None, store=None, rate_budget=None, comment_options=None,
+                                checkpoint=None):
+    """
+    Async generator that yields records.Post objects (with comments) in listing order.
+    Listing pagination and comment fetches run as coroutines on the caller's loop;
+    at most max_concurrency comment requests are in flight and at most
+    2 * max_concurrency posts are buffered. Supports a post_store.PostStore like
+    reddit_scraper.iter_subreddit_posts, an optional shared reddit_scraper.RateBudget and
+    reddit_scraper.CommentOptions (the comment traversal is shared with the thread backend)
+    and a checkpoint.Checkpoint to resume from. Store and checkpoint I/O (SQLite, fsync)
+    runs in worker threads, so it never blocks the other scrapes on the loop.
+    Errors are raised to the caller.
+    """
+    comment_options = comment_options or reddit_scraper.CommentOptions()
+    max_concurrency = max_concurrency or config.ASYNC_MAX_CONCURRENCY
+    semaphore = asyncio.Semaphore(max_concurrency)
+    subreddit = await reddit.subreddit(subreddit_name)
+    log_callback(f"Fetching top {limit} posts from r/{subreddit_name} for the past {time_filter} (async, {max_concurrency} concurrent)...")
+
+    def _record(post_data, comments, fetched):
+        if store:
+            comments = store.record(subreddit_name, post_data, comments, fetched, comment_options)
+        post_data.comments = comments or []
+        if checkpoint:
+            checkpoint.add(post_data)
+        return post_data
+
+    async def _complete(post_data, comments, fetched):
+        if not store and not checkpoint:
+            post_data.comments = comments or []
+            return post_data
+        return await asyncio.to_thread(_record, post_data, comments, fetched)
+
+    pending = deque() # (post_data, task, cached_comments) in listing order
+    try:
+        if checkpoint and checkpoint.count:
+            log_callback(f"  Resuming: {checkpoint.describe()}.")
+            for post_data in await asyncio.to_thread(list, checkpoint.replay()):
+                yield post_data
+
+        i = 0
+        async for post in metrics.atimed_iter("listing", _top_listing(subreddit, time_filter, limit, checkpoint, log_callback)):
+            if i % 10 == 0 and i > 0:
+                log_callback(f"  Fetched {i} posts so far...")
+            i += 1
+            if checkpoint and post.id in checkpoint.done_ids:
+                continue # Already saved (listings shift between runs)
+
+            post_data = records.Post.from_praw(post)
+            cached_comments = await asyncio.to_thread(store.unchanged_comments, post_data, comment_options) if store else None
+            task = None if cached_comments is not None else asyncio.create_task(_fetch_comments_async(post, semaphore, log_callback, rate_budget, comment_options))
+            pending.append((post_data, task, cached_comments))
+
+            while len(pending) >= 2 * max_concurrency or (pending and pending[0][1] is None):
+                post_data, task, cached_comments = pending.popleft()
+                yield await (_complete(post_data, await task, True) if task else _complete(post_data, cached_comments, False))
+
+        # Drain the remaining results in listing order
+        while pending:
+            post_data, task, cached_comments = pending.popleft()
+            yield await (_complete(post_data, await task, True) if task else _complete(post_data, cached_comments, False))
+    finally:
+        for _, task, _ in pending:
+            if task:
+                task.cancel()
+        if checkpoint:
+            await asyncio.to_thread(checkpoint.close)
+
+async def scrape_subreddit_async(reddit, subreddit_name, time_filter='week', limit=50, log_callback=print,
+                                 max_concurrency=None, store=None, rate_budget=None, as_records=False,
+                                 comment_options=None, checkpoint=None, pipeline=None):
+    """Async twin of reddit_scraper.scrape_subreddit. Returns a list of post dicts (or records), or None on failure."""
+    if not reddit:
+        log_callback("ERROR: Invalid Reddit instance provided.")
+        return None
+    try:
+        posts = aiter_subreddit_posts(
+            reddit, subreddit_name, time_filter, limit, log_callback, max_concurrency=max_concurrency, store=store,
+            rate_budget=rate_budget, comment_options=comment_options, checkpoint=checkpoint
+        )
+        if pipeline:
+            posts = pipeline.aprocess(posts)
+        scraped_data = [post_data if as_records else post_data.to_dict() async for post_data in posts]
+        log_callback(f"Finished scraping. Fetched data for {len(scraped_data)} posts.")
+        if checkpoint:
+            await asyncio.to_thread(checkpoint.finish)
+        return scraped_data
+    except Exception as e:
+        log_callback(f"ERROR: An error occurred during async scraping of r/{subreddit_name}: {e}")
+        traceback.print_exc()
+        reddit_scraper._log_checkpoint(checkpoint, log_callback)
+        return None
+
+async def scrape_subreddit_to_file_async(reddit, subreddit_name, output_path, time_filter='week', limit=50,
+                                         log_callback=print, compression=None, max_concurrency=None, store=None,
+                                         rate_budget=None, output_format=None, comment_options=None, checkpoint=None,
+                                         pipeline=None):
+    """
+    Async twin of reddit_scraper.scrape_subreddit_to_file. Returns a DatasetSummary, or None on failure.
+    The writer opens, writes and closes in worker threads (compression and fsyncs stay off the loop).
+    """
+    if not reddit:
+        log_callback("ERROR: Invalid Reddit instance provided.")
+        return None
+    summary = output_writer.DatasetSummary()
+    try:
+        writer = output_writer.open_writer(output_path, output_format, compression, subreddit_name)
+        await asyncio.to_thread(writer.open)
+        try:
+            posts = aiter_subreddit_posts(
+                reddit, subreddit_name, time_filter, limit, log_callback, max_concurrency=max_concurrency, store=store,
+                rate_budget=rate_budget, comment_options=comment_options, checkpoint=checkpoint
+            )
+            if pipeline:
+                posts = pipeline.aprocess(posts)
+            async for post_data in posts:
+                with metrics.timer("write"):
+                    await asyncio.to_thread(writer.write, post_data)
+                summary.add(post_data)
+        finally:
+            await asyncio.to_thread(writer.close)
+        log_callback(f"Finished scraping. Streamed {summary.posts} posts to {output_path}.")
+        if checkpoint:
+            await asyncio.to_thread(checkpoint.finish)
+        return summary
+    except Exception as e:
+        log_callback(f"ERROR: An error occurred during async scraping of r/{subreddit_name}: {e}")
+        traceback.print_exc()
+        reddit_scraper._log_checkpoint(checkpoint, log_callback)
+        return None
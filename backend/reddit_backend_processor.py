@@ -1,60 +1,99 @@
 # backend/reddit_backend_processor.py
 import asyncio
+import contextvars
 import traceback
 import os
-import json
 import datetime
+import threading
+import time
+import uuid
 
-# Import ADK components with Detailed Error Logging
-ADK_AVAILABLE = False # Assume not available initially
+# ADK components are imported on first use (see _load_adk), not when the app starts
+ADK_AVAILABLE = None # None = not tried yet, then True/False
 Agent, InMemorySessionService, Runner, adk_types = None, None, None, None # Initialize to None
-try:
-    from google.adk.agents import Agent
-    from google.adk.sessions import InMemorySessionService
-    from google.adk.runners import Runner
-    print("DEBUG: Imported ADK Agent, Service, Runner.")
-    try:
-        from google.genai import types as adk_types_import
-        adk_types = adk_types_import # Assign if successful
-        print("DEBUG: Imported google.genai.types.")
-    except ImportError as types_e:
-        print(f"ERROR: Failed to import google.genai.types: {types_e}")
-        # Make this critical, as it's needed for Content/Part
-        raise types_e # Re-raise the specific error
-
-    # If all imports above succeeded:
-    ADK_AVAILABLE = True
-    print("DEBUG: Successfully imported all required ADK components.")
 
-except ImportError as e:
-    # --- MODIFIED EXCEPTION HANDLING ---
-    # Print the specific import error message and DO NOT define dummy classes
-    print(f"ERROR: Failed to import one or more ADK components: {e}")
-    print("       Ensure 'google-adk' and 'google-generativeai' are correctly installed.")
-    # ADK_AVAILABLE remains False
+def _load_adk(log_callback=print):
+    """Imports the ADK components once, with detailed error logging. Returns ADK_AVAILABLE."""
+    global ADK_AVAILABLE, Agent, InMemorySessionService, Runner, adk_types
+    with _init_lock:
+        if ADK_AVAILABLE is not None: return ADK_AVAILABLE
+        ADK_AVAILABLE = False
+        try:
+            with lazy_import.timed("import google.adk"):
+                from google.adk.agents import Agent
+                from google.adk.sessions import InMemorySessionService
+                from google.adk.runners import Runner
+                log_callback("DEBUG: Imported ADK Agent, Service, Runner.")
+                try:
+                    from google.genai import types as adk_types_import
+                    adk_types = adk_types_import # Assign if successful
+                    log_callback("DEBUG: Imported google.genai.types.")
+                except ImportError as types_e:
+                    log_callback(f"ERROR: Failed to import google.genai.types: {types_e}")
+                    # Make this critical, as it's needed for Content/Part
+                    raise types_e # Re-raise the specific error
+            # If all imports above succeeded:
+            ADK_AVAILABLE = True
+            log_callback("DEBUG: Successfully imported all required ADK components.")
+        except ImportError as e:
+            # Print the specific import error message and DO NOT define dummy classes
+            log_callback(f"ERROR: Failed to import one or more ADK components: {e}")
+            log_callback("       Ensure 'google-adk' and 'google-generativeai' are correctly installed.")
+            # ADK_AVAILABLE remains False
+        return ADK_AVAILABLE
 
 # Import other backend components
-try: from . import config, reddit_scraper, reddit_adk_tool, reddit_agent_config
-except ImportError: import config, reddit_scraper, reddit_adk_tool, reddit_agent_config
+try: from . import config, reddit_scraper, reddit_adk_tool, reddit_agent_config, output_writer, metrics, log_sink, lazy_import, snapshot_store
+except ImportError: import config, reddit_scraper, reddit_adk_tool, reddit_agent_config, output_writer, metrics, log_sink, lazy_import, snapshot_store
 
 _reddit_instance = None; _adk_runner = None; _adk_session_service = None
+# Where the tool persists data; set per run by run_reddit_scrape_with_adk (a context variable, so concurrent runs keep their own)
+_tool_output_dir = contextvars.ContextVar("tool_output_dir", default="reddit_data")
+_tool_resume = contextvars.ContextVar("tool_resume", default=None)
+_init_lock = threading.RLock() # A background prewarm and the first click may initialize concurrently
 
-# (Tool Wrapper Function remains the same)
+# The tool persists the data itself and returns only a compact dataset handle to the model
 async def reddit_subreddit_scraper_tool_wrapper( subreddit_name: str, time_filter: str, limit: int ) -> dict:
     print(f"--- Tool Wrapper executing for r/{subreddit_name} ---"); time_filter = time_filter or 'week'; limit = limit or 50
     if not _reddit_instance: print("  [Wrapper Error] Global Reddit instance is not available."); return {"status": "error", "message": "Internal setup error: Reddit instance missing."}
-    result = await reddit_adk_tool.reddit_subreddit_scraper_logic( subreddit_name=subreddit_name, time_filter=time_filter, limit=limit, log_callback=print, reddit_instance_internal=_reddit_instance )
+    result = await reddit_adk_tool.reddit_subreddit_scraper_logic( subreddit_name=subreddit_name, time_filter=time_filter, limit=limit, log_callback=print, reddit_instance_internal=_reddit_instance, output_dir=_tool_output_dir.get(), resume=_tool_resume.get() )
     print(f"--- Tool Wrapper finished for r/{subreddit_name} ---"); return result
 
+def _ensure_reddit_instance(log_callback):
+    global _reddit_instance
+    with _init_lock:
+        if _reddit_instance: return _reddit_instance
+        log_callback("Initializing Reddit connection..."); _reddit_instance = reddit_scraper.initialize_reddit()
+        if not _reddit_instance: log_callback("ERROR: Failed to initialize Reddit connection...")
+        else: log_callback("Reddit connection successful.")
+        return _reddit_instance
+
+def _resolve_dataset_handle(handle, log_callback, store_snapshot=None):
+    """
+    Returns the output path from a tool's dataset handle if the file exists, else None.
+    With store_snapshot (default config.SNAPSHOT_STORE_ENABLED) a JSON/NDJSON output is also stored
+    in the deduplicated snapshot store. The file is kept unless config.SNAPSHOT_REMOVE_OUTPUT is set;
+    the returned path then names the file the snapshot rebuilds to (see snapshot_store.store_output).
+    """
+    if not isinstance(handle, dict) or not handle.get("path"): log_callback(f"  Warning: Tool response did not include a dataset handle: {handle}"); return None
+    if not os.path.exists(handle["path"]): log_callback(f"ERROR: Dataset handle points to a missing file: {handle['path']}"); return None
+    log_callback(f"Dataset saved to: {handle['path']} ({handle.get('posts', 0)} posts, {handle.get('comments', 0)} comments, {handle.get('bytes', 0)} bytes)")
+    if config.SNAPSHOT_STORE_ENABLED if store_snapshot is None else store_snapshot:
+        if output_writer.format_from_path(handle["path"]) in ("json", "ndjson"): snapshot_store.store_output(handle["path"], log_callback)
+        else: log_callback(f"  Snapshot store skipped: only JSON/NDJSON outputs are stored, not {handle['path']}")
+    return handle["path"]
+
 # (ADK Setup Function remains the same - relies on ADK_AVAILABLE check)
 def _initialize_adk_components(log_callback):
+    with _init_lock: return _build_adk_components(log_callback)
+
+def _build_adk_components(log_callback):
     global _adk_runner, _adk_session_service, _reddit_instance
     # This check now correctly prevents proceeding if imports failed
-    if not ADK_AVAILABLE: log_callback("CRITICAL ERROR: ADK libraries not installed or failed to import (check logs)."); return False
+    if not _load_adk(log_callback): log_callback("CRITICAL ERROR: ADK libraries not installed or failed to import (check logs)."); return False
     if _adk_runner: log_callback("ADK components already initialized."); return True
     log_callback("Initializing ADK components...")
-    if not _reddit_instance: log_callback("Initializing Reddit connection first..."); _reddit_instance = reddit_scraper.initialize_reddit();
-    if not _reddit_instance: log_callback("ERROR: Failed to initialize Reddit connection..."); return False; log_callback("Reddit connection successful.")
+    if not _ensure_reddit_instance(log_callback): return False
     prepared_tools = [reddit_subreddit_scraper_tool_wrapper]; log_callback(f"Prepared tool for ADK: {prepared_tools[0].__name__}")
     try:
         if not config.GOOGLE_API_KEY: log_callback("CRITICAL ERROR: GOOGLE_API_KEY not configured..."); return False
@@ -66,14 +105,29 @@ def _initialize_adk_components(log_callback):
     except Exception as agent_e: log_callback(f"!!! Error Creating ADK Agent: {agent_e}"); log_callback(traceback.format_exc()); return False
     _adk_session_service = InMemorySessionService(); _adk_runner = Runner( agent=scraper_agent, app_name=config.APP_NAME, session_service=_adk_session_service, ); log_callback("ADK Runner and Session Service initialized."); return True
 
+def prewarm(log_callback=print, with_agent=False, on_done=None):
+    """
+    Builds the PRAW instance (and with with_agent the ADK agent and runner, importing ADK) on a
+    background thread, so the first scrape does not pay for it. Safe to call while a scrape starts.
+    on_done is called on that thread when warm-up finishes. Returns the thread.
+    """
+    def warm():
+        with lazy_import.timed("prewarm reddit"): _ensure_reddit_instance(log_callback)
+        if with_agent:
+            with lazy_import.timed("prewarm adk"): _initialize_adk_components(log_callback)
+        lazy_import.mark("prewarm finished")
+        if on_done: on_done()
+    thread = threading.Thread(target=warm, name="prewarm", daemon=True); thread.start(); return thread
+
 # (Main Processing Function remains the same - relies on ADK_AVAILABLE check)
-async def run_reddit_scrape_with_adk(subreddit_name: str, time_filter: str, limit: int, output_dir: str, log_callback):
+async def run_reddit_scrape_with_adk(subreddit_name: str, time_filter: str, limit: int, output_dir: str, log_callback, store_snapshot: bool = None, resume: bool = None):
     global _adk_runner, _adk_session_service
     log_callback(f"--- Starting ADK Reddit Scrape for r/{subreddit_name} ---")
     if not _adk_runner:
         if not _initialize_adk_components(log_callback): log_callback("ERROR: Failed to initialize ADK components."); return None
         if not _adk_runner: log_callback("ERROR: ADK Runner not available after initialization attempt."); return None
-    session_id = f"scrape_{subreddit_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+    _tool_output_dir.set(output_dir); _tool_resume.set(resume)
+    session_id = f"scrape_{subreddit_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}" # unique across concurrent runs
     try: session = _adk_session_service.create_session( app_name=config.APP_NAME, user_id=config.USER_ID, session_id=session_id )
     except Exception as session_e: log_callback(f"ERROR: Failed to create ADK session: {session_e}"); return None
     prompt_text = ( f"Please scrape the subreddit '{subreddit_name}' using the '{time_filter}' time filter and limit the results to {limit} posts. Use the available tool and report the outcome." )
@@ -81,43 +135,45 @@ async def run_reddit_scrape_with_adk(subreddit_name: str, time_filter: str, limi
     # Check both ADK_AVAILABLE and adk_types before proceeding
     if not ADK_AVAILABLE or not adk_types: log_callback("ERROR: ADK components/types not loaded properly."); return None
     content = adk_types.Content(role='user', parts=[adk_types.Part(text=prompt_text)])
-    final_agent_response_text = "Agent execution did not yield a final text response."; tool_result_data = None; tool_call_executed = False
+    final_agent_response_text = "Agent execution did not yield a final text response."; dataset_handle = None; tool_call_executed = False
     try:
         log_callback("Starting ADK event loop processing...")
+        run_started = last_event_at = time.perf_counter()
         async for event in _adk_runner.run_async(user_id=config.USER_ID, session_id=session_id, new_message=content):
-            event_attrs = dir(event); log_callback(f"DEBUG: Event: {type(event)} | Attrs: {event_attrs}")
-            if hasattr(event, 'content'): log_callback(f"  DEBUG: event.content: {event.content}")
-            if hasattr(event, 'tool_call') and event.tool_call: log_callback(f"  Event: Agent requesting tool: {getattr(event.tool_call, 'name', 'N/A')}")
-            function_response = None # Check for function_response event
-            if hasattr(event, 'content') and event.content and getattr(event.content, 'parts', None) and event.content.parts: function_response = getattr(event.content.parts[0], 'function_response', None)
+            parts = getattr(getattr(event, 'content', None), 'parts', None) or []
+            function_response = getattr(parts[0], 'function_response', None) if parts else None # Check for function_response event
+            # Time since the previous event: tool execution for a function response, otherwise a model turn
+            now = time.perf_counter(); metrics.observe("phase_seconds", now - last_event_at, phase="adk_tool_call" if function_response else "adk_model_turn"); last_event_at = now
             if function_response:
-                 log_callback(f"  Event: Function response detected."); tool_call_executed = True
+                 log_sink.debug(log_callback, "  Event: Function response detected."); tool_call_executed = True
                  tool_response_content = getattr(function_response, 'response', None)
+                 log_sink.debug(log_callback, "  Tool response payload: %r", tool_response_content) # only formatted at DEBUG
                  if isinstance(tool_response_content, dict):
-                     log_callback(f"  DEBUG: Tool response data: {tool_response_content}");
-                     if tool_response_content.get("status") == "success": tool_result_data = tool_response_content.get("data", []); log_callback(f"  DEBUG: Captured {len(tool_result_data)} items from tool response.")
+                     if tool_response_content.get("status") == "success": dataset_handle = tool_response_content.get("handle")
                      else: log_callback(f"  Warning: Tool response status was not 'success': {tool_response_content.get('message')}")
-                 else: log_callback(f"  Warning: Tool response content was not a dictionary: {tool_response_content}")
-            if hasattr(event, 'content') and event.content and getattr(event.content, 'role', None) == 'model': # Check for final text
-                log_callback("  Event: Model content received."); current_text = None
-                if getattr(event.content, 'parts', None) and event.content.parts:
-                    part_text = getattr(event.content.parts[0], 'text', None)
-                    if part_text is not None: current_text = part_text; final_agent_response_text = current_text; log_callback(f"  DEBUG: Updated final agent response text: '{current_text[:100]}...'")
-        log_callback("DEBUG: Finished iterating through ADK events."); log_callback(f"<<< Final Captured Agent Text: {final_agent_response_text}")
+                 else: log_callback(f"  Warning: Tool response content was not a dictionary.")
+            elif parts and getattr(event.content, 'role', None) == 'model': # Check for final text
+                part_text = getattr(parts[0], 'text', None)
+                if part_text is not None: final_agent_response_text = part_text; log_sink.debug(log_callback, "  Event: Model content received.")
+        metrics.observe("phase_seconds", time.perf_counter() - run_started, phase="adk_run")
+        log_callback(f"<<< Final Captured Agent Text: {final_agent_response_text}")
         if not tool_call_executed: log_callback("Error: Agent finished, but the 'function_response' event was never detected."); return None
-        if tool_result_data is None: log_callback("Error: Tool execution detected, but no 'success' data was captured."); return None
-        log_callback(f"Processing completed. Posts captured: {len(tool_result_data)}")
-        log_callback(f"Attempting to save {len(tool_result_data)} posts to JSON..."); filepath = None
-        try:
-            os.makedirs(output_dir, exist_ok=True); timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{subreddit_name}_{time_filter}_{limit}posts_{timestamp}.json"; filepath = os.path.join(output_dir, filename)
-            log_callback(f"Saving data to: {filepath}")
-            with open(filepath, 'w', encoding='utf-8') as f: json.dump(tool_result_data, f, ensure_ascii=False, indent=4)
-            log_callback(f"Successfully saved data to: {filepath}"); return filepath
-        except Exception as e: log_callback(f"ERROR: Failed to save data to JSON file '{filepath}': {e}"); traceback.print_exc(); return None
+        if dataset_handle is None: log_callback("Error: Tool execution detected, but no dataset handle was captured."); return None
+        return _resolve_dataset_handle(dataset_handle, log_callback, store_snapshot)
     except Exception as e: log_callback(f"ERROR: Unhandled exception during ADK runner execution loop for {session_id}:"); traceback.print_exc(); return None
     finally:
         try:
             if _adk_session_service: _adk_session_service.delete_session( app_name=config.APP_NAME, user_id=config.USER_ID, session_id=session_id ); log_callback(f"ADK Session {session_id} deleted.")
         except Exception as del_e: log_callback(f"Warning: Error deleting session {session_id}: {del_e}")
-        log_callback(f"--- ADK Reddit Scrape for r/{subreddit_name} Finished ---")
\ No newline at end of file
+        log_callback(f"--- ADK Reddit Scrape for r/{subreddit_name} Finished ---")
+
+# Deterministic fast path: no agent, session or model turn - the parameters are already known
+async def run_reddit_scrape_direct(subreddit_name: str, time_filter: str, limit: int, output_dir: str, log_callback, output_format: str = "json", compression: str = None, store_snapshot: bool = None, resume: bool = None):
+    log_callback(f"--- Starting Direct Reddit Scrape for r/{subreddit_name} ---")
+    try:
+        if not _ensure_reddit_instance(log_callback): return None
+        result = await reddit_adk_tool.reddit_subreddit_scraper_logic( subreddit_name=subreddit_name, time_filter=time_filter, limit=limit, log_callback=log_callback, reddit_instance_internal=_reddit_instance, output_dir=output_dir, output_format=output_format, compression=compression, resume=resume )
+        if result.get("status") != "success": log_callback(f"ERROR: Scrape failed: {result.get('message')}"); return None
+        return _resolve_dataset_handle(result.get("handle"), log_callback, store_snapshot)
+    except Exception as e: log_callback(f"ERROR: Unhandled exception during direct scrape of r/{subreddit_name}: {e}"); traceback.print_exc(); return None
+    finally: log_callback(f"--- Direct Reddit Scrape for r/{subreddit_name} Finished ---")
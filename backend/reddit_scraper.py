@@ -1,33 +1,58 @@
 # backend/reddit_scraper.py
-import praw
-import datetime
-import json
+import asyncio
+import contextlib
 import traceback
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 # Import configuration variables loaded by config.py
 try:
-    from . import config
+    from . import config, output_writer, records, metrics, lazy_import
 except ImportError:
-    import config # Fallback if run directly or structure differs
+    import config, output_writer, records, metrics, lazy_import # Fallback if run directly or structure differs
 
-def initialize_reddit():
-    """Initializes and returns a PRAW Reddit instance using loaded config."""
+# praw is imported on first use, not when the app starts
+praw = lazy_import.lazy_module("praw")
+prawcore = lazy_import.lazy_module("prawcore")
+
+def initialize_reddit(http_cache_mode=None):
+    """
+    Initializes and returns a PRAW Reddit instance using loaded config.
+    Unless the HTTP cache mode (default config.HTTP_CACHE_MODE) is 'off', requests go
+    through http_cache.CachingRequestor.
+    """
+    try:
+        from . import http_cache # imports prawcore
+    except ImportError:
+        import http_cache
     # Check if credentials were loaded successfully by config.py
     if not config.REDDIT_CLIENT_ID or not config.REDDIT_CLIENT_SECRET or not config.REDDIT_USER_AGENT:
         print("ERROR: Reddit API credentials not configured correctly in config/environment.")
         return None
 
-    try:
-        reddit = praw.Reddit(
+    def build():
+        return praw.Reddit(
             client_id=config.REDDIT_CLIENT_ID,
             client_secret=config.REDDIT_CLIENT_SECRET,
             user_agent=config.REDDIT_USER_AGENT,
+            oauth_url=config.REDDIT_OAUTH_URL,
+            reddit_url=config.REDDIT_URL,
+            **http_cache.requestor_options(http_cache_mode),
             # Add username/password from config if needed
             # username=config.REDDIT_USERNAME,
             # password=config.REDDIT_PASSWORD,
             # read_only=True
         )
+
+    try:
+        reddit = build()
+        reddit._thread_clients = RedditClients(build, reddit) # same settings for the other threads' instances
         print(f"PRAW Reddit instance created for user agent: {config.REDDIT_USER_AGENT}")
+        if (http_cache_mode or config.HTTP_CACHE_MODE) != "off":
+            print(f"HTTP response cache enabled ({http_cache_mode or config.HTTP_CACHE_MODE}) at {config.HTTP_CACHE_DIR}")
         # Optional: Verify connection (might require non-read-only)
         # try:
         #     print(f"Authenticated Reddit user: {reddit.user.me()}")
@@ -43,77 +68,386 @@ def initialize_reddit():
         traceback.print_exc()
         return None
 
-def scrape_subreddit(reddit, subreddit_name, time_filter='week', limit=50, log_callback=print):
+class RedditClients:
     """
-    Scrapes posts and their top-level comments from a subreddit.
-    (Code for scraping logic remains the same as previous version)
+    praw.Reddit instances for use from several threads. PRAW is not thread-safe (an instance's
+    requests.Session and rate limiter are unlocked), so each thread that makes requests checks
+    out an instance of its own with checkout(). Instances are built by factory when every
+    existing one is in use, and are kept for later checkouts.
     """
-    if not reddit:
-        log_callback("ERROR: Invalid Reddit instance provided.")
+    def __init__(self, factory, reddit=None):
+        self.factory = factory
+        self._idle = [reddit] if reddit is not None else []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """An instance no other thread is using; hand it back with release()."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.factory()
+
+    def release(self, reddit):
+        with self._lock:
+            self._idle.append(reddit)
+
+    @contextlib.contextmanager
+    def checkout(self):
+        reddit = self.acquire()
+        try:
+            yield reddit
+        finally:
+            self.release(reddit)
+
+_clients_lock = threading.Lock()
+
+def clients_for(reddit):
+    """
+    The RedditClients of a praw.Reddit instance, starting with the instance itself. Instances from
+    initialize_reddit are copied with its settings (HTTP cache included); others from their config.
+    """
+    with _clients_lock:
+        clients = getattr(reddit, "_thread_clients", None)
+        if clients is None:
+            clients = reddit._thread_clients = RedditClients(lambda: praw.Reddit(
+                client_id=reddit.config.client_id, client_secret=reddit.config.client_secret,
+                user_agent=reddit.config.user_agent, oauth_url=reddit.config.oauth_url,
+                reddit_url=reddit.config.reddit_url,
+            ), reddit)
+        return clients
+
+class RateBudget:
+    """
+    Global request budget shared by every worker thread of a scrape.
+    Each caller reserves the next free slot under a lock, so requests are
+    spaced evenly and handed out in arrival order.
+    """
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self):
+        """Reserves the next free slot and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        """Blocks until the caller may issue its next request."""
+        if not self.interval:
+            return
+        delay = self._reserve()
+        if delay > 0:
+            metrics.inc("sleeps_total", kind="rate_budget")
+            metrics.inc("sleep_seconds_total", delay, kind="rate_budget")
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Like acquire, but waits on the event loop instead of blocking the thread."""
+        if not self.interval:
+            return
+        delay = self._reserve()
+        if delay > 0:
+            metrics.inc("sleeps_total", kind="rate_budget")
+            metrics.inc("sleep_seconds_total", delay, kind="rate_budget")
+            await asyncio.sleep(delay)
+
+class CommentOptions:
+    """
+    Bounds for the comment traversal of each post; unset values come from config.COMMENT_*.
+    limit: comments kept per post. max_depth: deepest reply level visited (0 = top-level only,
+    -1 = unlimited). max_breadth: comments followed per parent at each level (0 = all).
+    min_score: comments scoring lower are dropped with their replies. replace_more_limit:
+    "load more" expansions per post (each is an extra request). fetch_limit: comments
+    requested per post from the API (0 = PRAW's default).
+    """
+    def __init__(self, limit=None, max_depth=None, max_breadth=None, min_score=None,
+                 replace_more_limit=None, fetch_limit=None):
+        self.limit = config.COMMENT_LIMIT if limit is None else limit
+        self.max_depth = config.COMMENT_MAX_DEPTH if max_depth is None else max_depth
+        self.max_breadth = config.COMMENT_MAX_BREADTH if max_breadth is None else max_breadth
+        self.min_score = config.COMMENT_MIN_SCORE if min_score is None else min_score
+        self.replace_more_limit = config.COMMENT_REPLACE_MORE_LIMIT if replace_more_limit is None else replace_more_limit
+        self.fetch_limit = config.COMMENT_FETCH_LIMIT if fetch_limit is None else fetch_limit
+
+    def prepare(self, post):
+        """Sets the sort and API comment limit on a Submission; call before its comments are fetched."""
+        post.comment_sort = 'top'
+        if self.fetch_limit:
+            post.comment_limit = self.fetch_limit
+
+def _is_usable(comment):
+    # Avoid deleted comments or authors
+    return comment.author and hasattr(comment, 'body') and comment.body != '[deleted]' and comment.body != '[removed]'
+
+def iter_comments(forest, options=None):
+    """
+    Yields the usable comments of a PRAW/asyncpraw CommentForest as records.Comment objects
+    (with parent_id and depth), breadth-first in the same order as CommentForest.list(),
+    without flattening the forest. Replies of deleted comments are still visited;
+    "load more" stubs are skipped. Stop iterating to stop the traversal.
+    """
+    options = options or CommentOptions()
+    breadth = options.max_breadth or None
+    queue = deque((comment, 0) for comment in islice(forest, breadth))
+    while queue:
+        comment, depth = queue.popleft()
+        if type(comment).__name__ == "MoreComments":
+            continue
+        if options.min_score is not None and comment.score < options.min_score:
+            continue
+        if _is_usable(comment):
+            yield records.Comment(comment.id, comment.author.name, comment.body, comment.score, comment.created_utc,
+                                  comment.parent_id, depth)
+        if options.max_depth < 0 or depth < options.max_depth:
+            queue.extend((reply, depth + 1) for reply in islice(comment.replies, breadth))
+
+def _select_comments(forest, options=None):
+    """Picks the first options.limit usable comments of a forest, stopping the traversal there."""
+    options = options or CommentOptions()
+    return list(islice(iter_comments(forest, options), options.limit))
+
+def _load_comments(post, comment_options):
+    """Fetches a post's comment forest (one request, plus any "load more" expansions)."""
+    comment_options.prepare(post)
+    post.comments.replace_more(limit=comment_options.replace_more_limit) # Expand (or just drop) "load more" stubs
+    return post.comments
+
+def _fetch_comments(post, log_callback=print, rate_budget=None, comment_options=None, pool=None, clients=None):
+    """
+    Fetches the top comments of a post. Returns a list of Comment records, or None if the fetch failed.
+    The post's own instance is used unless clients (a RedditClients, for fetches on a thread other than
+    the one that owns the post) is given. With a credential_pool.CredentialPool the request goes out on
+    the pool's next available credential (and is retried on another one if throttled) instead,
+    paced by that credential's own token bucket rather than by rate_budget (one app's budget).
+    """
+    comment_options = comment_options or CommentOptions()
+
+    def fetch(reddit):
+        forest = _load_comments(reddit.submission(id=post.id), comment_options)
+        return _select_comments(forest, comment_options)
+
+    try:
+        if rate_budget and not pool:
+            rate_budget.acquire()
+        started = time.perf_counter()
+        if pool:
+            comments = pool.call(fetch, log_callback)
+        elif clients:
+            with clients.checkout() as reddit:
+                comments = fetch(reddit)
+        else:
+            comments = _select_comments(_load_comments(post, comment_options), comment_options)
+        metrics.observe("comment_fetch_seconds", time.perf_counter() - started, backend="thread")
+        return comments
+
+    except praw.exceptions.PRAWException as comment_e:
+        metrics.inc("comment_fetch_failures_total", backend="thread")
+        log_callback(f"  Warning: Could not fetch comments for post {post.id}: {comment_e}")
         return None
+    except Exception as comment_e:
+        metrics.inc("comment_fetch_failures_total", backend="thread")
+        log_callback(f"  Warning: Unexpected error fetching comments for post {post.id}: {comment_e}")
+        return None
+
+def _top_listing(subreddit, time_filter, limit, checkpoint, log_callback):
+    """subreddit.top(), continued after the checkpoint's listing cursor when resuming."""
+    if not (checkpoint and checkpoint.after):
+        yield from subreddit.top(time_filter=time_filter, limit=limit)
+        return
+    listed = 0
+    for post in subreddit.top(time_filter=time_filter, **checkpoint.listing_args(limit)):
+        listed += 1
+        yield post
+    if not listed and checkpoint.count < limit:
+        # The cursor post may have left the listing; saved posts are skipped by id
+        log_callback("  Warning: The checkpoint's listing cursor returned no posts; listing again from the start.")
+        yield from subreddit.top(time_filter=time_filter, limit=limit)
+
+def iter_subreddit_posts(reddit, subreddit_name, time_filter='week', limit=50, log_callback=print,
+                         max_workers=None, requests_per_minute=None, store=None, rate_budget=None,
+                         comment_options=None, checkpoint=None, pool=None):
+    """
+    Generator that yields records.Post objects (with comments) in listing order as they are scraped.
+    With max_workers > 1 the comment forests are fetched concurrently on a bounded
+    thread pool; all workers share one RateBudget of requests_per_minute (or the given
+    rate_budget, which lets several scrapes share one global budget).
+    At most 2 * max_workers posts are held in flight, so memory stays flat for any limit.
+    With a post_store.PostStore, comment fetches are skipped for posts whose num_comments
+    is unchanged since the last run under the same comment_options (stored comments are reused) and the store's delta
+    records what changed. comment_options (a CommentOptions) bounds the comment traversal.
+    With a loaded checkpoint.Checkpoint, its saved posts are yielded first and the listing
+    continues after its cursor; every finished post is added to it.
+    With a credential_pool.CredentialPool the comment fetches are spread over its credentials,
+    on at least one worker per credential unless max_workers is given.
+    The listing and each worker use their own praw.Reddit instance from clients_for(reddit), so
+    several scrapes may share one reddit across threads.
+    Errors are raised to the caller.
+    """
+    comment_options = comment_options or CommentOptions()
+    if max_workers is None and pool:
+        max_workers = max(config.SCRAPER_MAX_WORKERS, len(pool))
+    max_workers = config.SCRAPER_MAX_WORKERS if max_workers is None else max_workers
+    requests_per_minute = config.REDDIT_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+    rate_budget = rate_budget or RateBudget(requests_per_minute)
 
-    subreddit = reddit.subreddit(subreddit_name)
-    scraped_data = []
+    clients = clients_for(reddit)
     log_callback(f"Fetching top {limit} posts from r/{subreddit_name} for the past {time_filter}...")
+    if max_workers > 1:
+        log_callback(f"  Fetching comments concurrently with {max_workers} workers.")
+    if pool:
+        log_callback(f"  Spreading comment fetches over {len(pool)} credentials.")
 
+    def _complete(post_data, comments, fetched):
+        if store:
+            comments = store.record(subreddit_name, post_data, comments, fetched, comment_options)
+        post_data.comments = comments or []
+        if checkpoint:
+            checkpoint.add(post_data)
+        return post_data
+
+    executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    listing_reddit = clients.acquire()
     try:
+        if checkpoint and checkpoint.count:
+            log_callback(f"  Resuming: {checkpoint.describe()}.")
+            yield from checkpoint.replay()
+
+        pending = deque() # (post_data, future, cached_comments) in listing order
         # Fetch top posts for the specified time filter
-        for i, post in enumerate(subreddit.top(time_filter=time_filter, limit=limit)):
+        subreddit = listing_reddit.subreddit(subreddit_name)
+        listing = _top_listing(subreddit, time_filter, limit, checkpoint, log_callback)
+        for i, post in enumerate(metrics.timed_iter("listing", listing)):
             if i % 10 == 0 and i > 0:
                  log_callback(f"  Fetched {i} posts so far...")
+            if checkpoint and post.id in checkpoint.done_ids:
+                continue # Already saved (listings shift between runs)
 
-            post_data = {
-                "id": post.id,
-                "title": post.title,
-                "score": post.score,
-                "url": post.url,
-                "num_comments": post.num_comments,
-                "created_utc": datetime.datetime.fromtimestamp(post.created_utc, tz=datetime.timezone.utc).isoformat(),
-                "body": post.selftext,
-                "is_over18": post.over_18,
-                "upvote_ratio": post.upvote_ratio,
-                "comments": []
-            }
+            post_data = records.Post.from_praw(post)
+            cached_comments = store.unchanged_comments(post_data, comment_options) if store else None
 
             # Fetch top-level comments (limit to avoid excessive requests)
-            try:
-                post.comment_sort = 'top'
-                post.comments.replace_more(limit=0) # Efficiently remove "load more"
-                comment_limit = 20 # Configurable?
-                processed_comments = 0
-                for comment in post.comments.list():
-                    if processed_comments >= comment_limit:
-                        break
-                    # Avoid deleted comments or authors
-                    if comment.author and hasattr(comment, 'body') and comment.body != '[deleted]' and comment.body != '[removed]':
-                         post_data["comments"].append({
-                            "id": comment.id,
-                            "author": comment.author.name,
-                            "body": comment.body,
-                            "score": comment.score,
-                            "created_utc": datetime.datetime.fromtimestamp(comment.created_utc, tz=datetime.timezone.utc).isoformat(),
-                        })
-                         processed_comments += 1
-
-            except praw.exceptions.PRAWException as comment_e:
-                 log_callback(f"  Warning: Could not fetch comments for post {post.id}: {comment_e}")
-            except Exception as comment_e:
-                 log_callback(f"  Warning: Unexpected error fetching comments for post {post.id}: {comment_e}")
-
-
-            scraped_data.append(post_data)
+            if cached_comments is not None:
+                if executor and pending:
+                    pending.append((post_data, None, cached_comments))
+                else:
+                    yield _complete(post_data, cached_comments, False)
+                continue
+            if not executor:
+                yield _complete(post_data, _fetch_comments(post, log_callback, rate_budget, comment_options, pool), True)
+                continue
+
+            pending.append((post_data, executor.submit(_fetch_comments, post, log_callback, rate_budget, comment_options, pool, clients), None))
+            while len(pending) >= 2 * max_workers:
+                post_data, future, cached_comments = pending.popleft()
+                yield _complete(post_data, future.result(), True) if future else _complete(post_data, cached_comments, False)
+
+        # Drain the remaining concurrent results in listing order
+        while pending:
+            post_data, future, cached_comments = pending.popleft()
+            yield _complete(post_data, future.result(), True) if future else _complete(post_data, cached_comments, False)
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        clients.release(listing_reddit)
+        if checkpoint:
+            checkpoint.close()
+
+def _log_checkpoint(checkpoint, log_callback):
+    """Tells the user that a failed scrape's progress is kept for the next run."""
+    if checkpoint and checkpoint.count:
+        log_callback(f"  Progress kept: {checkpoint.describe()}. Run the same scrape again to resume.")
 
+def scrape_subreddit(reddit, subreddit_name, time_filter='week', limit=50, log_callback=print,
+                     max_workers=None, requests_per_minute=None, store=None, rate_budget=None,
+                     as_records=False, comment_options=None, checkpoint=None, pool=None, pipeline=None):
+    """
+    Scrapes posts and their top-level comments from a subreddit.
+    Collects iter_subreddit_posts into a list of post dicts (or of records.Post objects
+    with as_records=True); returns None on failure.
+    With a checkpoint, a failed scrape keeps its progress for the next run and a completed
+    one removes the checkpoint.
+    With a text_pipeline.Pipeline, posts are preprocessed (and possibly dropped) as they arrive.
+    """
+    if not reddit:
+        log_callback("ERROR: Invalid Reddit instance provided.")
+        return None
+
+    try:
+        posts = iter_subreddit_posts(
+            reddit, subreddit_name, time_filter, limit, log_callback,
+            max_workers=max_workers, requests_per_minute=requests_per_minute, store=store,
+            rate_budget=rate_budget, comment_options=comment_options, checkpoint=checkpoint, pool=pool
+        )
+        if pipeline:
+            posts = pipeline.process(posts)
+        scraped_data = [post_data if as_records else post_data.to_dict() for post_data in posts]
         log_callback(f"Finished scraping. Fetched data for {len(scraped_data)} posts.")
+        if checkpoint:
+            checkpoint.finish()
         return scraped_data
 
-    except praw.exceptions.NotFound:
+    except (prawcore.exceptions.NotFound, prawcore.exceptions.Forbidden, prawcore.exceptions.Redirect):
          log_callback(f"ERROR: Subreddit 'r/{subreddit_name}' not found or is private.")
          return None
     except praw.exceptions.PRAWException as e:
         log_callback(f"ERROR: An error occurred with PRAW during scraping: {e}")
         traceback.print_exc()
+        _log_checkpoint(checkpoint, log_callback)
         return None
     except Exception as e:
         log_callback(f"ERROR: An unexpected error occurred during scraping: {e}")
         traceback.print_exc()
-        return None
\ No newline at end of file
+        _log_checkpoint(checkpoint, log_callback)
+        return None
+
+def scrape_subreddit_to_file(reddit, subreddit_name, output_path, time_filter='week', limit=50,
+                             log_callback=print, compression=None, max_workers=None,
+                             requests_per_minute=None, store=None, rate_budget=None, output_format=None,
+                             comment_options=None, checkpoint=None, pool=None, pipeline=None):
+    """
+    Streams posts from iter_subreddit_posts straight into an NDJSON file
+    (or Parquet/Arrow posts and comments tables, per output_format or the file name).
+    Returns an output_writer.DatasetSummary of what was written, or None on failure.
+    A resumed checkpoint's saved posts are written first, so the file is always complete.
+    With a text_pipeline.Pipeline, posts are preprocessed in batches before they are written.
+    """
+    if not reddit:
+        log_callback("ERROR: Invalid Reddit instance provided.")
+        return None
+
+    summary = output_writer.DatasetSummary()
+    try:
+        with output_writer.open_writer(output_path, output_format, compression, subreddit_name) as writer:
+            posts = iter_subreddit_posts(
+                reddit, subreddit_name, time_filter, limit, log_callback,
+                max_workers=max_workers, requests_per_minute=requests_per_minute, store=store,
+                rate_budget=rate_budget, comment_options=comment_options, checkpoint=checkpoint, pool=pool
+            )
+            if pipeline:
+                posts = pipeline.process(posts)
+            for post_data in posts:
+                with metrics.timer("write"):
+                    writer.write(post_data)
+                summary.add(post_data)
+        log_callback(f"Finished scraping. Streamed {summary.posts} posts to {output_path}.")
+        if checkpoint:
+            checkpoint.finish()
+        return summary
+
+    except (prawcore.exceptions.NotFound, prawcore.exceptions.Forbidden, prawcore.exceptions.Redirect):
+         log_callback(f"ERROR: Subreddit 'r/{subreddit_name}' not found or is private.")
+         return None
+    except praw.exceptions.PRAWException as e:
+        log_callback(f"ERROR: An error occurred with PRAW during scraping: {e}")
+        traceback.print_exc()
+        _log_checkpoint(checkpoint, log_callback)
+        return None
+    except Exception as e:
+        log_callback(f"ERROR: An unexpected error occurred during scraping: {e}")
+        traceback.print_exc()
+        _log_checkpoint(checkpoint, log_callback)
+        return None
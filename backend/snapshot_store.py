@@ -0,0 +1,444 @@
+# backend/snapshot_store.py
+"""
+Deduplicated storage for repeated scrape snapshots.
+
+Each post and comment is split into its content (title, body, url, author, timestamps, ...)
+and the fields that change between scrapes (SCORE_FIELDS). The content is stored once as a
+compressed blob keyed by the SHA-256 of its canonical JSON; a snapshot keeps only a manifest
+of blob ids plus the changing fields, in the original post and comment order. Scraping
+the same subreddit again therefore adds little more than a new manifest.
+
+rebuild() turns a snapshot back into a JSON (or NDJSON) file identical to the one the scrape
+wrote, delete() drops snapshots and gc() removes the blobs no snapshot references any more.
+Blobs and manifests live in one SQLite file (config.SNAPSHOT_STORE_PATH), shared safely by
+several processes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+try:
+    from . import config, output_writer
+except ImportError:
+    import config, output_writer
+
+MANIFEST_VERSION = 1
+POST_SCORE_FIELDS = ("score", "upvote_ratio", "num_comments")
+COMMENT_SCORE_FIELDS = ("score",)
+_QUERY_CHUNK = 500 # hashes per IN (...) query, below SQLite's variable limit
+
+# Manifests reference blobs by id; AUTOINCREMENT keeps ids of collected blobs from being reused
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash BLOB NOT NULL UNIQUE,
+    data BLOB NOT NULL,
+    raw_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    name TEXT PRIMARY KEY,
+    subreddit TEXT,
+    created_at REAL NOT NULL,
+    source_path TEXT,
+    source_format TEXT,
+    source_bytes INTEGER,
+    posts INTEGER NOT NULL,
+    comments INTEGER NOT NULL,
+    manifest BLOB NOT NULL
+);
+"""
+
+# Every stored blob starts with one byte naming its codec
+_RAW, _ZLIB, _ZSTD = b"r", b"z", b"s"
+
+def _compress(data, compression):
+    if compression == "zstd":
+        packed = _ZSTD + output_writer.zstandard.ZstdCompressor(level=9).compress(data)
+    else:
+        packed = _ZLIB + zlib.compress(data, 9)
+    return packed if len(packed) < len(data) + 1 else _RAW + data # tiny blobs do not shrink
+
+def _decompress(packed):
+    codec, data = packed[:1], packed[1:]
+    if codec == _ZLIB:
+        return zlib.decompress(data)
+    if codec == _ZSTD:
+        return output_writer.zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+def _content(record, score_fields, skip=()):
+    """(canonical JSON bytes, SHA-256 digest) of a record without its changing fields."""
+    content = {key: value for key, value in record.items() if key not in score_fields and key not in skip}
+    encoded = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return encoded, hashlib.sha256(encoded).digest()
+
+def _key_order(record, orders):
+    """Index of the record's key order in orders (adding it if new), so rebuilt dicts keep the original key order."""
+    return orders.setdefault(tuple(record), len(orders))
+
+def _entry(blob_hash, scores, order, *rest):
+    # The key order index is left out when it is the common case 0
+    return [blob_hash, scores, *rest, order] if order else [blob_hash, scores, *rest]
+
+def _scores(record, score_fields):
+    """A record's changing fields as a list in score_fields order, or a dict when some of them are absent."""
+    if all(key in record for key in score_fields):
+        return [record[key] for key in score_fields]
+    return {key: record[key] for key in score_fields if key in record}
+
+def _with_scores(content, score_fields, scores):
+    return dict(content, **(dict(zip(score_fields, scores)) if isinstance(scores, list) else scores))
+
+def _chunks(items, size=_QUERY_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def snapshot_name(path):
+    """Snapshot name for an output file: its base name without the format extension."""
+    name = os.path.basename(path)
+    for suffix in (".ndjson.gz", ".ndjson.zst", ".ndjson", ".json"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def read_output(path):
+    """The post dicts of a JSON or NDJSON output file, and its format."""
+    file_format = output_writer.format_from_path(path)
+    if file_format == "json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f), "json"
+    if file_format == "ndjson":
+        return list(output_writer.iter_ndjson(path)), "ndjson"
+    raise ValueError(f"Only JSON and NDJSON outputs can be stored as snapshots, not {path}.")
+
+class SnapshotStore:
+    """
+    Content-addressed snapshot store in a SQLite file (default config.SNAPSHOT_STORE_PATH).
+    Writes run in BEGIN IMMEDIATE transactions, so concurrent scrapes and gc() never see a
+    manifest whose blobs are missing. New blobs are compressed with compression
+    (default config.SNAPSHOT_COMPRESSION, else 'zstd' when zstandard is installed, else 'zlib');
+    blobs written with either codec can always be read back.
+    """
+    def __init__(self, path=None, compression=None):
+        self.path = path or config.SNAPSHOT_STORE_PATH
+        self.compression = compression or config.SNAPSHOT_COMPRESSION or ("zstd" if output_writer.ZSTD_AVAILABLE else "zlib")
+        if self.compression == "zstd" and not output_writer.ZSTD_AVAILABLE:
+            raise RuntimeError("zstd snapshot compression requires the 'zstandard' package (pip install zstandard).")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _blob_ids(self, hashes):
+        """{hash: blob id} for the hashes already stored."""
+        found = {}
+        for chunk in _chunks(list(hashes)):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._conn.execute(f"SELECT hash, id FROM blobs WHERE hash IN ({placeholders})", chunk))
+        return found
+
+    def ingest(self, posts, name, subreddit=None, source_path=None, source_format=None, source_bytes=None):
+        """
+        Stores a snapshot of posts (post dicts, as written to the output files) under name and
+        returns what it cost: new and reused blobs, their bytes and the manifest size.
+        Raises ValueError if a snapshot with that name already exists.
+        """
+        blobs = {}    # hash -> canonical JSON of the content
+        # [post hash, scores, [[comment hash, scores(, key order)], ...](, key order)]; hashes become blob ids below
+        entries = []
+        post_orders, comment_orders = {}, {}
+        comment_count = 0
+        for post in posts:
+            comments = post.get("comments") or []
+            encoded, post_hash = _content(post, POST_SCORE_FIELDS, skip=("comments",))
+            blobs.setdefault(post_hash, encoded)
+            comment_entries = []
+            for comment in comments:
+                encoded, comment_hash = _content(comment, COMMENT_SCORE_FIELDS)
+                blobs.setdefault(comment_hash, encoded)
+                comment_entries.append(_entry(comment_hash, _scores(comment, COMMENT_SCORE_FIELDS), _key_order(comment, comment_orders)))
+            comment_count += len(comments)
+            entries.append(_entry(post_hash, _scores(post, POST_SCORE_FIELDS), _key_order(post, post_orders), comment_entries))
+
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._conn.execute("SELECT 1 FROM snapshots WHERE name = ?", (name,)).fetchone():
+                raise ValueError(f"Snapshot '{name}' is already stored.")
+            ids = self._blob_ids(blobs)
+            rows = [(blob_hash, _compress(encoded, self.compression), len(encoded))
+                    for blob_hash, encoded in blobs.items() if blob_hash not in ids]
+            for row in rows:
+                ids[row[0]] = self._conn.execute("INSERT INTO blobs (hash, data, raw_bytes) VALUES (?, ?, ?)", row).lastrowid
+            for entry in entries:
+                entry[0] = ids[entry[0]]
+                for comment in entry[2]:
+                    comment[0] = ids[comment[0]]
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "post_key_orders": [list(order) for order in post_orders],
+                "comment_key_orders": [list(order) for order in comment_orders],
+                "post_score_fields": list(POST_SCORE_FIELDS),
+                "comment_score_fields": list(COMMENT_SCORE_FIELDS),
+                "posts": entries,
+            }
+            packed_manifest = zlib.compress(json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+            self._conn.execute(
+                "INSERT INTO snapshots (name, subreddit, created_at, source_path, source_format, source_bytes, posts, comments, manifest) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, subreddit, time.time(), source_path, source_format, source_bytes, len(entries), comment_count, packed_manifest),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return {
+            "name": name,
+            "posts": len(entries),
+            "comments": comment_count,
+            "new_blobs": len(rows),
+            "reused_blobs": len(blobs) - len(rows),
+            "new_blob_bytes": sum(len(row[1]) for row in rows),
+            "manifest_bytes": len(packed_manifest),
+        }
+
+    def ingest_file(self, path, name=None, subreddit=None):
+        """Stores a JSON or NDJSON output file as a snapshot (named after the file by default)."""
+        posts, source_format = read_output(path)
+        return self.ingest(posts, name or snapshot_name(path), subreddit=subreddit, source_path=os.path.abspath(path),
+                           source_format=source_format, source_bytes=os.path.getsize(path))
+
+    def _manifest(self, name):
+        row = self._conn.execute("SELECT manifest FROM snapshots WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"No snapshot named '{name}'.")
+        return json.loads(zlib.decompress(row[0]))
+
+    def _blobs(self, ids):
+        contents = {}
+        for chunk in _chunks(list(ids)):
+            placeholders = ",".join("?" * len(chunk))
+            for blob_id, data in self._conn.execute(f"SELECT id, data FROM blobs WHERE id IN ({placeholders})", chunk):
+                contents[blob_id] = json.loads(_decompress(data))
+        missing = set(ids) - set(contents)
+        if missing:
+            raise RuntimeError(f"{len(missing)} blobs referenced by the snapshot are missing from {self.path}.")
+        return contents
+
+    def iter_posts(self, name):
+        """Yields the post dicts of a snapshot, rebuilt in their original order and key order."""
+        self._conn.execute("BEGIN") # one read transaction: gc() cannot remove blobs halfway through
+        try:
+            manifest = self._manifest(name)
+            ids = {entry[0] for entry in manifest["posts"]}
+            ids.update(comment[0] for entry in manifest["posts"] for comment in entry[2])
+            contents = self._blobs(ids)
+        finally:
+            self._conn.execute("COMMIT")
+        post_orders, comment_orders = manifest["post_key_orders"], manifest["comment_key_orders"]
+        post_scores, comment_scores = manifest["post_score_fields"], manifest["comment_score_fields"]
+        for post_id, scores, comment_entries, *post_order in manifest["posts"]:
+            values = _with_scores(contents[post_id], post_scores, scores)
+            comments = []
+            for comment_id, comment_values, *comment_order in comment_entries:
+                merged = _with_scores(contents[comment_id], comment_scores, comment_values)
+                comments.append({key: merged[key] for key in comment_orders[comment_order[0] if comment_order else 0]})
+            if "comments" in post_orders[post_order[0] if post_order else 0]:
+                values["comments"] = comments
+            yield {key: values[key] for key in post_orders[post_order[0] if post_order else 0]}
+
+    def rebuild(self, name, output_path=None, output_format=None):
+        """
+        Writes a snapshot back out as JSON (identical to the scrape's original JSON output) or
+        NDJSON, to output_path (default: the original file name in the current directory),
+        replacing any existing file. Returns the path written.
+        """
+        snapshot = self.get(name)
+        if snapshot is None:
+            raise KeyError(f"No snapshot named '{name}'.")
+        output_format = output_format or snapshot["source_format"] or "json"
+        output_path = output_path or f"{name}.{output_format}"
+        tmp_path = output_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path) # NDJSONWriter creates its file exclusively
+        if output_format == "json":
+            output_writer.save_json(self.iter_posts(name), tmp_path)
+        else:
+            with output_writer.NDJSONWriter(tmp_path) as writer:
+                for post in self.iter_posts(name):
+                    writer.write(post)
+        os.replace(tmp_path, output_path)
+        return output_path
+
+    def get(self, name):
+        row = self._conn.execute(
+            "SELECT name, subreddit, created_at, source_path, source_format, source_bytes, posts, comments, "
+            "length(manifest) AS manifest_bytes FROM snapshots WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def snapshots(self):
+        rows = self._conn.execute(
+            "SELECT name, subreddit, created_at, source_format, source_bytes, posts, comments, length(manifest) AS manifest_bytes "
+            "FROM snapshots ORDER BY name").fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, names):
+        """Removes snapshots (their blobs stay until gc()); returns how many were removed."""
+        names = list(names)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = self._conn.executemany("DELETE FROM snapshots WHERE name = ?", [(name,) for name in names]).rowcount
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def gc(self, dry_run=False, vacuum=True):
+        """
+        Mark and sweep: removes every blob no snapshot manifest references. Runs in one write
+        transaction, so an ingest cannot add a reference to a blob while it is being removed.
+        With vacuum the freed pages are returned to the filesystem.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            referenced = set()
+            for (packed,) in self._conn.execute("SELECT manifest FROM snapshots"):
+                for post_id, _, comment_entries, *_ in json.loads(zlib.decompress(packed))["posts"]:
+                    referenced.add(post_id)
+                    referenced.update(comment[0] for comment in comment_entries)
+            garbage = [(blob_id, size) for blob_id, size in self._conn.execute("SELECT id, length(data) FROM blobs")
+                       if blob_id not in referenced]
+            if not dry_run:
+                self._conn.executemany("DELETE FROM blobs WHERE id = ?", [(blob_id,) for blob_id, _ in garbage])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if vacuum and garbage and not dry_run:
+            self._conn.execute("VACUUM")
+        return {"referenced_blobs": len(referenced), "removed_blobs": len(garbage),
+                "freed_bytes": sum(size for _, size in garbage), "dry_run": dry_run}
+
+    def stats(self):
+        """Snapshot and blob counts, and stored bytes against the bytes of the original outputs."""
+        snapshots, posts, comments, source_bytes, manifest_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(posts), 0), COALESCE(SUM(comments), 0), COALESCE(SUM(source_bytes), 0), "
+            "COALESCE(SUM(length(manifest)), 0) FROM snapshots").fetchone()
+        blobs, blob_bytes, raw_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(data)), 0), COALESCE(SUM(raw_bytes), 0) FROM blobs").fetchone()
+        stored = blob_bytes + manifest_bytes
+        return {
+            "path": self.path,
+            "snapshots": snapshots,
+            "posts": posts,
+            "comments": comments,
+            "blobs": blobs,
+            "blob_bytes": blob_bytes,
+            "blob_raw_bytes": raw_bytes,
+            "manifest_bytes": manifest_bytes,
+            "source_bytes": source_bytes,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "dedup_ratio": round(source_bytes / stored, 2) if stored else None,
+        }
+
+def store_output(path, log_callback=print, remove=None, store_path=None):
+    """
+    Stores a finished scrape's output file as a snapshot. With remove (default
+    config.SNAPSHOT_REMOVE_OUTPUT) the standalone file is then deleted; use it only where nothing
+    reads the file afterwards. Returns the ingest summary, or None if the file could not be
+    stored (it is then kept).
+    """
+    remove = config.SNAPSHOT_REMOVE_OUTPUT if remove is None else remove
+    try:
+        with SnapshotStore(store_path) as store:
+            summary = store.ingest_file(path)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        log_callback(f"  Warning: Could not store {path} as a snapshot: {e}")
+        return None
+    log_callback(f"  Snapshot '{summary['name']}' stored: {summary['new_blobs']} new blobs, {summary['reused_blobs']} reused, "
+                 f"{summary['new_blob_bytes'] + summary['manifest_bytes']} bytes added.")
+    if remove:
+        os.remove(path)
+        log_callback(f"  Removed {path}; rebuild it with: python -m backend.snapshot_store rebuild {summary['name']} -o {path}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicated, content-addressed storage of scrape snapshots.")
+    parser.add_argument("--store", default=None, help="Store database (default SNAPSHOT_STORE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Store JSON/NDJSON output files as snapshots")
+    ingest.add_argument("paths", nargs="+", help="Output files or directories")
+    ingest.add_argument("--remove", action="store_true", help="Delete each file once it is stored")
+    rebuild = commands.add_parser("rebuild", help="Write a snapshot back out as its original file")
+    rebuild.add_argument("name")
+    rebuild.add_argument("-o", "--output", default=None, help="Output path (default ./<name>.<format>)")
+    rebuild.add_argument("--format", choices=["json", "ndjson"], default=None, help="Default: the format it was stored from")
+    commands.add_parser("list", help="List the stored snapshots")
+    delete = commands.add_parser("delete", help="Remove snapshots (run gc afterwards to free their blobs)")
+    delete.add_argument("names", nargs="+")
+    gc = commands.add_parser("gc", help="Remove blobs no snapshot references")
+    gc.add_argument("--dry-run", action="store_true")
+    commands.add_parser("stats", help="Print storage and deduplication statistics")
+    args = parser.parse_args(argv)
+
+    with SnapshotStore(args.store) as store:
+        if args.command == "ingest":
+            paths = []
+            for path in args.paths:
+                if os.path.isdir(path):
+                    paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                                 if name.endswith((".json", ".ndjson", ".ndjson.gz", ".ndjson.zst"))
+                                 and not name.endswith((".metrics.json", ".delta.json", ".state.json")))
+                else:
+                    paths.append(path)
+            failed = 0
+            for path in paths:
+                try:
+                    summary = store.ingest_file(path)
+                except (ValueError, OSError) as e:
+                    print(f"Skipped {path}: {e}")
+                    failed += 1
+                    continue
+                print(f"Stored {path} as '{summary['name']}': {summary['posts']} posts, {summary['new_blobs']} new blobs, "
+                      f"{summary['reused_blobs']} reused")
+                if args.remove:
+                    os.remove(path)
+            print(json.dumps(store.stats(), indent=4))
+            return 1 if failed else 0
+        if args.command == "rebuild":
+            try:
+                print(f"Rebuilt '{args.name}' to {store.rebuild(args.name, args.output, args.format)}")
+            except KeyError as e:
+                print(e.args[0])
+                return 1
+            return 0
+        if args.command == "delete":
+            print(f"Removed {store.delete(args.names)} snapshots. Run 'gc' to free blobs only they referenced.")
+            return 0
+        if args.command == "gc":
+            result = store.gc(dry_run=args.dry_run)
+        elif args.command == "list":
+            result = store.snapshots()
+        else:
+            result = store.stats()
+    print(json.dumps(result, indent=4))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,628 @@
+# backend/text_pipeline.py
+"""
+Post-scrape text preprocessing for dataset building.
+
+A Pipeline chains Transforms over posts: text transforms rewrite the post title/body and every
+comment body (markdown stripping, URL and username normalization, whitespace), and filters
+drop comments or whole posts (deleted/removed, bots, length, language). Posts are processed in
+streamed batches on a process pool; batches are collected in submission order, so the output
+order always matches the input. Per-transform counts and throughput are kept in
+Pipeline.stats.
+
+Pipelines are built from a spec string such as
+    "drop_deleted,drop_bots,strip_markdown,normalize_urls,language:en,min_length:20"
+(arguments follow the name, separated by ':'). Transforms registered with @register are
+available by name; a dotted 'package.module.Class' entry loads a custom Transform subclass.
+
+Runs inline during a scrape (PREPROCESS_TRANSFORMS / the tool's preprocess argument) or offline:
+    python -m backend.text_pipeline reddit_data/ --transforms drop_deleted,strip_markdown
+"""
+import argparse
+import asyncio
+import collections
+import hashlib
+import html
+import importlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from . import config, records, output_writer, metrics
+except ImportError:
+    import config, records, output_writer, metrics
+
+DEFAULT_TRANSFORMS = "drop_deleted,drop_bots,strip_markdown,normalize_urls,normalize_usernames,normalize_whitespace"
+
+TRANSFORMS = {} # spec name -> Transform subclass
+
+def register(name):
+    """Class decorator that makes a Transform available in pipeline specs under name."""
+    def decorate(cls):
+        cls.name = name
+        TRANSFORMS[name] = cls
+        return cls
+    return decorate
+
+class Transform:
+    """
+    One pipeline step over a post dict (records.Post.to_dict() layout).
+    Subclasses override any of: text() to rewrite the title, body and comment bodies,
+    keep_comment() to drop comments, keep_post() to drop the whole post. Spec arguments
+    arrive as strings. Instances are sent to the worker processes, so they must pickle.
+    """
+    name = None
+    rewrites_text = False
+
+    def text(self, value):
+        return value
+
+    def keep_comment(self, comment):
+        return True
+
+    def keep_post(self, post):
+        return True
+
+    def __call__(self, post):
+        """Returns the transformed post, or None to drop it."""
+        if self.rewrites_text:
+            text = self.text
+            post["title"] = text(post.get("title") or "")
+            post["body"] = text(post.get("body") or "")
+            for comment in post["comments"]:
+                comment["body"] = text(comment.get("body") or "")
+        post["comments"] = [comment for comment in post["comments"] if self.keep_comment(comment)]
+        return post if self.keep_post(post) else None
+
+    def __repr__(self):
+        return getattr(self, "spec", None) or self.name or type(self).__name__
+
+# --- Text transforms ---
+
+_MD_IMAGE = re.compile(r"!\[([^\]\n]*)\]\([^)\s]*\)")
+_MD_LINK = re.compile(r"\[([^\]\n]+)\]\([^)\s]*(?:\s+\"[^\"]*\")?\)")
+_MD_SPOILER = re.compile(r">!(.*?)!<", re.S)
+_MD_INLINE_CODE = re.compile(r"`([^`\n]*)`")
+_MD_EMPHASIS = re.compile(r"(\*\*\*|\*\*|\*|___|__|~~)(?=\S)([^\n]+?)(?<=\S)\1")
+_MD_UNDERSCORE = re.compile(r"(?<!\w)_(?=\S)([^\n_]+?)(?<=\S)_(?!\w)")
+_MD_SUPERSCRIPT = re.compile(r"\^\(([^)\n]*)\)|\^(\S+)")
+_MD_ESCAPE = re.compile(r"\\([\\`*_{}\[\]()#+\-.!>~|^])")
+# Matched against each line with .match: block prefixes (heading, quote, list marker) are dropped,
+# and lines that are only markup (code fence, horizontal rule, table rule) become empty
+_MD_LINE_PREFIX = re.compile(r"[ \t]{0,3}(?:#{1,6}[ \t]*|(?:>(?!!)[ \t]?)+(?:(?:[-*+]|\d+[.)])[ \t]+)?|(?:[-*+]|\d+[.)])[ \t]+)")
+_MD_MARKUP_LINE = re.compile(r"[ \t]*(?:```.*|~~~.*|(?:[-*_][ \t]*){3,}|\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)+\|?[ \t]*)$")
+
+def _strip_line(line):
+    if _MD_MARKUP_LINE.match(line):
+        return ""
+    prefix = _MD_LINE_PREFIX.match(line)
+    return line[prefix.end():] if prefix else line
+
+@register("strip_markdown")
+class StripMarkdown(Transform):
+    """Reduces Reddit markdown to plain text: link and image text are kept, formatting marks are removed."""
+    rewrites_text = True
+
+    def text(self, value):
+        if not value:
+            return value
+        if "&" in value:
+            value = html.unescape(value) # Reddit escapes &, < and > in bodies
+        value = "\n".join(map(_strip_line, value.split("\n")))
+        # Each inline pattern runs only when its marker occurs; most comments have none
+        if "](" in value:
+            value = _MD_LINK.sub(r"\1", _MD_IMAGE.sub(r"\1", value))
+        if ">!" in value:
+            value = _MD_SPOILER.sub(r"\1", value)
+        if "`" in value:
+            value = _MD_INLINE_CODE.sub(r"\1", value)
+        if "*" in value or "~~" in value or "__" in value:
+            value = _MD_EMPHASIS.sub(r"\2", value)
+        if "_" in value:
+            value = _MD_UNDERSCORE.sub(r"\1", value)
+        if "^" in value:
+            value = _MD_SUPERSCRIPT.sub(lambda m: m.group(1) if m.group(1) is not None else m.group(2), value)
+        if "\\" in value:
+            value = _MD_ESCAPE.sub(r"\1", value)
+        return value.replace("\u200b", "") # zero-width spaces Reddit inserts for blank lines
+
+_URL = re.compile(r"(?:https?://|www\.)[^\s<>()\[\]\"']+", re.I)
+
+@register("normalize_urls")
+class NormalizeUrls(Transform):
+    """
+    Replaces URLs. mode 'token' (default) substitutes replacement (default '<url>'),
+    'domain' keeps only the host name and 'remove' deletes them.
+    """
+    rewrites_text = True
+
+    def __init__(self, mode="token", replacement="<url>"):
+        if mode not in ("token", "domain", "remove"):
+            raise ValueError(f"normalize_urls mode must be 'token', 'domain' or 'remove', not '{mode}'.")
+        self.mode = mode
+        self.replacement = replacement
+
+    def _replace(self, match):
+        if self.mode == "token":
+            return self.replacement
+        if self.mode == "remove":
+            return ""
+        host = re.sub(r"^(?:https?://)?(?:www\.)?", "", match.group(0), flags=re.I)
+        return host.split("/", 1)[0].lower()
+
+    def text(self, value):
+        return _URL.sub(self._replace, value) if value else value
+
+_USERNAME = re.compile(r"(?<![\w/])/?u/[A-Za-z0-9_-]{3,20}\b")
+
+@register("normalize_usernames")
+class NormalizeUsernames(Transform):
+    """
+    Replaces u/name mentions with replacement (default '<user>'). With anonymize set
+    (any value), comment authors are also replaced by a stable hash.
+    """
+    rewrites_text = True
+
+    def __init__(self, replacement="<user>", anonymize=None):
+        self.replacement = replacement
+        self.anonymize = bool(anonymize)
+
+    def text(self, value):
+        return _USERNAME.sub(self.replacement, value) if value else value
+
+    def keep_comment(self, comment):
+        if self.anonymize and comment.get("author"):
+            comment["author"] = "user_" + hashlib.sha1(comment["author"].encode("utf-8")).hexdigest()[:10]
+        return True
+
+_WHITESPACE = re.compile("[ \t\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+@register("normalize_whitespace")
+class NormalizeWhitespace(Transform):
+    """Collapses runs of spaces, keeps at most one blank line between paragraphs and trims."""
+    rewrites_text = True
+
+    def text(self, value):
+        if not value:
+            return value
+        value = _WHITESPACE.sub(" ", value.replace("\r\n", "\n"))
+        return _BLANK_LINES.sub("\n\n", "\n".join(line.strip() for line in value.split("\n"))).strip()
+
+# --- Filters ---
+
+_DELETED = ("[deleted]", "[removed]")
+
+@register("drop_deleted")
+class DropDeleted(Transform):
+    """
+    Drops deleted or removed comments (by body or by author) and posts whose title or
+    selftext was deleted or removed. Link posts (empty body) are kept.
+    """
+    def keep_comment(self, comment):
+        return comment.get("author") not in (None, "", "[deleted]") and (comment.get("body") or "").strip() not in _DELETED
+
+    def keep_post(self, post):
+        return (post.get("body") or "").strip() not in _DELETED and post.get("title") not in ("[deleted by user]", "[removed]")
+
+_BOT_AUTHOR = re.compile(r"(?i)(?:^automoderator$|bot$|^bot[_-]|[_-]bot[_-])")
+_BOT_FOOTER = re.compile(r"(?i)\bI am a bot\b|\bthis action was performed automatically\b|\bbeep,? boop\b")
+
+@register("drop_bots")
+class DropBots(Transform):
+    """
+    Drops comments written by bots: AutoModerator, authors whose name looks like a bot
+    (pattern, default names ending in 'bot') and bodies carrying a bot footer.
+    """
+    def __init__(self, pattern=None):
+        self.pattern = re.compile(pattern) if pattern else _BOT_AUTHOR
+
+    def keep_comment(self, comment):
+        author = comment.get("author") or ""
+        return not self.pattern.search(author) and not _BOT_FOOTER.search(comment.get("body") or "")
+
+@register("min_length")
+class MinLength(Transform):
+    """Drops comments shorter than chars characters (after the transforms before it)."""
+    def __init__(self, chars):
+        self.chars = int(chars)
+
+    def keep_comment(self, comment):
+        return len((comment.get("body") or "").strip()) >= self.chars
+
+@register("max_length")
+class MaxLength(Transform):
+    """Drops comments longer than chars characters."""
+    def __init__(self, chars):
+        self.chars = int(chars)
+
+    def keep_comment(self, comment):
+        return len(comment.get("body") or "") <= self.chars
+
+@register("min_post_length")
+class MinPostLength(Transform):
+    """Drops posts whose title and body together are shorter than chars characters."""
+    def __init__(self, chars):
+        self.chars = int(chars)
+
+    def keep_post(self, post):
+        return len((post.get("title") or "").strip()) + len((post.get("body") or "").strip()) >= self.chars
+
+# Common function words per language; enough to tell these languages apart on a sentence or two
+_STOPWORDS = {
+    "en": "the and to of a in is it you that for was on are with as this be have not but they at what so if or from my just like",
+    "de": "der die und das ist nicht ich sie es zu den mit ein eine auch auf sich dem wie aber wenn noch oder kann nur",
+    "fr": "le la les et des est un une que pas pour dans qui sur au avec je ce il mais ou plus sont elle nous vous",
+    "es": "el la los las que de y en un una es por con para no se lo como pero más su al del este muy también",
+    "pt": "o a os as que de e do da em um uma não para com se por mais mas como ao dos das foi você também",
+    "it": "il lo la gli le che di e un una non per con sono è del della ma come anche più se questo mi ho",
+    "nl": "de het een en van is dat niet ik je op te zijn met voor er maar als ook aan om wat bij",
+}
+_STOPWORD_LANGUAGES = collections.defaultdict(list) # word -> languages it is a stopword of
+for _language, _words in _STOPWORDS.items():
+    for _word in _words.split():
+        _STOPWORD_LANGUAGES[_word].append(_language)
+_WORD = re.compile(r"[^\W\d_]+")
+
+def detect_language(text, min_words=5, max_chars=1000):
+    """
+    Best-guess language code of text from its stopwords (one of _STOPWORDS), 'other' when
+    none match, or None when the text is too short to tell. Only the first max_chars
+    characters are looked at.
+    """
+    words = _WORD.findall(text[:max_chars].lower())
+    if len(words) < min_words:
+        return None
+    scores = collections.Counter()
+    for word in words:
+        for language in _STOPWORD_LANGUAGES.get(word, ()):
+            scores[language] += 1
+    if not scores:
+        return "other"
+    return max(sorted(scores), key=scores.__getitem__) # ties go to the first code alphabetically
+
+@register("language")
+class LanguageFilter(Transform):
+    """
+    Keeps posts and comments in the given languages (default 'en'), detected from stopwords.
+    Texts too short to classify are kept.
+    """
+    def __init__(self, *languages):
+        self.languages = frozenset(languages or ("en",))
+
+    def _keep(self, text):
+        language = detect_language(text)
+        return language is None or language in self.languages
+
+    def keep_comment(self, comment):
+        return self._keep(comment.get("body") or "")
+
+    def keep_post(self, post):
+        return self._keep(f"{post.get('title') or ''}\n{post.get('body') or ''}")
+
+# --- Pipeline ---
+
+def _resolve(name):
+    if name in TRANSFORMS:
+        return TRANSFORMS[name]
+    module_name, _, attribute = name.rpartition(".")
+    if not module_name:
+        raise ValueError(f"Unknown transform '{name}'. Available: {', '.join(sorted(TRANSFORMS))}.")
+    cls = getattr(importlib.import_module(module_name), attribute)
+    if not (isinstance(cls, type) and issubclass(cls, Transform)):
+        raise ValueError(f"'{name}' is not a Transform subclass.")
+    return cls
+
+def parse_spec(spec):
+    """List of Transform instances for a comma-separated spec ('name:arg:arg,name,...')."""
+    transforms = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if item:
+            name, *args = item.split(":")
+            transform = _resolve(name.strip())(*args)
+            transform.spec = item # labels its stats, e.g. 'min_length:20'
+            transforms.append(transform)
+    return transforms
+
+class PipelineStats:
+    """Per-transform posts in/dropped, comments dropped and CPU seconds, summed over all batches."""
+    def __init__(self, transforms=()):
+        self.transforms = {repr(transform): {"posts_in": 0, "posts_dropped": 0, "comments_dropped": 0, "seconds": 0.0}
+                           for transform in transforms}
+        self.posts_in = 0
+        self.posts_out = 0
+        self.batches = 0
+        self.wall_seconds = 0.0
+
+    def merge(self, batch):
+        """Adds the counters of one batch (as returned by _run_batch)."""
+        for name, counters in batch["transforms"].items():
+            totals = self.transforms.setdefault(name, {"posts_in": 0, "posts_dropped": 0, "comments_dropped": 0, "seconds": 0.0})
+            for key, value in counters.items():
+                totals[key] += value
+            metrics.inc("preprocess_posts_total", counters["posts_in"], transform=name)
+            metrics.inc("preprocess_seconds_total", counters["seconds"], transform=name)
+        self.posts_in += batch["posts_in"]
+        self.posts_out += batch["posts_out"]
+        self.batches += 1
+
+    def summary(self):
+        return {
+            "posts_in": self.posts_in,
+            "posts_out": self.posts_out,
+            "batches": self.batches,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "posts_per_second": round(self.posts_in / self.wall_seconds, 1) if self.wall_seconds else None,
+            "transforms": [
+                dict(counters, transform=name, seconds=round(counters["seconds"], 4),
+                     posts_per_second=round(counters["posts_in"] / counters["seconds"], 1) if counters["seconds"] else None)
+                for name, counters in self.transforms.items()
+            ],
+        }
+
+    def report(self, log_callback=print):
+        summary = self.summary()
+        log_callback(f"Preprocessing: {summary['posts_out']}/{summary['posts_in']} posts kept in {summary['batches']} batches, "
+                     f"{summary['wall_seconds']:.2f}s ({summary['posts_per_second'] or 0} posts/s).")
+        for row in summary["transforms"]:
+            log_callback(f"  {row['transform']}: {row['posts_in']} posts, {row['posts_dropped']} dropped, "
+                         f"{row['comments_dropped']} comments dropped, {row['posts_per_second'] or 0} posts/s (CPU)")
+
+def _run_batch(transforms, batch):
+    """
+    Applies the transforms to one batch. Posts come back in the type they arrived in
+    (records.Post or dict); dropped posts are left out. Returns (posts, counters).
+    """
+    counters = {repr(transform): {"posts_in": 0, "posts_dropped": 0, "comments_dropped": 0, "seconds": 0.0}
+                for transform in transforms}
+    output = []
+    for item in batch:
+        post = records.as_dict(item)
+        post = dict(post, comments=[dict(comment) for comment in post.get("comments") or ()]) # never mutate the caller's dicts
+        for transform in transforms:
+            step = counters[repr(transform)]
+            comments = len(post["comments"])
+            started = time.perf_counter()
+            result = transform(post)
+            step["seconds"] += time.perf_counter() - started
+            step["posts_in"] += 1
+            if result is None:
+                step["posts_dropped"] += 1
+                post = None
+                break
+            step["comments_dropped"] += comments - len(result["comments"])
+            post = result
+        if post is not None:
+            output.append(post if isinstance(item, dict) else records.Post.from_dict(post))
+    return output, {"transforms": counters, "posts_in": len(batch), "posts_out": len(output)}
+
+_worker_transforms = None
+
+def _init_worker(transforms):
+    global _worker_transforms
+    _worker_transforms = transforms
+
+def _run_worker_batch(batch):
+    return _run_batch(_worker_transforms, batch)
+
+def _batches(posts, size):
+    batch = []
+    for post in posts:
+        batch.append(post)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class Pipeline:
+    """
+    Chained transforms run over streamed batches of batch_size posts (records.Post objects or
+    post dicts) on `workers` processes (1 = in this process). At most two batches per worker
+    are in flight, so memory stays bounded on any input size. The pool is started on first use;
+    close() (or leaving a with block) shuts it down.
+    """
+    def __init__(self, transforms, workers=None, batch_size=None):
+        self.transforms = parse_spec(transforms) if isinstance(transforms, str) else list(transforms)
+        workers = config.PREPROCESS_WORKERS if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.batch_size = batch_size or config.PREPROCESS_BATCH_SIZE
+        self.stats = PipelineStats(self.transforms)
+        self._executor = None
+
+    @classmethod
+    def from_config(cls):
+        """The inline pipeline from config.PREPROCESS_TRANSFORMS, or None when it is empty."""
+        return cls(config.PREPROCESS_TRANSFORMS) if config.PREPROCESS_TRANSFORMS.strip() else None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: the scraper runs threads, which fork would copy mid-flight
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker, initargs=(self.transforms,))
+        return self._executor
+
+    def _collect(self, result):
+        posts, counters = result
+        self.stats.merge(counters)
+        return posts
+
+    def process(self, posts):
+        """Yields the transformed posts in input order."""
+        started = time.perf_counter()
+        try:
+            if self.workers == 1:
+                for batch in _batches(posts, self.batch_size):
+                    yield from self._collect(_run_batch(self.transforms, batch))
+                return
+            pool = self._pool()
+            pending = collections.deque()
+            try:
+                for batch in _batches(posts, self.batch_size):
+                    pending.append(pool.submit(_run_worker_batch, batch))
+                    while len(pending) >= 2 * self.workers:
+                        yield from self._collect(pending.popleft().result())
+                while pending:
+                    yield from self._collect(pending.popleft().result())
+            finally:
+                for future in pending:
+                    future.cancel()
+        finally:
+            self.stats.wall_seconds += time.perf_counter() - started
+
+    async def aprocess(self, aposts):
+        """Async version of process() over an async iterable; the event loop never runs the transforms itself."""
+        started = time.perf_counter()
+        pending = collections.deque()
+        try:
+            batch = []
+            async for post in aposts:
+                batch.append(post)
+                if len(batch) < self.batch_size:
+                    continue
+                pending.append(self._submit_async(batch))
+                batch = []
+                while len(pending) >= 2 * self.workers:
+                    for post_out in self._collect(await pending.popleft()):
+                        yield post_out
+            if batch:
+                pending.append(self._submit_async(batch))
+            while pending:
+                for post_out in self._collect(await pending.popleft()):
+                    yield post_out
+        finally:
+            for future in pending:
+                future.cancel()
+            self.stats.wall_seconds += time.perf_counter() - started
+
+    def _submit_async(self, batch):
+        if self.workers == 1:
+            return asyncio.ensure_future(asyncio.to_thread(_run_batch, self.transforms, batch))
+        return asyncio.wrap_future(self._pool().submit(_run_worker_batch, batch))
+
+# --- Offline runs over existing output files ---
+
+def _input_files(paths):
+    """JSON and NDJSON output files named by paths (directories are searched, hidden ones skipped)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirs, filenames in os.walk(path):
+                subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+                for filename in sorted(filenames):
+                    if _is_dataset_file(filename):
+                        yield os.path.join(directory, filename)
+        else:
+            yield path
+
+def _is_dataset_file(filename):
+    if ".preprocessed." in filename or filename.endswith((".metrics.json", ".delta.json", ".state.json")):
+        return False
+    return filename.endswith((".json", ".ndjson", ".ndjson.gz", ".ndjson.zst"))
+
+def _read_posts(path):
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    return output_writer.iter_ndjson(path)
+
+def output_path_for(path, output_dir):
+    """'<output_dir>/<input stem>.preprocessed.ndjson' for an input file."""
+    stem = os.path.basename(path)
+    for suffix in (".ndjson.gz", ".ndjson.zst", ".ndjson", ".json"):
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+            break
+    return os.path.join(output_dir, f"{stem}.preprocessed.ndjson")
+
+class _OutputSequence:
+    """Writes the outputs of the input files one after another, in input order."""
+    def __init__(self, inputs, outputs, log_callback):
+        self.inputs, self.outputs, self.log_callback = inputs, outputs, log_callback
+        self.index = -1
+        self.writer = None
+        self.kept = 0
+
+    def advance(self):
+        """Finishes the current output (moving it into place) and opens the next one."""
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.writer.path, self.outputs[self.index]) # a half-written output never replaces a finished one
+            self.log_callback(f"  {self.inputs[self.index]} -> {self.outputs[self.index]} ({self.kept} posts)")
+        self.index += 1
+        self.writer, self.kept = None, 0
+        if self.index < len(self.inputs):
+            tmp_path = f"{self.outputs[self.index]}.tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path) # left by an interrupted run; the writer creates its file exclusively
+            self.writer = output_writer.NDJSONWriter(tmp_path)
+            self.writer.open()
+
+    def write(self, source, post):
+        while self.index < source: # files in between had every post dropped
+            self.advance()
+        self.writer.write(post)
+        self.kept += 1
+
+    def finish(self):
+        while self.index < len(self.inputs):
+            self.advance()
+
+def preprocess_files(paths, output_dir, pipeline, log_callback=print):
+    """
+    Runs the pipeline over every input file, writing '<stem>.preprocessed.ndjson' for each;
+    returns the output paths. All files go through one stream of batches (each post tagged
+    with its file), so small files keep every worker busy too.
+    """
+    inputs = list(_input_files(paths))
+    outputs = [output_path_for(path, output_dir) for path in inputs]
+
+    def tagged_posts():
+        for index, path in enumerate(inputs):
+            for post in _read_posts(path):
+                yield dict(post, _source=index)
+
+    sequence = _OutputSequence(inputs, outputs, log_callback)
+    sequence.advance()
+    for post in pipeline.process(tagged_posts()):
+        sequence.write(post.pop("_source"), post)
+    sequence.finish()
+    return outputs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean and filter the text of scraped output files on a process pool.")
+    parser.add_argument("inputs", nargs="+", help="JSON/NDJSON output files or directories (e.g. reddit_data/)")
+    parser.add_argument("--transforms", default=DEFAULT_TRANSFORMS,
+                        help=f"Comma-separated transform spec (default {DEFAULT_TRANSFORMS}). Available: {', '.join(sorted(TRANSFORMS))}")
+    parser.add_argument("--output-dir", default=os.path.join("reddit_data", "preprocessed"))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default PREPROCESS_WORKERS; 1 = no pool)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Posts per batch (default PREPROCESS_BATCH_SIZE)")
+    args = parser.parse_args(argv)
+
+    with Pipeline(args.transforms, workers=args.workers, batch_size=args.batch_size) as pipeline:
+        print(f"Preprocessing with {len(pipeline.transforms)} transforms on {pipeline.workers} worker processes: "
+              f"{', '.join(map(repr, pipeline.transforms))}")
+        outputs = preprocess_files(args.inputs, args.output_dir, pipeline)
+        pipeline.stats.report()
+    if not outputs:
+        print("No JSON or NDJSON output files found.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
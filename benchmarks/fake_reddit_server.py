@@ -0,0 +1,213 @@
+# benchmarks/fake_reddit_server.py
+"""
+Local stand-in for the Reddit API, for offline benchmarks.
+Serves the OAuth token endpoint, synthetic /r/<sub>/top listings, /api/info lookups and
+/comments/<id> comment trees of configurable size, with optional per-request latency and
+x-ratelimit-* headers, plus a pushshift-style /reddit/search/submission endpoint over
+total_posts posts created post_interval seconds apart (for backfills).
+With client_quota set, each OAuth client id gets client_quota requests per quota_window
+seconds; the x-ratelimit-* headers report its real budget and requests over it get a 429.
+Records the service time of every request it answers.
+"""
+import base64
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LISTING_CAP = 1000 # Reddit stops listings at about 1000 items
+FIRST_POST_UTC = 1700000000
+
+class FakeRedditConfig:
+    """Shape of the synthetic data and server behaviour."""
+    def __init__(self, comments_per_post=50, reply_depth=2, body_words=40, latency_ms=0.0,
+                 ratelimit_remaining=600, ratelimit_reset=600, total_posts=5000, post_interval=60,
+                 client_quota=0, quota_window=10):
+        self.comments_per_post = comments_per_post
+        self.reply_depth = reply_depth
+        self.body_words = body_words
+        self.latency_ms = latency_ms
+        self.ratelimit_remaining = ratelimit_remaining
+        self.ratelimit_reset = ratelimit_reset
+        self.total_posts = total_posts
+        self.post_interval = post_interval
+        self.client_quota = client_quota
+        self.quota_window = quota_window
+
+def _post(index, subreddit, cfg):
+    post_id = f"p{index:06d}"
+    return {"kind": "t3", "data": {
+        "id": post_id, "name": f"t3_{post_id}", "subreddit": subreddit, "author": f"author{index % 97}",
+        "title": f"Synthetic post {index} in r/{subreddit}", "selftext": " ".join(["lorem"] * cfg.body_words),
+        "score": 100000 - index, "upvote_ratio": 0.9, "num_comments": cfg.comments_per_post,
+        "created_utc": float(FIRST_POST_UTC + index * cfg.post_interval), "over_18": False, "url": f"https://example.com/{post_id}",
+        "permalink": f"/r/{subreddit}/comments/{post_id}/",
+    }}
+
+def _comment_tree(post_id, cfg):
+    """Top-level comments with a chain of replies reply_depth deep, comments_per_post in total."""
+    counter = iter(range(cfg.comments_per_post))
+
+    def build(parent, depth):
+        try:
+            n = next(counter)
+        except StopIteration:
+            return None
+        comment_id = f"{post_id}c{n}"
+        child = build(f"t1_{comment_id}", depth + 1) if depth < cfg.reply_depth else None
+        return {"kind": "t1", "data": {
+            "id": comment_id, "name": f"t1_{comment_id}", "author": f"commenter{n % 53}",
+            "body": " ".join(["ipsum"] * (cfg.body_words // 2)), "score": 1000 - n,
+            "created_utc": 1700000100.0 + n, "parent_id": parent, "link_id": f"t3_{post_id}", "depth": depth,
+            "replies": {"kind": "Listing", "data": {"after": None, "before": None, "children": [child]}} if child else "",
+        }}
+
+    top_level = []
+    while True:
+        comment = build(f"t3_{post_id}", 0)
+        if comment is None:
+            return top_level
+        top_level.append(comment)
+
+def _listing(children, after=None):
+    return {"kind": "Listing", "data": {"after": after, "before": None, "dist": len(children), "children": children}}
+
+class FakeRedditServer:
+    """Runs the fake API on a background thread. Use as a context manager or call start()/stop()."""
+    def __init__(self, cfg=None, host="127.0.0.1", port=0):
+        self.cfg = cfg or FakeRedditConfig()
+        self.latencies = [] # seconds per answered request
+        self.requests_by_client = {}
+        self._windows = {} # access token -> (window start, requests used)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, started, quota=None, status=200):
+                if server.cfg.latency_ms:
+                    time.sleep(server.cfg.latency_ms / 1000.0)
+                remaining, used, reset = quota or (server.cfg.ratelimit_remaining, 0, server.cfg.ratelimit_reset)
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("x-ratelimit-remaining", str(remaining))
+                self.send_header("x-ratelimit-used", str(used))
+                self.send_header("x-ratelimit-reset", str(reset))
+                if status == 429:
+                    self.send_header("retry-after", str(reset))
+                self.end_headers()
+                self.wfile.write(body)
+                server._record(time.perf_counter() - started)
+
+            def do_POST(self):
+                started = time.perf_counter()
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                client_id = "fake"
+                auth = self.headers.get("Authorization", "")
+                if auth.lower().startswith("basic "):
+                    client_id = base64.b64decode(auth[6:]).decode("utf-8").split(":", 1)[0]
+                self._send({"access_token": f"token-{client_id}", "token_type": "bearer", "expires_in": 86400, "scope": "*"}, started)
+
+            def do_GET(self):
+                started = time.perf_counter()
+                token = self.headers.get("Authorization", "").split(" ")[-1]
+                quota = server._take_quota(token)
+                if quota and quota[0] < 0:
+                    self._send({"message": "Too Many Requests", "error": 429}, started, (0, quota[1], quota[2]), 429)
+                    return
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                parts = [p for p in url.path.split("/") if p]
+                if len(parts) >= 3 and parts[0] == "r":
+                    limit = int(query.get("limit", ["25"])[0])
+                    after = query.get("after", [None])[0]
+                    start = int(after.split("_p")[1]) + 1 if after else 0
+                    end = min(start + limit, LISTING_CAP)
+                    children = [_post(i, parts[1], server.cfg) for i in range(start, end)]
+                    next_after = children[-1]["data"]["name"] if children and end < LISTING_CAP else None
+                    self._send(_listing(children, next_after), started, quota)
+                elif parts[:2] == ["api", "info"]:
+                    ids = [name.split("_", 1)[1] for name in query.get("id", [""])[0].split(",") if name]
+                    self._send(_listing([_post(int(i[1:]), "benchmark", server.cfg) for i in ids]), started, quota)
+                elif parts[:3] == ["reddit", "search", "submission"]:
+                    self._send({"data": server._search(query)}, started, quota)
+                elif len(parts) >= 2 and parts[0] == "comments":
+                    post_id = parts[1]
+                    post = _post(int(post_id[1:]), "benchmark", server.cfg)
+                    self._send([_listing([post]), _listing(_comment_tree(post_id, server.cfg))], started, quota)
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _search(self, query):
+        """Pushshift-style search: posts with after < created_utc < before, oldest first, at most size."""
+        interval = self.cfg.post_interval
+        after = float(query.get("after", [FIRST_POST_UTC - 1])[0])
+        before = float(query.get("before", [FIRST_POST_UTC + self.cfg.total_posts * interval])[0])
+        size = int(query.get("size", ["100"])[0])
+        first = max(0, math.floor((after - FIRST_POST_UTC) / interval) + 1)
+        last = min(self.cfg.total_posts, math.ceil((before - FIRST_POST_UTC) / interval))
+        subreddit = query.get("subreddit", ["benchmark"])[0]
+        return [{"id": post["data"]["id"], "created_utc": post["data"]["created_utc"]}
+                for post in (_post(i, subreddit, self.cfg) for i in range(first, min(last, first + size)))]
+
+    def _take_quota(self, token):
+        """Counts a request against the token's quota window. Returns (remaining, used, reset), remaining < 0 when over it."""
+        with self._lock:
+            self.requests_by_client[token] = self.requests_by_client.get(token, 0) + 1
+            if not self.cfg.client_quota:
+                return None
+            now = time.monotonic()
+            window_start, used = self._windows.get(token, (now, 0))
+            if now - window_start >= self.cfg.quota_window:
+                window_start, used = now, 0
+            reset = max(1, math.ceil(window_start + self.cfg.quota_window - now))
+            if used >= self.cfg.client_quota:
+                self._windows[token] = (window_start, used)
+                return (-1, used, reset)
+            used += 1
+            self._windows[token] = (window_start, used)
+            return (self.cfg.client_quota - used, used, reset)
+
+    def _record(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def take_latencies(self):
+        """Returns and clears the request latencies recorded so far."""
+        with self._lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
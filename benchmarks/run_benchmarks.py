@@ -0,0 +1,221 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline scraper benchmarks against the local fake Reddit API.
+
+    python -m benchmarks.run_benchmarks --posts 200 --comments 50 --latency-ms 20 --workers 8
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<previous>.json
+
+Runs scrape_subreddit (serial and concurrent), reddit_subreddit_scraper_logic (thread and,
+if asyncpraw is installed, async backends) and the JSON save step, and reports posts/sec,
+comments/sec, p50/p95 per-request latency, peak RSS (and its growth over the RSS at the
+start) and bytes written for each. Results are
+saved as JSON; --compare flags throughput regressions against an earlier results file.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    from .fake_reddit_server import FakeRedditConfig, FakeRedditServer
+except ImportError:
+    from fake_reddit_server import FakeRedditConfig, FakeRedditServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def _proc_status_kib(field):
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _memory_mb():
+    """(current RSS, peak RSS) in MiB; without /proc the process-wide ru_maxrss stands in for both."""
+    rss, peak = _proc_status_kib("VmRSS"), _proc_status_kib("VmHWM")
+    if rss is not None and peak is not None:
+        return rss / 1024, peak / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return peak, peak
+
+def _start_memory():
+    """
+    Resets the process's peak RSS (Linux, via /proc/self/clear_refs) so the next result reports
+    the peak of that step alone, and returns the starting (RSS, peak). Elsewhere the peak is
+    process-wide, and only its growth during the step is attributable to the step.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return _memory_mb()
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def _result(name, elapsed, posts, comments, latencies, memory_start, bytes_written=0):
+    rss_start, _ = memory_start
+    _, peak = _memory_mb()
+    return {
+        "name": name,
+        "elapsed_seconds": round(elapsed, 4),
+        "posts": posts,
+        "comments": comments,
+        "posts_per_sec": round(posts / elapsed, 2) if elapsed else 0.0,
+        "comments_per_sec": round(comments / elapsed, 2) if elapsed else 0.0,
+        "requests": len(latencies),
+        "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "peak_rss_mb": round(peak, 1),
+        "rss_growth_mb": round(max(peak - rss_start, 0.0), 1),
+        "bytes_written": bytes_written,
+    }
+
+def _count(posts):
+    return len(posts), sum(len(post["comments"]) for post in posts)
+
+def run_suite(args):
+    server = FakeRedditServer(FakeRedditConfig(
+        comments_per_post=args.comments, reply_depth=args.reply_depth, latency_ms=args.latency_ms,
+        ratelimit_remaining=args.ratelimit_remaining, ratelimit_reset=args.ratelimit_reset,
+    )).start()
+    # The backend reads its configuration at import time
+    os.environ.update({
+        "REDDIT_CLIENT_ID": "benchmark", "REDDIT_CLIENT_SECRET": "benchmark",
+        "REDDIT_USER_AGENT": "benchmark:reddit_data_scraper:v1 (offline)",
+        "REDDIT_OAUTH_URL": server.url, "REDDIT_URL": server.url, "HTTP_CACHE_MODE": "off",
+        "CHECKPOINT_ENABLED": "false", # no checkpoint I/O in the timings, no files left behind
+    })
+    from backend import output_writer, reddit_adk_tool, reddit_async_scraper, reddit_scraper
+
+    quiet = lambda message: None
+    work_dir = tempfile.mkdtemp(prefix="reddit_bench_")
+    results = []
+    try:
+        reddit = reddit_scraper.initialize_reddit()
+        server.take_latencies() # ignore the token request
+
+        for name, workers in (("scrape_subreddit_serial", 1), (f"scrape_subreddit_{args.workers}_workers", args.workers)):
+            memory_start = _start_memory()
+            started = time.perf_counter()
+            posts = reddit_scraper.scrape_subreddit(reddit, "benchmark", "week", args.posts, quiet, max_workers=workers)
+            elapsed = time.perf_counter() - started
+            results.append(_result(name, elapsed, *_count(posts), server.take_latencies(), memory_start))
+            del posts
+            print(f"  {name}: {results[-1]['posts_per_sec']} posts/sec")
+
+        backends = ["thread"] + (["async"] if reddit_async_scraper.ASYNC_AVAILABLE else [])
+        for backend in backends:
+            output_dir = os.path.join(work_dir, f"logic_{backend}")
+
+            async def run_logic():
+                try:
+                    return await reddit_adk_tool.reddit_subreddit_scraper_logic(
+                        "benchmark", "week", args.posts, quiet, reddit_instance_internal=reddit,
+                        output_dir=output_dir, output_format=args.format, backend=backend, store_path="",
+                    )
+                finally:
+                    if backend == "async":
+                        await reddit_async_scraper.close_async_reddit()
+
+            memory_start = _start_memory()
+            started = time.perf_counter()
+            response = asyncio.run(run_logic())
+            elapsed = time.perf_counter() - started
+            handle = response.get("handle", {})
+            results.append(_result(f"scraper_logic_{backend}_{args.format}", elapsed, handle.get("posts", 0),
+                                   handle.get("comments", 0), server.take_latencies(), memory_start, _dir_bytes(output_dir)))
+            print(f"  {results[-1]['name']}: {results[-1]['posts_per_sec']} posts/sec")
+
+        # The JSON save step of run_reddit_scrape_with_adk, on an in-memory dataset
+        dataset = reddit_scraper.scrape_subreddit(reddit, "benchmark", "week", args.posts, quiet, max_workers=args.workers, as_records=True)
+        server.take_latencies()
+        json_path = os.path.join(work_dir, "save_step.json")
+        memory_start = _start_memory()
+        started = time.perf_counter()
+        output_writer.save_json(dataset, json_path)
+        elapsed = time.perf_counter() - started
+        results.append(_result("save_json", elapsed, len(dataset), sum(len(p.comments) for p in dataset), [],
+                               memory_start, os.path.getsize(json_path)))
+        print(f"  save_json: {results[-1]['posts_per_sec']} posts/sec")
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "parameters": {
+            "posts": args.posts, "comments_per_post": args.comments, "reply_depth": args.reply_depth,
+            "latency_ms": args.latency_ms, "workers": args.workers, "format": args.format,
+        },
+        "results": results,
+    }
+
+def compare(current, previous_path, threshold):
+    """Prints throughput changes against a previous results file. Returns the names that regressed."""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nComparison with {previous_path} (regression threshold {threshold:.0%}):")
+    for result in current["results"]:
+        before = previous.get(result["name"])
+        if not before or not before["posts_per_sec"]:
+            continue
+        change = result["posts_per_sec"] / before["posts_per_sec"] - 1
+        flag = "REGRESSION" if change < -threshold else ""
+        print(f"  {result['name']:<40} {before['posts_per_sec']:>10} -> {result['posts_per_sec']:>10} posts/sec ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append(result["name"])
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks against a local fake Reddit API.")
+    parser.add_argument("--posts", type=int, default=200, help="Posts per scrape (listings stop at 1000)")
+    parser.add_argument("--comments", type=int, default=50, help="Comments per post")
+    parser.add_argument("--reply-depth", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Simulated per-request server latency")
+    parser.add_argument("--ratelimit-remaining", type=int, default=600)
+    parser.add_argument("--ratelimit-reset", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=8, help="Workers for the concurrent scrape")
+    parser.add_argument("--format", choices=["json", "ndjson", "parquet", "arrow"], default="json")
+    parser.add_argument("--output", default=None, help="Results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    print(f"Running benchmarks: {args.posts} posts x {args.comments} comments, {args.latency_ms} ms latency...")
+    report = run_suite(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark results saved to: {output}")
+
+    if args.compare:
+        return 1 if compare(report, args.compare, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,13 @@
 # reddit_flet_app.py
+import time
+_APP_START = time.perf_counter()
 import flet as ft
 import asyncio
 import threading
 import traceback
 import sys
 import os
+import types
 
 # --- Load .env file early ---
 try:
@@ -28,9 +31,9 @@ if backend_path not in sys.path:
     print(f"[Flet App] Adding to sys.path: {backend_path}")
     sys.path.insert(0, backend_path)
 
-# Now import the ADK-based backend processing function
+# Now import the backend processing functions (ADK agent path and direct fast path)
 try:
-    from reddit_backend_processor import run_reddit_scrape_with_adk
+    from reddit_backend_processor import run_reddit_scrape_with_adk, run_reddit_scrape_direct, prewarm
 except ImportError as e:
     print(f"[Flet App] ERROR: Could not import run_reddit_scrape_with_adk from backend.")
     print(f"ImportError: {e}")
@@ -39,6 +42,8 @@ except ImportError as e:
         log_callback("FATAL ERROR: Backend processor (ADK version) could not be loaded.")
         await asyncio.sleep(0)
         return None
+    run_reddit_scrape_direct = run_reddit_scrape_with_adk
+    def prewarm(*args, **kwargs): return None
 except ModuleNotFoundError as e:
     print(f"[Flet App] ERROR: A required module was not found during backend import.")
     print(f"ModuleNotFoundError: {e}")
@@ -47,12 +52,67 @@ except ModuleNotFoundError as e:
         log_callback("FATAL ERROR: Missing dependency for backend processor.")
         await asyncio.sleep(0)
         return None
+    run_reddit_scrape_direct = run_reddit_scrape_with_adk
+    def prewarm(*args, **kwargs): return None
+
+# Thread-safe, ring-buffered log sink for the UI log view; startup timing
+try:
+    import lazy_import
+    import config # imports python-dotenv
+except ImportError as e:
+    print(f"[Flet App] ERROR: Could not import the backend config; running without pre-warm and startup timing.")
+    print(f"ImportError: {e}")
+    if "lazy_import" not in globals():
+        lazy_import = types.SimpleNamespace(record=lambda name, seconds: None, mark=lambda name: None,
+                                            report=lambda: "Startup timing unavailable.")
+    config = types.SimpleNamespace(PREWARM_ON_STARTUP=False, report=lambda log_callback=print: None)
+try:
+    from log_sink import LogSink, TimedFlusher
+except ImportError as e:
+    print(f"[Flet App] ERROR: Could not import log_sink from backend; appending to the log view directly.")
+    print(f"ImportError: {e}")
+    LogSink = TimedFlusher = None
+
+class DirectLog:
+    """Fallback log without log_sink: every message is appended to the log view on the UI loop."""
+    max_log_lines = 150
+
+    def __init__(self, page, log_output):
+        self.page = page
+        self.log_output = log_output
+
+    def __call__(self, message):
+        msg_str = str(message).strip()
+        if not msg_str: return
+
+        def update_ui_sync():
+            current_value = self.log_output.value if self.log_output.value else ""
+            lines = current_value.split('\n')
+            if len(lines) > self.max_log_lines: lines = lines[-self.max_log_lines:]
+            self.log_output.value = "\n".join(lines) + "\n" + msg_str
+            try:
+                self.page.update()
+            except Exception as update_e:
+                print(f"Error updating page (maybe closing?): {update_e}")
+
+        if self.page.loop is not None:
+            self.page.loop.call_soon_threadsafe(update_ui_sync)
+        else:
+            # Fallback if the page loop isn't running (e.g., during shutdown)
+            print(f"LOG (no UI loop): {msg_str}")
+
+    info = __call__
+
+    def clear(self, message=None):
+        self.log_output.value = message or ""
+lazy_import.record("import flet + backend", time.perf_counter() - _APP_START)
 
 # --- Configuration ---
 DEFAULT_SUBREDDIT = "wallstreetbets"
 DEFAULT_TIME_FILTER = "week"
 DEFAULT_LIMIT = 50
 OUTPUT_DIRECTORY = "reddit_data"
+DEFAULT_USE_AGENT = False # Direct scrape skips the ADK agent/model round-trip
 
 # --- Flet UI Main Function ---
 def main(page: ft.Page):
@@ -75,7 +135,12 @@ def main(page: ft.Page):
         bgcolor=ft.colors.ORANGE_ACCENT_700,         # Corrected: Use ft.Colors
         color=ft.colors.WHITE,                   # Corrected: Use ft.Colors
         height=50,
-        tooltip="Starts scraping the specified subreddit using the ADK agent"
+        tooltip="Starts scraping the specified subreddit"
+    )
+    use_agent_switch = ft.Switch(
+        label="Use ADK agent",
+        value=DEFAULT_USE_AGENT,
+        tooltip="Route the scrape through the Gemini agent instead of calling the scraper directly"
     )
     log_output = ft.TextField(
         label="Log Output",
@@ -95,37 +160,29 @@ def main(page: ft.Page):
     is_running = False
 
     # --- Functions ---
-    def update_log(message: str):
-        """Appends a message to the log view safely from any thread."""
-        msg_str = str(message).strip()
-        if not msg_str: return
-
-        # This function runs the actual UI update.
-        def update_ui_sync():
-            current_value = log_output.value if log_output.value else ""
-            max_log_lines = 150
-            lines = current_value.split('\n')
-            if len(lines) > max_log_lines: lines = lines[-max_log_lines:]
-            log_output.value = "\n".join(lines) + "\n" + msg_str
-            # Check if page update is needed/possible
-            if page.client_storage: # A simple check if page seems alive
-                 try:
-                     page.update()
-                 except Exception as update_e:
-                     print(f"Error updating page (maybe closing?): {update_e}")
-            else:
-                 print(f"LOG (page seems closed): {msg_str}")
+    # Backend threads log into the ring-buffered sink (O(1) per message);
+    # the UI loop redraws the log view from it in batches on a timer.
+    if LogSink is None:
+        log_sink = DirectLog(page, log_output)
+    else:
+        log_sink = LogSink()
+        log_sink.clear(log_output.value)
 
+        def flush_log(text):
+            log_output.value = text
+            try:
+                page.update()
+            except Exception as update_e:
+                print(f"Error updating page (maybe closing?): {update_e}")
+                log_flusher.stop()
 
-        # If page.loop exists, schedule the UI update on it.
-        # This is the safe way to update Flet UI from a background thread.
-        # No need to check asyncio.get_running_loop() here.
+        log_flusher = TimedFlusher(log_sink, flush_log)
         if page.loop is not None:
-            page.loop.call_soon_threadsafe(update_ui_sync)
-        else:
-            # Fallback if the page loop isn't running (e.g., during shutdown)
-            print(f"LOG (no UI loop): {msg_str}")
+            page.loop.call_soon_threadsafe(log_flusher.schedule, page.loop.call_later)
 
+    def update_log(message: str):
+        """Appends a message to the log view safely from any thread (drawn on the next flush)."""
+        log_sink(message)
 
     async def run_backend_task_async():
         """The async task that calls the ADK backend scraper."""
@@ -145,12 +202,14 @@ def main(page: ft.Page):
             if page.loop: page.loop.call_soon_threadsafe(reset_ui)
             return
 
-        update_log(f"Backend task started for r/{subreddit} (Using ADK)...")
+        use_agent = use_agent_switch.value
+        update_log(f"Backend task started for r/{subreddit} ({'Using ADK' if use_agent else 'Direct'})...")
+        backend_func = run_reddit_scrape_with_adk if use_agent else run_reddit_scrape_direct
         output_file = None
         try:
-            output_file = await run_reddit_scrape_with_adk(
+            output_file = await backend_func(
                 subreddit_name=subreddit, time_filter=DEFAULT_TIME_FILTER,
-                limit=DEFAULT_LIMIT, output_dir=OUTPUT_DIRECTORY, log_callback=update_log
+                limit=DEFAULT_LIMIT, output_dir=OUTPUT_DIRECTORY, log_callback=log_sink
             )
             if output_file:
                 update_log(f"Backend task finished successfully.")
@@ -205,7 +264,7 @@ def main(page: ft.Page):
         """Handles the button click event."""
         nonlocal is_running
         if is_running: return
-        is_running = True; log_output.value = ">>> Starting process..."; scrape_button.disabled = True
+        is_running = True; log_sink.clear(">>> Starting process..."); log_output.value = ">>> Starting process..."; scrape_button.disabled = True
         progress_ring.visible = True; status_text.value = "Running..."; page.update()
         # Now start the thread *after* initial UI updates are done
         run_backend_in_thread()
@@ -213,13 +272,30 @@ def main(page: ft.Page):
     # --- Button Action ---
     scrape_button.on_click = scrape_button_click
 
+    def use_agent_changed(e):
+        """Warms up the ADK agent in the background as soon as it is selected."""
+        if use_agent_switch.value and config.PREWARM_ON_STARTUP:
+            prewarm(log_callback=log_sink, with_agent=True)
+
+    use_agent_switch.on_change = use_agent_changed
+
     # --- Layout ---
     page.add(
-        ft.Row( [subreddit_input, scrape_button, progress_ring, ft.Text("Status:"), status_text],
+        ft.Row( [subreddit_input, scrape_button, use_agent_switch, progress_ring, ft.Text("Status:"), status_text],
             alignment=ft.MainAxisAlignment.START, vertical_alignment=ft.CrossAxisAlignment.CENTER, spacing=15 ),
         ft.Divider(height=10),
         ft.Container( content=log_output, expand=True, padding=ft.padding.only(top=5) ) )
     page.update()
+    lazy_import.mark("UI ready")
+    config.report(log_sink)
+
+    # Build the Reddit client (and the ADK runner if the agent is selected) while the user is typing
+    def report_startup():
+        log_sink.info(lazy_import.report())
+    if config.PREWARM_ON_STARTUP:
+        prewarm(log_callback=log_sink, with_agent=use_agent_switch.value, on_done=report_startup)
+    else:
+        report_startup()
 
 # --- Run the Flet App ---
 if __name__ == "__main__":